@@ -1,5 +1,8 @@
 import streamlit as st
+from streamlit.errors import StreamlitAPIException
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 import pandas as pd
+import numpy as np
 import requests
 import json
 import uuid
@@ -8,18 +11,38 @@ from gtts import gTTS
 import os
 import base64
 import tempfile
+import zlib
+import shutil
+import io
 import plotly.express as px
 import plotly.graph_objects as go
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 import pickle
 from pathlib import Path
 from google_auth_oauthlib.flow import InstalledAppFlow
-from google.auth.transport.requests import Request
+from google.auth.transport.requests import AuthorizedSession, Request
 from google.oauth2 import service_account
 from googleapiclient.discovery import build
 import gspread
 from gspread_dataframe import get_as_dataframe, set_with_dataframe
 import time
+import math
+from collections import OrderedDict
+import sys
+import logging
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import threading
+import atexit
+import sqlite3
+import hashlib
+import re
+import bisect
+import heapq
+import random
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError, wait as wait_for_futures
+from string import Template
+from types import MappingProxyType
 
 # Page configuration
 st.set_page_config(
@@ -36,358 +59,100 @@ SCOPES = [
     'https://www.googleapis.com/auth/calendar'
 ]
 
-# Real spreadsheet IDs
-REAL_SPREADSHEETS = {
-    "Grant": {
-        "id": "1t80HNEgDIBFElZqodlvfaEuRj-bPlS4-R8T9kdLBtFk",
-        "name": "Grant Information",
-        "description": "Grant application and funding data",
-        "icon": "📊"
-    },
-    "Real Estate": {
-        "id": "1BWz_FnYdzZyyl4WafSgoZV9rLHC91XOjstDcgwn_k6Y",
-        "name": "Real Estate Properties",
-        "description": "Property listings and details",
-        "icon": "🏠"
-    },
-    "Agent": {
-        "id": "1Om-RVVChe1GItsY4YaN_K95iM44vTpoxpSXzwTnOdAo",
-        "name": "Agent Information",
-        "description": "Agent profiles and performance metrics",
-        "icon": "👤"
-    }
-}
-
 # Get webhook URL and bearer token from Streamlit secrets
 try:
     WEBHOOK_URL = st.secrets["WEBHOOK_URL"]
     BEARER_TOKEN = st.secrets["BEARER_TOKEN"]
 except Exception:
     # Fallback for local development
-    WEBHOOK_URL = "https://agentonline-u29564.vm.elestio.app/webhook/42e650d7-3e50-4dda-bf4f-d3e16b1cd"
-    BEARER_TOKEN = "default_token"
-
-# Configuration for 25 Agents with unified webhook
-AGENTS_CONFIG = {
-    "Agent_CEO": {
-        "id": "1BWz_FnYdzZyyl4WafSgoZV9rLHC91XOjstDcgwn_k6Y_CEO",
-        "name": "Agent CEO",
-        "description": "Executive leadership and strategic decision making",
-        "icon": "👔",
-        "webhook_url": WEBHOOK_URL,
-        "bearer_token": BEARER_TOKEN,
-        "ai_phone": "+15551000001",
-        "ai_assistant_id": "bf161516-6d88-490c-972e-274098a6b51a",
-        "category": "Leadership",
-        "specialization": "Strategic Planning, Executive Decisions, Leadership",
-        "spreadsheet": REAL_SPREADSHEETS["Agent"]
-    },
-    "Agent_Social": {
-        "id": "1BWz_FnYdzZyyl4WafSgoZV9rLHC91XOjstDcgwn_k6Y_SOCIAL",
-        "name": "Agent Social",
-        "description": "Social media management and digital marketing",
-        "icon": "📱",
-        "webhook_url": WEBHOOK_URL,
-        "bearer_token": BEARER_TOKEN,
-        "ai_phone": "+15551000002",
-        "ai_assistant_id": "bf161516-6d88-490c-972e-274098a6b51a",
-        "category": "Marketing",
-        "specialization": "Social Media, Content Creation, Digital Marketing",
-        "spreadsheet": REAL_SPREADSHEETS["Agent"]
-    },
-    "Agent_Mindset": {
-        "id": "1BWz_FnYdzZyyl4WafSgoZV9rLHC91XOjstDcgwn_k6Y_MINDSET",
-        "name": "Agent Mindset",
-        "description": "Personal development and mindset coaching",
-        "icon": "🧠",
-        "webhook_url": WEBHOOK_URL,
-        "bearer_token": BEARER_TOKEN,
-        "ai_phone": "+15551000003",
-        "ai_assistant_id": "4fe7083e-2f28-4502-b6bf-4ae6ea71a8f4",
-        "category": "Development",
-        "specialization": "Mindset Coaching, Personal Growth, Motivation",
-        "spreadsheet": REAL_SPREADSHEETS["Agent"]
-    },
-    "Agent_Blogger": {
-        "id": "1BWz_FnYdzZyyl4WafSgoZV9rLHC91XOjstDcgwn_k6Y_BLOGGER",
-        "name": "Agent Blogger",
-        "description": "Content creation and blog writing",
-        "icon": "✍️",
-        "webhook_url": WEBHOOK_URL,
-        "bearer_token": BEARER_TOKEN,
-        "ai_phone": "+15551000004",
-        "ai_assistant_id": "f8ef1ad5-5281-42f1-ae69-f94ff7acb453",
-        "category": "Content",
-        "specialization": "Blog Writing, Content Strategy, SEO",
-        "spreadsheet": REAL_SPREADSHEETS["Agent"]
-    },
-    "Agent_Grant": {
-        "id": "1BWz_FnYdzZyyl4WafSgoZV9rLHC91XOjstDcgwn_k6Y_GRANT",
-        "name": "Agent Grant",
-        "description": "Grant writing and funding applications",
-        "icon": "💰",
-        "webhook_url": WEBHOOK_URL,
-        "bearer_token": BEARER_TOKEN,
-        "ai_phone": "+15551000005",
-        "ai_assistant_id": "7673e69d-170b-4319-bdf4-e74e5370e98a",
-        "category": "Finance",
-        "specialization": "Grant Writing, Funding, Proposals",
-        "spreadsheet": REAL_SPREADSHEETS["Grant"]
-    },
-    "Agent_Prayer_AI": {
-        "id": "1BWz_FnYdzZyyl4WafSgoZV9rLHC91XOjstDcgwn_k6Y_PRAYER",
-        "name": "Agent Prayer AI",
-        "description": "Spiritual guidance and prayer assistance",
-        "icon": "🙏",
-        "webhook_url": WEBHOOK_URL,
-        "bearer_token": BEARER_TOKEN,
-        "ai_phone": "+15551000006",
-        "ai_assistant_id": "339cdad6-9989-4bb6-98ed-bd15521707d1",
-        "category": "Spiritual",
-        "specialization": "Prayer, Spiritual Guidance, Faith",
-        "spreadsheet": REAL_SPREADSHEETS["Agent"]
-    },
-    "Agent_Metrics": {
-        "id": "1BWz_FnYdzZyyl4WafSgoZV9rLHC91XOjstDcgwn_k6Y_METRICS",
-        "name": "Agent Metrics",
-        "description": "Analytics and performance tracking",
-        "icon": "📊",
-        "webhook_url": WEBHOOK_URL,
-        "bearer_token": BEARER_TOKEN,
-        "ai_phone": "+15551000007",
-        "ai_assistant_id": "4820eab2-adaf-4f17-a8a0-30cab3e3f007",
-        "category": "Analytics",
-        "specialization": "KPIs, Analytics, Performance Tracking",
-        "spreadsheet": REAL_SPREADSHEETS["Agent"]
-    },
-    "Agent_Researcher": {
-        "id": "1BWz_FnYdzZyyl4WafSgoZV9rLHC91XOjstDcgwn_k6Y_RESEARCH",
-        "name": "Agent Researcher",
-        "description": "Research and data analysis",
-        "icon": "🔬",
-        "webhook_url": WEBHOOK_URL,
-        "bearer_token": BEARER_TOKEN,
-        "ai_phone": "+15551000008",
-        "ai_assistant_id": "f05c182f-d3d1-4a17-9c79-52442a9171b8",
-        "category": "Research",
-        "specialization": "Market Research, Data Analysis, Insights",
-        "spreadsheet": REAL_SPREADSHEETS["Agent"]
-    },
-    "Agent_Investor": {
-        "id": "1BWz_FnYdzZyyl4WafSgoZV9rLHC91XOjstDcgwn_k6Y_INVESTOR",
-        "name": "Agent Investor",
-        "description": "Investment analysis and financial planning",
-        "icon": "💼",
-        "webhook_url": WEBHOOK_URL,
-        "bearer_token": BEARER_TOKEN,
-        "ai_phone": "+15551000009",
-        "ai_assistant_id": "1008771d-86ca-472a-a125-7a7e10100297",
-        "category": "Finance",
-        "specialization": "Investment Analysis, Portfolio Management",
-        "spreadsheet": REAL_SPREADSHEETS["Agent"]
-    },
-    "Agent_Newsroom": {
-        "id": "1BWz_FnYdzZyyl4WafSgoZV9rLHC91XOjstDcgwn_k6Y_NEWS",
-        "name": "Agent Newsroom",
-        "description": "News aggregation and journalism",
-        "icon": "📰",
-        "webhook_url": WEBHOOK_URL,
-        "bearer_token": BEARER_TOKEN,
-        "ai_phone": "+15551000010",
-        "ai_assistant_id": "76f1d6e5-cab4-45b8-9aeb-d3e6f3c0c019",
-        "category": "Media",
-        "specialization": "News, Journalism, Content Curation",
-        "spreadsheet": REAL_SPREADSHEETS["Agent"]
-    },
-    "STREAMLIT_Agent": {
-        "id": "1BWz_FnYdzZyyl4WafSgoZV9rLHC91XOjstDcgwn_k6Y_STREAMLIT",
-        "name": "STREAMLIT Agent",
-        "description": "Streamlit app development and Python coding",
-        "icon": "🐍",
-        "webhook_url": WEBHOOK_URL,
-        "bearer_token": BEARER_TOKEN,
-        "ai_phone": "+15551000011",
-        "ai_assistant_id": "538258da-0dda-473d-8ef8-5427251f3ad5",
-        "category": "Development",
-        "specialization": "Streamlit, Python, Web Apps",
-        "spreadsheet": REAL_SPREADSHEETS["Agent"]
-    },
-    "HTML_CSS_Agent": {
-        "id": "1BWz_FnYdzZyyl4WafSgoZV9rLHC91XOjstDcgwn_k6Y_HTML",
-        "name": "HTML/CSS Agent",
-        "description": "Web development and frontend design",
-        "icon": "🌐",
-        "webhook_url": WEBHOOK_URL,
-        "bearer_token": BEARER_TOKEN,
-        "ai_phone": "+15551000012",
-        "ai_assistant_id": "14b94e2f-299b-4e75-a445-a4f5feacc522",
-        "category": "Development",
-        "specialization": "HTML, CSS, Frontend Development",
-        "spreadsheet": REAL_SPREADSHEETS["Agent"]
-    },
-    "Business_Plan_Agent": {
-        "id": "1BWz_FnYdzZyyl4WafSgoZV9rLHC91XOjstDcgwn_k6Y_BIZPLAN",
-        "name": "Business Plan Agent",
-        "description": "Business planning and strategy development",
-        "icon": "📋",
-        "webhook_url": WEBHOOK_URL,
-        "bearer_token": BEARER_TOKEN,
-        "ai_phone": "+15551000013",
-        "ai_assistant_id": "87d59105-723b-427e-a18d-da99fbf28608",
-        "category": "Business",
-        "specialization": "Business Plans, Strategy, Market Analysis",
-        "spreadsheet": REAL_SPREADSHEETS["Agent"]
-    },
-    "Ecom_Agent": {
-        "id": "1BWz_FnYdzZyyl4WafSgoZV9rLHC91XOjstDcgwn_k6Y_ECOM",
-        "name": "Ecom Agent",
-        "description": "E-commerce and online retail management",
-        "icon": "🛒",
-        "webhook_url": WEBHOOK_URL,
-        "bearer_token": BEARER_TOKEN,
-        "ai_phone": "+15551000014",
-        "ai_assistant_id": "d56551f8-0447-468a-872b-eaa9f830993d",
-        "category": "E-commerce",
-        "specialization": "Online Retail, E-commerce Strategy, Sales",
-        "spreadsheet": REAL_SPREADSHEETS["Agent"]
-    },
-    "Agent_Health": {
-        "id": "1BWz_FnYdzZyyl4WafSgoZV9rLHC91XOjstDcgwn_k6Y_HEALTH",
-        "name": "Agent Health",
-        "description": "Health and wellness guidance",
-        "icon": "🏥",
-        "webhook_url": WEBHOOK_URL,
-        "bearer_token": BEARER_TOKEN,
-        "ai_phone": "+15551000015",
-        "ai_assistant_id": "7b2b8b86-5caa-4f28-8c6b-e7d3d0404f06",
-        "category": "Health",
-        "specialization": "Health, Wellness, Medical Information",
-        "spreadsheet": REAL_SPREADSHEETS["Agent"]
-    },
-    "Cinch_Closer": {
-        "id": "1BWz_FnYdzZyyl4WafSgoZV9rLHC91XOjstDcgwn_k6Y_CLOSER",
-        "name": "Cinch Closer",
-        "description": "Sales closing and deal negotiation",
-        "icon": "🤝",
-        "webhook_url": WEBHOOK_URL,
-        "bearer_token": BEARER_TOKEN,
-        "ai_phone": "+15551000016",
-        "ai_assistant_id": "232f3d9c-18b3-4963-bdd9-e7de3be156ae",
-        "category": "Sales",
-        "specialization": "Sales Closing, Negotiation, Deal Making",
-        "spreadsheet": REAL_SPREADSHEETS["Agent"]
-    },
-    "DISC_Agent": {
-        "id": "1BWz_FnYdzZyyl4WafSgoZV9rLHC91XOjstDcgwn_k6Y_DISC",
-        "name": "DISC Agent",
-        "description": "DISC personality assessment and analysis",
-        "icon": "🎯",
-        "webhook_url": WEBHOOK_URL,
-        "bearer_token": BEARER_TOKEN,
-        "ai_phone": "+15551000017",
-        "ai_assistant_id": "41fe59e1-829f-4936-8ee5-eef2bb1287fe",
-        "category": "Assessment",
-        "specialization": "DISC Assessment, Personality Analysis",
-        "spreadsheet": REAL_SPREADSHEETS["Agent"]
-    },
-    "Biz_Plan_Agent": {
-        "id": "1BWz_FnYdzZyyl4WafSgoZV9rLHC91XOjstDcgwn_k6Y_BIZPLAN2",
-        "name": "Biz Plan Agent",
-        "description": "Advanced business planning and modeling",
-        "icon": "📈",
-        "webhook_url": WEBHOOK_URL,
-        "bearer_token": BEARER_TOKEN,
-        "ai_phone": "+15551000018",
-        "ai_assistant_id": "87d59105-723b-427e-a18d-da99fbf28608",
-        "category": "Business",
-        "specialization": "Business Modeling, Financial Planning",
-        "spreadsheet": REAL_SPREADSHEETS["Agent"]
-    },
-    "Invoice_Agent": {
-        "id": "1BWz_FnYdzZyyl4WafSgoZV9rLHC91XOjstDcgwn_k6Y_INVOICE",
-        "name": "Invoice Agent",
-        "description": "Invoice management and billing automation",
-        "icon": "🧾",
-        "webhook_url": WEBHOOK_URL,
-        "bearer_token": BEARER_TOKEN,
-        "ai_phone": "+15551000019",
-        "ai_assistant_id": "invoice_assistant_placeholder",
-        "category": "Finance",
-        "specialization": "Invoicing, Billing, Payment Processing",
-        "spreadsheet": REAL_SPREADSHEETS["Agent"]
-    },
-    "Agent_Clone": {
-        "id": "1BWz_FnYdzZyyl4WafSgoZV9rLHC91XOjstDcgwn_k6Y_CLONE",
-        "name": "Agent Clone",
-        "description": "AI agent replication and customization",
-        "icon": "👥",
-        "webhook_url": WEBHOOK_URL,
-        "bearer_token": BEARER_TOKEN,
-        "ai_phone": "+15551000020",
-        "ai_assistant_id": "88862739-c227-4bfc-b90a-5f450a823e23",
-        "category": "AI",
-        "specialization": "Agent Cloning, AI Customization",
-        "spreadsheet": REAL_SPREADSHEETS["Agent"]
-    },
-    "Agent_Doctor": {
-        "id": "1BWz_FnYdzZyyl4WafSgoZV9rLHC91XOjstDcgwn_k6Y_DOCTOR",
-        "name": "Agent Doctor",
-        "description": "Medical consultation and health advice",
-        "icon": "👨‍⚕️",
-        "webhook_url": WEBHOOK_URL,
-        "bearer_token": BEARER_TOKEN,
-        "ai_phone": "+15551000021",
-        "ai_assistant_id": "9d1cccc6-3193-4694-a9f7-853198ee4082",
-        "category": "Medical",
-        "specialization": "Medical Consultation, Health Advice",
-        "spreadsheet": REAL_SPREADSHEETS["Agent"]
-    },
-    "Agent_Multi_Lig": {
-        "id": "1BWz_FnYdzZyyl4WafSgoZV9rLHC91XOjstDcgwn_k6Y_MULTILIG",
-        "name": "Agent Multi Lig",
-        "description": "Multi-language translation and communication",
-        "icon": "🌍",
-        "webhook_url": WEBHOOK_URL,
-        "bearer_token": BEARER_TOKEN,
-        "ai_phone": "+15551000022",
-        "ai_assistant_id": "8f045bce-08bc-4477-8d3d-05f233a44df3",
-        "category": "Language",
-        "specialization": "Translation, Multi-language Support",
-        "spreadsheet": REAL_SPREADSHEETS["Agent"]
-    },
-    "Agent_Real_Estate": {
-        "id": "1BWz_FnYdzZyyl4WafSgoZV9rLHC91XOjstDcgwn_k6Y_REALESTATE",
-        "name": "Agent Real Estate",
-        "description": "Real estate analysis and property management",
-        "icon": "🏠",
-        "webhook_url": WEBHOOK_URL,
-        "bearer_token": BEARER_TOKEN,
-        "ai_phone": "+15551000023",
-        "ai_assistant_id": "d982667e-d931-477c-9708-c183ba0aa964",
-        "category": "Real Estate",
-        "specialization": "Property Analysis, Real Estate Investment",
-        "spreadsheet": REAL_SPREADSHEETS["Real Estate"]
-    },
-    "Follow_Up_Agent": {
-        "id": "1BWz_FnYdzZyyl4WafSgoZV9rLHC91XOjstDcgwn_k6Y_FOLLOWUP",
-        "name": "Follow Up Agent",
-        "description": "Customer follow-up and relationship management",
-        "icon": "📞",
-        "webhook_url": WEBHOOK_URL,
-        "bearer_token": BEARER_TOKEN,
-        "ai_phone": "+15551000024",
-        "ai_assistant_id": "39928b52-d610-43cb-9004-b88028e399fc",
-        "category": "CRM",
-        "specialization": "Follow-up, Customer Relations, CRM",
-        "spreadsheet": REAL_SPREADSHEETS["Agent"]
-    }
-}
+    WEBHOOK_URL = os.environ.get("WEBHOOK_URL", "https://agentonline-u29564.vm.elestio.app/webhook/42e650d7-3e50-4dda-bf4f-d3e16b1cd")
+    BEARER_TOKEN = os.environ.get("BEARER_TOKEN", "default_token")
+
+# "simulate" answers locally; "live" posts to each agent's n8n webhook
+try:
+    WEBHOOK_MODE = st.secrets["WEBHOOK_MODE"]
+except Exception:
+    WEBHOOK_MODE = os.environ.get("WEBHOOK_MODE", "simulate")
+WEBHOOK_TIMEOUT_SECONDS = 30
+
+# Agent registry
+AGENT_REGISTRY_PATH = Path(os.environ.get("AGENT_REGISTRY_PATH", Path(__file__).parent / "agents.json"))
+
+def _freeze(value):
+    """Recursively convert dicts and lists to read-only equivalents"""
+    if isinstance(value, dict):
+        return MappingProxyType({k: _freeze(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+def _thaw(value):
+    """Recursively copy a frozen structure back into plain dicts and lists"""
+    if isinstance(value, MappingProxyType):
+        return {k: _thaw(v) for k, v in value.items()}
+    if isinstance(value, tuple):
+        return [_thaw(v) for v in value]
+    return value
+
+@st.cache_resource(max_entries=2)
+def _load_agent_registry(path, mtime_ns):
+    """Parse the registry file into one immutable structure shared by all sessions"""
+    with open(path, encoding="utf-8") as f:
+        raw = json.load(f)
+
+    settings = {"WEBHOOK_URL": WEBHOOK_URL, "BEARER_TOKEN": BEARER_TOKEN}
+    spreadsheets = raw['spreadsheets']
+    defaults = raw.get('defaults', {})
+
+    agents = {}
+    for agent_id, entry in raw['agents'].items():
+        config = {**defaults, **entry}
+        for key in ('webhook_url', 'bearer_token'):
+            config[key] = Template(config[key]).safe_substitute(settings)
+        if 'spreadsheet' in config:
+            config['spreadsheet'] = spreadsheets[config['spreadsheet']]
+        agents[agent_id] = config
+
+    return _freeze({
+        "spreadsheets": spreadsheets,
+        "agents": agents,
+        "categories": raw.get('categories', {}),
+        "prompt_library": raw.get('prompt_library', {}),
+        "mtime_ns": mtime_ns
+    })
+
+@st.cache_resource
+def _last_good_registry():
+    """Holder for the most recent registry that parsed successfully"""
+    return {}
+
+def get_agent_registry():
+    """Return the shared registry, reloading it when the file changes"""
+    holder = _last_good_registry()
+    try:
+        registry = _load_agent_registry(str(AGENT_REGISTRY_PATH), os.stat(AGENT_REGISTRY_PATH).st_mtime_ns)
+    except (OSError, ValueError, KeyError) as e:
+        # Keep serving the previous registry while a bad edit is being fixed
+        if 'registry' not in holder:
+            raise
+        print(f"⚠️ Agent registry reload failed, keeping previous version: {str(e)}")
+        return holder['registry']
+
+    holder['registry'] = registry
+    return registry
+
+AGENT_REGISTRY = get_agent_registry()
+REAL_SPREADSHEETS = AGENT_REGISTRY['spreadsheets']
+AGENTS_CONFIG = AGENT_REGISTRY['agents']
 
 # Session state initialization
 def initialize_session_state():
     defaults = {
         'authenticated': False,
         'credentials': None,
+        'credentials_key': None,
+        'account_id': None,
+        'user_id': None,
         'user_info': None,
         'current_page': 'Agent_CEO',
         'current_tab': 'chatbot',
@@ -395,53 +160,1026 @@ def initialize_session_state():
         'current_worksheet': None,
         'sheets_data': {},
         'chat_sessions': {},
-        'recognizer': sr.Recognizer(),
+        'voice_engine': 'google',
+        'voice_job': None,
+        'pending_voice_input': None,
         'use_tts': True,
         'show_timestamps': False,
         'recording_status': False,
         'ai_calls': {},
-        'agent_configs': AGENTS_CONFIG,
-        'prompt_library': {
-            "Leadership": [
-                {"title": "Strategic Planning", "prompt": "Help me develop a strategic plan for [company/project]. Consider market conditions, resources, and long-term goals."},
-                {"title": "Team Management", "prompt": "Provide guidance on managing a team of [number] people with diverse skills and personalities."},
-                {"title": "Decision Making", "prompt": "Help me make a decision about [situation]. Analyze pros, cons, and potential outcomes."},
-            ],
-            "Sales & Marketing": [
-                {"title": "Lead Qualification", "prompt": "Help me qualify this lead: [lead information]. Assess their potential and next steps."},
-                {"title": "Social Media Strategy", "prompt": "Create a social media strategy for [business/product] targeting [audience]."},
-                {"title": "Content Creation", "prompt": "Generate content ideas for [platform] about [topic] for [target audience]."},
-            ],
-            "Development": [
-                {"title": "Code Review", "prompt": "Review this code and suggest improvements: [code snippet]"},
-                {"title": "App Architecture", "prompt": "Help me design the architecture for a [type] application with [requirements]."},
-                {"title": "Bug Troubleshooting", "prompt": "Help me troubleshoot this issue: [error description and code]"},
-            ],
-            "Finance & Business": [
-                {"title": "Financial Analysis", "prompt": "Analyze the financial performance of [company/project] based on these metrics: [data]"},
-                {"title": "Investment Evaluation", "prompt": "Evaluate this investment opportunity: [investment details]"},
-                {"title": "Grant Proposal", "prompt": "Help me write a grant proposal for [project] seeking [amount] for [purpose]."},
-            ],
-            "Health & Wellness": [
-                {"title": "Health Assessment", "prompt": "Provide general health guidance for someone with [symptoms/conditions]. Note: This is not medical advice."},
-                {"title": "Wellness Plan", "prompt": "Create a wellness plan focusing on [areas like nutrition, exercise, mental health]."},
-            ],
-            "Real Estate": [
-                {"title": "Property Analysis", "prompt": "Analyze this property investment: [property details, location, price, market conditions]"},
-                {"title": "Market Research", "prompt": "Research the real estate market in [location] for [property type]."},
-            ]
-        },
+        'agent_overrides': {},
+        'prompt_library': None,
         'favorites': [],
         'call_logs': {},
-        'performance_metrics': {}
+        'performance_metrics': {},
+        'chat_epochs': {},
+        'chat_context': {},
+        'chat_archive': {}
     }
     
     for key, value in defaults.items():
         if key not in st.session_state:
             st.session_state[key] = value
 
+# Profiling
+# Port for the /metrics endpoint; unset or 0 disables it
+try:
+    PROMETHEUS_PORT = int(st.secrets["PROMETHEUS_PORT"]) or None
+except Exception:
+    PROMETHEUS_PORT = int(os.environ.get("PROMETHEUS_PORT") or 0) or None
+
+# One JSON line per rerun on the agent_dashboard.profiling logger
+PROFILE_LOG_ENABLED = os.environ.get("PROFILE_LOG", "0") == "1"
+PROFILING_LOGGER = logging.getLogger("agent_dashboard.profiling")
+
+_profile_local = threading.local()
+
+@st.cache_resource
+def get_span_stats():
+    """Process-wide count, total and max seconds per span name"""
+    return {"spans": {}, "lock": threading.Lock()}
+
+def _record_span_stats(name, seconds):
+    stats = get_span_stats()
+    with stats['lock']:
+        entry = stats['spans'].get(name)
+        if entry is None:
+            stats['spans'][name] = [1, seconds, seconds]
+        else:
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] = max(entry[2], seconds)
+
+@contextmanager
+def profile_span(name):
+    """Time a section of the rerun; a no-op unless a trace or metrics export is active.
+
+    Also usable as a decorator. Nested spans are recorded with their depth and
+    the net number of memory blocks allocated inside them.
+    """
+    trace = getattr(_profile_local, 'trace', None)
+    if trace is None and PROMETHEUS_PORT is None:
+        yield
+        return
+
+    depth = getattr(_profile_local, 'depth', 0)
+    _profile_local.depth = depth + 1
+    entry = None
+    if trace is not None:
+        entry = {"span": name, "depth": depth, "ms": None, "blocks": None}
+        trace.append(entry)
+
+    blocks_before = sys.getallocatedblocks()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        _profile_local.depth = depth
+        if entry is not None:
+            entry['ms'] = round(elapsed * 1000, 2)
+            entry['blocks'] = sys.getallocatedblocks() - blocks_before
+        if PROMETHEUS_PORT is not None:
+            _record_span_stats(name, elapsed)
+
+def begin_profiled_run():
+    """Start collecting this rerun's spans if the debug panel or profile log is on"""
+    collect = st.session_state.get('perf_debug', False) or PROFILE_LOG_ENABLED
+    _profile_local.trace = [] if collect else None
+    _profile_local.depth = 0
+    _profile_local.started = time.perf_counter()
+
+def end_profiled_run():
+    """Finish the rerun trace, emitting it as a structured log line when enabled"""
+    trace = getattr(_profile_local, 'trace', None)
+    if trace is None:
+        return None
+
+    total_ms = round((time.perf_counter() - _profile_local.started) * 1000, 2)
+    if PROFILE_LOG_ENABLED:
+        PROFILING_LOGGER.info(json.dumps({
+            "event": "rerun",
+            "agent_id": st.session_state.current_page,
+            "tab": st.session_state.current_tab,
+            "total_ms": total_ms,
+            "spans": trace
+        }))
+    _profile_local.trace = None
+    return total_ms, trace
+
+def render_prometheus_metrics():
+    """Process-wide span statistics in Prometheus text exposition format"""
+    stats = get_span_stats()
+    with stats['lock']:
+        spans = {name: list(entry) for name, entry in stats['spans'].items()}
+
+    lines = [
+        "# HELP dashboard_span_seconds Time spent in instrumented dashboard sections",
+        "# TYPE dashboard_span_seconds summary"
+    ]
+    for name, (count, total, _) in sorted(spans.items()):
+        lines.append(f'dashboard_span_seconds_count{{span="{name}"}} {count}')
+        lines.append(f'dashboard_span_seconds_sum{{span="{name}"}} {total:.6f}')
+    lines.append("# HELP dashboard_span_max_seconds Slowest observed run of each section")
+    lines.append("# TYPE dashboard_span_max_seconds gauge")
+    for name, (_, _, longest) in sorted(spans.items()):
+        lines.append(f'dashboard_span_max_seconds{{span="{name}"}} {longest:.6f}')
+    return "\n".join(lines) + "\n"
+
+@st.cache_resource
+def start_metrics_server(port):
+    """Serve /metrics for Prometheus on a background thread, or None when the port is taken"""
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = (render_prometheus_metrics() + render_latency_prometheus_metrics() + render_webhook_batch_metrics() + render_memory_prometheus_metrics()).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    try:
+        server = ThreadingHTTPServer(("0.0.0.0", port), MetricsHandler)
+    except OSError as e:
+        # Typically another worker on this host already serves the port
+        logging.getLogger("agent_dashboard").warning("Metrics server not started on port %s: %s", port, e)
+        return None
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    return server
+
+METRICS_SERVER = start_metrics_server(PROMETHEUS_PORT) if PROMETHEUS_PORT is not None else None
+
+# Backend latency metrics
+LATENCY_WINDOW_SECONDS = 60
+LATENCY_WINDOWS_KEPT = 60
+LATENCY_OPERATIONS = {
+    "webhook": "💬 Webhook",
+    "sheet_load": "📊 Sheet Load",
+    "call_dispatch": "📞 Call Dispatch"
+}
+
+class LatencyHistogram:
+    """HDR-style log-linear latency histogram.
+
+    Buckets are spaced 2**(1/8) apart (about 9% relative precision) and stored
+    sparsely, so a histogram costs a few hundred bytes however many samples
+    it holds and histograms can be merged exactly.
+    """
+
+    SUB_BUCKETS = 8
+
+    def __init__(self):
+        self.buckets = {}
+        self.count = 0
+        self.errors = 0
+        self.max_ms = 0.0
+
+    def record(self, ms, error=False):
+        index = math.floor(math.log2(max(ms, 0.001)) * self.SUB_BUCKETS)
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+        self.count += 1
+        self.max_ms = max(self.max_ms, ms)
+        if error:
+            self.errors += 1
+
+    def merge(self, other):
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        self.count += other.count
+        self.errors += other.errors
+        self.max_ms = max(self.max_ms, other.max_ms)
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th quantile, in milliseconds"""
+        if not self.count:
+            return None
+        target = q * self.count
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= target:
+                return min(2 ** ((index + 1) / self.SUB_BUCKETS), self.max_ms)
+        return self.max_ms
+
+@st.cache_resource
+def get_latency_registry():
+    """Process-wide latency histograms per (agent, operation): a running total plus per-minute windows"""
+    return {"series": {}, "lock": threading.Lock()}
+
+def record_latency(agent_id, operation, seconds, error=False):
+    """Record one backend call for the process dashboard and this session's metrics"""
+    ms = seconds * 1000
+    window = int(time.time() // LATENCY_WINDOW_SECONDS)
+
+    registry = get_latency_registry()
+    with registry['lock']:
+        series = registry['series'].get((agent_id, operation))
+        if series is None:
+            series = {"total": LatencyHistogram(), "windows": OrderedDict()}
+            registry['series'][(agent_id, operation)] = series
+        series['total'].record(ms, error)
+        if window not in series['windows']:
+            series['windows'][window] = LatencyHistogram()
+            while len(series['windows']) > LATENCY_WINDOWS_KEPT:
+                series['windows'].popitem(last=False)
+        series['windows'][window].record(ms, error)
+
+    try:
+        session_metrics = st.session_state.performance_metrics
+    except Exception:
+        # Called off the script thread; process metrics are enough
+        return
+    entry = session_metrics.setdefault(agent_id, {}).setdefault(operation, {"count": 0, "errors": 0, "total_ms": 0.0})
+    entry['count'] += 1
+    entry['total_ms'] += ms
+    if error:
+        entry['errors'] += 1
+
+def latency_snapshot():
+    """Copy of every series' totals and windows, taken under the registry lock"""
+    registry = get_latency_registry()
+    snapshot = {}
+    with registry['lock']:
+        for key, series in registry['series'].items():
+            total = LatencyHistogram()
+            total.merge(series['total'])
+            windows = []
+            for window, histogram in series['windows'].items():
+                copy = LatencyHistogram()
+                copy.merge(histogram)
+                windows.append((window, copy))
+            snapshot[key] = {"total": total, "windows": windows}
+    return snapshot
+
+def render_latency_prometheus_metrics():
+    """Per-agent latency quantiles and error counts in Prometheus text format"""
+    lines = [
+        "# HELP dashboard_backend_latency_seconds Backend call latency per agent and operation",
+        "# TYPE dashboard_backend_latency_seconds summary"
+    ]
+    errors = [
+        "# HELP dashboard_backend_errors_total Failed backend calls per agent and operation",
+        "# TYPE dashboard_backend_errors_total counter"
+    ]
+    for (agent_id, operation), series in sorted(latency_snapshot().items()):
+        total = series['total']
+        labels = f'agent="{agent_id}",operation="{operation}"'
+        for q in (0.5, 0.95, 0.99):
+            lines.append(f'dashboard_backend_latency_seconds{{{labels},quantile="{q}"}} {total.quantile(q) / 1000:.6f}')
+        lines.append(f'dashboard_backend_latency_seconds_count{{{labels}}} {total.count}')
+        errors.append(f'dashboard_backend_errors_total{{{labels}}} {total.errors}')
+    return "\n".join(lines + errors) + "\n"
+
+# Durable session state
+# Keys that survive a worker restart and follow the signed-in account to any worker behind the
+# load balancer; sheet data is left out because the shared sheet cache re-fetches it on demand
+DURABLE_STATE_KEYS = ("chat_sessions", "chat_archive", "chat_epochs", "ai_calls", "call_logs", "favorites", "agent_overrides", "prompt_library")
+# Dicts of lists that are only ever appended to or replaced, so an unchanged entry is found without re-encoding it
+DURABLE_APPEND_ONLY_KEYS = ("chat_sessions", "chat_archive", "ai_calls", "call_logs")
+# Session keys that are not durable but still belong to the signed-in account
+ACCOUNT_STATE_KEYS = ("sheets_data", "chat_context", "voice_job", "current_spreadsheet", "current_worksheet")
+REDIS_STATE_TTL_SECONDS = 30 * 24 * 3600
+DURABLE_WRITE_ATTEMPTS = 3
+
+try:
+    STATE_BACKEND_URL = st.secrets["STATE_BACKEND_URL"]
+except Exception:
+    STATE_BACKEND_URL = os.environ.get("STATE_BACKEND_URL", "sqlite:///.session_state.sqlite3")
+
+class SQLiteStateBackend:
+    """Per-user durable state in a local SQLite file, shared by every worker on this node"""
+
+    def __init__(self, path):
+        self.description = f"SQLite ({path})"
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS session_state ("
+            "user_id TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, updated_at REAL NOT NULL, "
+            "version INTEGER NOT NULL DEFAULT 0, PRIMARY KEY (user_id, key))"
+        )
+        try:
+            self.conn.execute("ALTER TABLE session_state ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+        except sqlite3.OperationalError:
+            pass
+
+    def load(self, user_id):
+        """{key: (value, version)} for every stored key"""
+        with self.lock:
+            rows = self.conn.execute("SELECT key, value, version FROM session_state WHERE user_id = ?", (user_id,)).fetchall()
+        return {key: (json.loads(value), version) for key, value, version in rows}
+
+    def save(self, user_id, key, value, version):
+        """Write one key if it is still at `version`; False when another session wrote it first"""
+        now = time.time()
+        with self.lock:
+            cursor = self.conn.execute(
+                "INSERT INTO session_state (user_id, key, value, updated_at, version) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (user_id, key) DO UPDATE SET value = excluded.value, updated_at = excluded.updated_at, "
+                "version = excluded.version WHERE session_state.version = ?",
+                (user_id, key, value, now, version + 1, version)
+            )
+        return cursor.rowcount == 1
+
+class RedisStateBackend:
+    """Per-user durable state in a Redis hash, shared by workers on every node"""
+
+    def __init__(self, url):
+        import redis
+        self.description = f"Redis ({url.split('@')[-1]})"
+        self.client = redis.Redis.from_url(url)
+        self.watch_error = redis.WatchError
+
+    def load(self, user_id):
+        """{key: (value, version)} for every stored key; versions live in '<key>:version' fields"""
+        raw = {field.decode(): value for field, value in self.client.hgetall(f"dashboard:state:{user_id}").items()}
+        return {
+            key: (json.loads(value), int(raw.get(f"{key}:version", 0)))
+            for key, value in raw.items() if not key.endswith(":version")
+        }
+
+    def save(self, user_id, key, value, version):
+        """Write one key if it is still at `version`; False when another session wrote it first"""
+        hash_key = f"dashboard:state:{user_id}"
+        with self.client.pipeline() as pipe:
+            try:
+                pipe.watch(hash_key)
+                if int(pipe.hget(hash_key, f"{key}:version") or 0) != version:
+                    return False
+                pipe.multi()
+                pipe.hset(hash_key, mapping={key: value, f"{key}:version": version + 1})
+                pipe.expire(hash_key, REDIS_STATE_TTL_SECONDS)
+                pipe.execute()
+                return True
+            except self.watch_error:
+                return False
+
+@st.cache_resource
+def get_state_backend(url):
+    """Process-wide durable state backend for the configured URL, or None when disabled"""
+    if not url or url == "memory":
+        return None
+    try:
+        if url.startswith(("redis://", "rediss://")):
+            return RedisStateBackend(url)
+        return SQLiteStateBackend(url.removeprefix("sqlite:///"))
+    except Exception as e:
+        logging.getLogger("agent_dashboard").warning("Durable state disabled, %s: %s", url.split('@')[-1], e)
+        return None
+
+def get_user_id():
+    """Durable state owner: the signed-in service account, or None before sign-in"""
+    if not st.session_state.authenticated:
+        return None
+    return st.session_state.account_id
+
+def _durable_digest(encoded):
+    return hashlib.blake2b(encoded.encode(), digest_size=16).digest()
+
+def _durable_rows(key, value):
+    """Stored rows for one key: '<key>/<name>' per entry of a dict-valued key, else the key itself"""
+    if isinstance(value, dict):
+        return {f"{key}/{name}": entry for name, entry in value.items()}
+    return {key: value}
+
+def _durable_value(key, rows):
+    """Rebuild a key from its stored rows; null entry rows are deletions"""
+    whole = rows[key][0] if key in rows else None
+    entries = {row_key.split("/", 1)[1]: value for row_key, (value, _) in rows.items() if row_key != key}
+    if not entries and not isinstance(whole, dict):
+        return whole
+    # A whole-dict row is what older versions stored; entry rows written since take precedence
+    value = {**(whole if isinstance(whole, dict) else {}), **entries}
+    return {name: entry for name, entry in value.items() if entry is not None}
+
+def _durable_record(key, entry, encoded, version):
+    """What this session last synced for one row: the merge base and its digest"""
+    if key in DURABLE_APPEND_ONLY_KEYS and isinstance(entry, list):
+        # Only ever appended to or replaced, so the synced prefix of the live list is the base
+        return {"entry": entry, "size": len(entry), "digest": _durable_digest(encoded), "version": version}
+    return {"entry": json.loads(encoded), "size": None, "digest": _durable_digest(encoded), "version": version}
+
+def _durable_base(record):
+    if record is None:
+        return None
+    return record['entry'] if record['size'] is None else record['entry'][:record['size']]
+
+def merge_durable_entry(base, ours, theirs):
+    """Three-way merge of a row another tab wrote first: removals on either side stick, additions on both are kept"""
+    if ours == base:
+        return theirs
+    lists = [value for value in (ours, theirs) if isinstance(value, list)]
+    if not lists or not all(value is None or isinstance(value, list) for value in (ours, theirs)):
+        return ours
+    # A deleted row counts as an emptied list, so clearing a chat removes what the other tab had synced
+    base, ours, theirs = (value if isinstance(value, list) else [] for value in (base, ours, theirs))
+    item_key = lambda item: json.dumps(item, sort_keys=True)
+    base_keys = {item_key(item) for item in base}
+    removed = base_keys - {item_key(item) for item in ours}
+    merged = [item for item in theirs if item_key(item) not in removed]
+    seen = {item_key(item) for item in merged}
+    return merged + [item for item in ours if item_key(item) not in base_keys and item_key(item) not in seen]
+
+def _set_durable_entry(key, row_key, entry):
+    if row_key == key:
+        st.session_state[key] = entry
+    elif entry is None:
+        st.session_state[key].pop(row_key.split("/", 1)[1], None)
+    else:
+        st.session_state[key][row_key.split("/", 1)[1]] = entry
+
+def load_durable_state():
+    """Restore the signed-in account's durable keys once per sign-in"""
+    user_id = get_user_id()
+    if user_id == st.session_state.user_id:
+        return
+    if st.session_state.user_id is not None:
+        # Signed out or switched accounts: drop everything the previous owner loaded or ran
+        for key in DURABLE_STATE_KEYS + ACCOUNT_STATE_KEYS:
+            del st.session_state[key]
+        initialize_session_state()
+    st.session_state.user_id = user_id
+    st.session_state.durable_synced = {}
+    backend = get_state_backend(STATE_BACKEND_URL)
+    if backend is None or user_id is None:
+        return
+    try:
+        stored = backend.load(user_id)
+    except Exception as e:
+        st.session_state.durable_error = str(e)
+        return
+    for key in DURABLE_STATE_KEYS:
+        rows = {row_key: row for row_key, row in stored.items() if row_key == key or row_key.startswith(f"{key}/")}
+        if not rows:
+            continue
+        st.session_state[key] = _durable_value(key, rows)
+        for row_key, (value, version) in rows.items():
+            st.session_state.durable_synced[row_key] = _durable_record(key, value, json.dumps(value), version)
+
+def _save_durable_row(backend, user_id, key, row_key, entry):
+    """Write one row if it changed since the last sync, merging in a write from another tab"""
+    synced = st.session_state.durable_synced
+    for _ in range(DURABLE_WRITE_ATTEMPTS):
+        record = synced.get(row_key)
+        if record is not None and record['size'] is not None and record['entry'] is entry and len(entry) == record['size']:
+            return
+        encoded = json.dumps(entry)
+        version = record['version'] if record is not None else 0
+        if record is not None and record['digest'] == _durable_digest(encoded):
+            synced[row_key] = _durable_record(key, entry, encoded, version)
+            return
+        if backend.save(user_id, row_key, encoded, version):
+            synced[row_key] = _durable_record(key, entry, encoded, version + 1)
+            return
+        # Another tab wrote this row first: fold its value into ours and retry on top of it
+        stored, stored_version = backend.load(user_id).get(row_key, (None, 0))
+        entry = merge_durable_entry(_durable_base(record), entry, stored)
+        _set_durable_entry(key, row_key, entry)
+        synced[row_key] = _durable_record(key, stored, json.dumps(stored), stored_version)
+
+def save_durable_state():
+    """Write the durable rows that changed since the last sync, merging in writes from the account's other tabs"""
+    backend = get_state_backend(STATE_BACKEND_URL)
+    user_id = st.session_state.user_id
+    if backend is None or user_id is None:
+        return
+    try:
+        for key in DURABLE_STATE_KEYS:
+            value = st.session_state[key]
+            rows = _durable_rows(key, value)
+            if isinstance(value, dict):
+                # Entries removed since the last sync are written as null rows
+                rows.update((row_key, None) for row_key in st.session_state.durable_synced
+                            if row_key.startswith(f"{key}/") and row_key not in rows)
+            for row_key, entry in rows.items():
+                _save_durable_row(backend, user_id, key, row_key, entry)
+        st.session_state.durable_error = None
+    except Exception as e:
+        st.session_state.durable_error = str(e)
+
 # Initialize session state
 initialize_session_state()
+load_durable_state()
+# Flush anything the previous run changed before it called st.rerun()
+save_durable_state()
+begin_profiled_run()
+
+# Agent and prompt accessors
+def get_agent_configs():
+    """Shared agent configs with this session's overrides layered on top"""
+    overrides = st.session_state.agent_overrides
+    if not overrides:
+        return AGENTS_CONFIG
+
+    merged = dict(AGENTS_CONFIG)
+    for agent_id, fields in overrides.items():
+        if agent_id in merged:
+            merged[agent_id] = MappingProxyType({**merged[agent_id], **fields})
+    return merged
+
+def get_agent_config(agent_id):
+    """Config for one agent, copying it only if this session overrides it"""
+    fields = st.session_state.agent_overrides.get(agent_id)
+    if not fields:
+        return AGENTS_CONFIG[agent_id]
+    return MappingProxyType({**AGENTS_CONFIG[agent_id], **fields})
+
+def set_agent_override(agent_id, fields):
+    """Record per-session changes to an agent without touching the shared registry"""
+    st.session_state.agent_overrides[agent_id] = {
+        **st.session_state.agent_overrides.get(agent_id, {}),
+        **fields
+    }
+
+def get_prompt_library():
+    """This session's prompt library, or the shared default if never modified"""
+    if st.session_state.prompt_library is None:
+        return AGENT_REGISTRY['prompt_library']
+    return st.session_state.prompt_library
+
+def get_mutable_prompt_library():
+    """Copy the shared prompt library into this session on first write"""
+    if st.session_state.prompt_library is None:
+        st.session_state.prompt_library = _thaw(AGENT_REGISTRY['prompt_library'])
+    return st.session_state.prompt_library
+
+# Google Sheets client pool
+TOKEN_REFRESH_MARGIN = timedelta(minutes=5)
+TOKEN_REFRESH_INTERVAL_SECONDS = 60
+
+def _token_expiring(credentials):
+    """True if the access token is missing or expires within the refresh margin"""
+    if not credentials.valid or credentials.expiry is None:
+        return True
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    return credentials.expiry - TOKEN_REFRESH_MARGIN <= now
+
+def _refresh_pooled_tokens(pool):
+    """Background loop that refreshes pooled tokens before they expire"""
+    while True:
+        time.sleep(TOKEN_REFRESH_INTERVAL_SECONDS)
+        with pool['lock']:
+            entries = list(pool['clients'].items())
+
+        for credentials_key, entry in entries:
+            try:
+                if _token_expiring(entry['credentials']):
+                    entry['credentials'].refresh(Request())
+            except Exception as e:
+                print(f"⚠️ Token refresh failed for {credentials_key}: {str(e)}")
+
+@st.cache_resource
+def get_gspread_pool():
+    """Process-wide gspread clients keyed by service-account identity"""
+    pool = {"clients": {}, "lock": threading.Lock()}
+    threading.Thread(
+        target=_refresh_pooled_tokens,
+        args=(pool,),
+        name="gspread-token-refresh",
+        daemon=True
+    ).start()
+    return pool
+
+def get_gspread_client(credentials_key, credentials):
+    """Shared authorized client for these credentials, built on first use"""
+    pool = get_gspread_pool()
+    with pool['lock']:
+        entry = pool['clients'].get(credentials_key)
+        if entry is None:
+            if _token_expiring(credentials):
+                credentials.refresh(Request())
+            entry = {"client": gspread.authorize(credentials), "credentials": credentials}
+            pool['clients'][credentials_key] = entry
+    return entry['client']
+
+# Google Sheets API scheduler
+# Default Sheets read quotas: 300 requests/min per project, 60/min per user
+SHEETS_PROJECT_READS_PER_MINUTE = 300
+SHEETS_USER_READS_PER_MINUTE = 60
+SHEETS_MAX_RETRIES = 5
+SHEETS_BACKOFF_BASE_SECONDS = 1.0
+SHEETS_BACKOFF_MAX_SECONDS = 64.0
+SHEETS_RETRYABLE_CODES = (429, 500, 503)
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 1
+
+class TokenBucket:
+    """Token bucket refilled continuously to a per-minute quota"""
+
+    def __init__(self, per_minute):
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self.tokens = float(per_minute)
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, cost):
+        """Seconds until cost tokens are available"""
+        self._refill()
+        return max(0.0, (cost - self.tokens) / self.rate)
+
+    def consume(self, cost):
+        self.tokens -= cost
+
+    def drain(self):
+        """Empty the bucket after Google reports the quota exhausted"""
+        self._refill()
+        self.tokens = min(self.tokens, 0.0)
+
+def is_retryable_sheets_error(error):
+    """True for quota (429) and transient server errors from the Sheets API"""
+    if not isinstance(error, gspread.exceptions.APIError):
+        return False
+    code = getattr(error, 'code', None)
+    if code in (None, -1) and getattr(error, 'response', None) is not None:
+        code = error.response.status_code
+    return code in SHEETS_RETRYABLE_CODES
+
+class SheetsApiScheduler:
+    """Process-wide scheduler that paces Sheets API reads to Google's quota windows.
+
+    Identical in-flight requests share one future, interactive work is granted
+    tokens before background work, and quota errors are retried with jittered
+    exponential backoff instead of reaching the user.
+    """
+
+    def __init__(self, max_workers=4):
+        self._cond = threading.Condition()
+        self._queue = []
+        self._delayed = []
+        self._inflight = {}
+        self._seq = 0
+        self._project_bucket = TokenBucket(SHEETS_PROJECT_READS_PER_MINUTE)
+        self._user_buckets = {}
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="sheets-api")
+        threading.Thread(target=self._dispatch_loop, name="sheets-scheduler", daemon=True).start()
+
+    def submit(self, key, fn, *args, cost=1, priority=PRIORITY_INTERACTIVE, quota_key=None):
+        """Schedule fn(*args), joining an identical in-flight request if there is one"""
+        with self._cond:
+            job = self._inflight.get(key)
+            if job is not None:
+                if priority < job['priority'] and job['state'] == 'queued':
+                    # Promote a queued background request someone is now waiting on
+                    job['priority'] = priority
+                    self._push(job)
+                return job['future']
+
+            job = {
+                "key": key,
+                "fn": fn,
+                "args": args,
+                "cost": cost,
+                "priority": priority,
+                "quota_key": quota_key,
+                "attempt": 0,
+                "state": "queued",
+                "future": Future()
+            }
+            self._inflight[key] = job
+            self._push(job)
+            return job['future']
+
+    def acquire(self, cost, quota_key=None):
+        """Block a running job until cost more reads fit the quota, e.g. between pages of a sheet"""
+        with self._cond:
+            buckets = self._buckets({"quota_key": quota_key})
+            while True:
+                wait = max(bucket.wait_time(cost) for bucket in buckets)
+                if wait <= 0:
+                    break
+                self._cond.wait(wait)
+            for bucket in buckets:
+                bucket.consume(cost)
+
+    def _push(self, job):
+        self._seq += 1
+        heapq.heappush(self._queue, (job['priority'], self._seq, job))
+        self._cond.notify()
+
+    def _buckets(self, job):
+        buckets = [self._project_bucket]
+        if job['quota_key'] is not None:
+            if job['quota_key'] not in self._user_buckets:
+                self._user_buckets[job['quota_key']] = TokenBucket(SHEETS_USER_READS_PER_MINUTE)
+            buckets.append(self._user_buckets[job['quota_key']])
+        return buckets
+
+    def _dispatch_loop(self):
+        while True:
+            with self._cond:
+                now = time.monotonic()
+                while self._delayed and self._delayed[0][0] <= now:
+                    _, _, job = heapq.heappop(self._delayed)
+                    self._push(job)
+
+                if not self._queue:
+                    timeout = self._delayed[0][0] - now if self._delayed else None
+                    self._cond.wait(timeout)
+                    continue
+
+                priority, _, job = self._queue[0]
+                if job['state'] != 'queued' or priority != job['priority']:
+                    # Stale entry left behind by a priority promotion
+                    heapq.heappop(self._queue)
+                    continue
+
+                buckets = self._buckets(job)
+                wait = max(bucket.wait_time(job['cost']) for bucket in buckets)
+                if wait > 0:
+                    # Woken early if more urgent work arrives
+                    self._cond.wait(wait)
+                    continue
+
+                heapq.heappop(self._queue)
+                for bucket in buckets:
+                    bucket.consume(job['cost'])
+                job['state'] = 'running'
+
+            self._executor.submit(self._run, job)
+
+    def _run(self, job):
+        try:
+            result = job['fn'](*job['args'])
+        except Exception as e:
+            with self._cond:
+                if is_retryable_sheets_error(e) and job['attempt'] < SHEETS_MAX_RETRIES:
+                    for bucket in self._buckets(job):
+                        bucket.drain()
+                    backoff = min(SHEETS_BACKOFF_MAX_SECONDS, SHEETS_BACKOFF_BASE_SECONDS * 2 ** job['attempt'])
+                    job['attempt'] += 1
+                    job['state'] = 'queued'
+                    self._seq += 1
+                    heapq.heappush(self._delayed, (time.monotonic() + random.uniform(0, backoff), self._seq, job))
+                    self._cond.notify()
+                    return
+                self._inflight.pop(job['key'], None)
+            job['future'].set_exception(e)
+            return
+
+        with self._cond:
+            self._inflight.pop(job['key'], None)
+        job['future'].set_result(result)
+
+@st.cache_resource
+def get_sheets_scheduler():
+    """The single Sheets API scheduler shared by every session in this process"""
+    return SheetsApiScheduler()
+
+# Shared sheet cache and prefetch
+# Cached sheets are served immediately; a Drive metadata probe decides whether they need re-reading
+SHEET_REVALIDATE_SECONDS = 60
+SHEET_CACHE_TTL_SECONDS = 300
+SHEET_WATCH_SECONDS = 5
+DRIVE_FILES_URL = "https://www.googleapis.com/drive/v3/files/"
+
+# Bytes of compacted frames the shared cache keeps in memory; least recently used ones spill to disk
+try:
+    SHEET_CACHE_BUDGET_BYTES = int(st.secrets["SHEET_CACHE_BUDGET_MB"]) * 1024 * 1024
+except Exception:
+    SHEET_CACHE_BUDGET_BYTES = int(os.environ.get("SHEET_CACHE_BUDGET_MB", 1024)) * 1024 * 1024
+
+@st.cache_resource
+def get_sheet_cache():
+    """Loaded frames keyed by (service account, spreadsheet ID), shared by all sessions"""
+    return {"entries": {}, "lock": threading.Lock()}
+
+def peek_cached_sheet(cache_key):
+    """Cache entry for a sheet without marking it used or reading back a spilled frame"""
+    cache = get_sheet_cache()
+    with cache['lock']:
+        return cache['entries'].get(cache_key)
+
+def get_cached_sheet(cache_key):
+    """Cache entry for a sheet, however old; revalidate_sheet keeps it fresh"""
+    cache = get_sheet_cache()
+    with cache['lock']:
+        entry = cache['entries'].get(cache_key)
+        if entry is None:
+            return None
+        entry['used_at'] = time.monotonic()
+        if entry['df'] is not None:
+            return entry
+        spill_path = entry['spill_path']
+
+    # Read a spilled frame back outside the lock
+    try:
+        df = pd.read_pickle(spill_path)
+    except Exception:
+        invalidate_cached_sheet(cache_key)
+        return None
+    with cache['lock']:
+        if entry['df'] is None:
+            entry['df'] = df
+    enforce_sheet_cache_budget()
+    return entry
+
+def invalidate_cached_sheet(cache_key):
+    cache = get_sheet_cache()
+    with cache['lock']:
+        entry = cache['entries'].pop(cache_key, None)
+    if entry and entry.get('spill_path'):
+        Path(entry['spill_path']).unlink(missing_ok=True)
+
+@st.cache_resource
+def get_spill_dir():
+    """Private directory for frames spilled out of the sheet cache, removed at exit"""
+    spill_dir = Path(tempfile.mkdtemp(prefix="agent-dashboard-spill-"))
+    atexit.register(shutil.rmtree, spill_dir, ignore_errors=True)
+    return spill_dir
+
+def enforce_sheet_cache_budget():
+    """Spill the least recently used frames to disk until the cache fits SHEET_CACHE_BUDGET_BYTES.
+
+    The most recently used frame always stays in memory. A spilled entry
+    keeps its revision and metadata and is read back on its next use.
+    """
+    cache = get_sheet_cache()
+    with cache['lock']:
+        resident = sorted(
+            ((key, entry) for key, entry in cache['entries'].items() if entry['df'] is not None),
+            key=lambda item: item[1]['used_at']
+        )
+        excess = sum(entry['bytes'] for _, entry in resident) - SHEET_CACHE_BUDGET_BYTES
+        victims = []
+        for key, entry in resident[:-1]:
+            if excess <= 0:
+                break
+            victims.append((key, entry, entry['df'], entry['used_at']))
+            excess -= entry['bytes']
+
+    for key, entry, df, used_at in victims:
+        name = hashlib.blake2b(repr(key).encode(), digest_size=8).hexdigest()
+        spill_path = get_spill_dir() / f"{name}-{entry['revision']}.pkl"
+        try:
+            if not spill_path.exists():
+                df.to_pickle(spill_path)
+        except Exception as e:
+            print(f"⚠️ Could not spill {key[1]} to disk: {str(e)}")
+            continue
+        with cache['lock']:
+            # Skip entries that were replaced or used again while the frame was written
+            if cache['entries'].get(key) is entry and entry['used_at'] == used_at:
+                entry['df'] = None
+                entry['spill_path'] = str(spill_path)
+
+def get_drive_session(credentials_key, credentials):
+    """Authorized HTTP session for Drive metadata calls, pooled next to the gspread client"""
+    get_gspread_client(credentials_key, credentials)
+    pool = get_gspread_pool()
+    with pool['lock']:
+        entry = pool['clients'][credentials_key]
+        if 'drive' not in entry:
+            entry['drive'] = AuthorizedSession(entry['credentials'])
+    return entry['drive']
+
+def probe_sheet_version(drive, spreadsheet_id):
+    """Drive (version, modifiedTime) of a spreadsheet from one files.get call; (None, None) if unavailable"""
+    try:
+        reply = drive.get(
+            DRIVE_FILES_URL + spreadsheet_id,
+            params={"fields": "version,modifiedTime", "supportsAllDrives": "true"},
+            timeout=10
+        )
+        reply.raise_for_status()
+        metadata = reply.json()
+        return metadata.get('version'), metadata.get('modifiedTime')
+    except Exception as e:
+        print(f"⚠️ Drive probe failed for {spreadsheet_id}: {str(e)}")
+        return None, None
+
+@st.cache_resource
+def get_sheet_load_progress():
+    """(rows read, rows expected) of every sheet load in progress, keyed like the sheet cache"""
+    return {}
+
+def _fetch_and_cache(gc, drive, cache_key, spreadsheet_info):
+    """Scheduler job: load a sheet and publish it to the shared cache"""
+    progress = get_sheet_load_progress()
+    
+    def on_page(rows_read, rows_total):
+        # The first page is covered by the job's own cost; later pages each pay one read
+        if rows_read:
+            get_sheets_scheduler().acquire(1, quota_key=cache_key[0])
+        progress[cache_key] = (rows_read, rows_total)
+    
+    # Probe first, so an edit made during the download shows up as a newer version next time
+    version, modified_time = probe_sheet_version(drive, spreadsheet_info['id'])
+    try:
+        df, error = fetch_sheet_frame(gc, spreadsheet_info, on_page=on_page)
+    finally:
+        progress.pop(cache_key, None)
+    if df is not None:
+        df, memory = compact_frame(df)
+        now = time.monotonic()
+        cache = get_sheet_cache()
+        with cache['lock']:
+            replaced = cache['entries'].get(cache_key)
+            cache['entries'][cache_key] = {
+                "df": df,
+                "memory": memory,
+                "bytes": int(memory['bytes_after'].sum()),
+                "rows": len(df),
+                "spill_path": None,
+                "loaded_at": now,
+                "checked_at": now,
+                "used_at": now,
+                "version": version,
+                "modified_time": modified_time,
+                "revision": int(version) if version else time.time_ns()
+            }
+        if replaced and replaced.get('spill_path'):
+            Path(replaced['spill_path']).unlink(missing_ok=True)
+        enforce_sheet_cache_budget()
+    return df, error
+
+def _revalidate_and_cache(gc, drive, cache_key, spreadsheet_info):
+    """Scheduler job: re-read a cached sheet only if its Drive version moved on"""
+    entry = peek_cached_sheet(cache_key)
+    version, modified_time = probe_sheet_version(drive, spreadsheet_info['id'])
+    if entry is not None:
+        unchanged = version is not None and version == entry['version']
+        # Without Drive metadata, fall back to re-reading once the TTL has passed
+        fresh = version is None and time.monotonic() - entry['loaded_at'] < SHEET_CACHE_TTL_SECONDS
+        if unchanged or fresh:
+            with get_sheet_cache()['lock']:
+                entry['checked_at'] = time.monotonic()
+                entry['modified_time'] = modified_time or entry['modified_time']
+            return
+
+    # open_by_key, worksheets and the first page are three reads
+    get_sheets_scheduler().submit(
+        ("sheet",) + cache_key,
+        _fetch_and_cache, gc, drive, cache_key, spreadsheet_info,
+        cost=3, priority=PRIORITY_BACKGROUND, quota_key=cache_key[0]
+    )
+
+def schedule_sheet_load(spreadsheet_info, priority):
+    """Queue a load of spreadsheet_info for this session's credentials, joining any in flight"""
+    credentials_key = st.session_state.credentials_key
+    cache_key = (credentials_key, spreadsheet_info['id'])
+    gc = get_gspread_client(credentials_key, st.session_state.credentials)
+    drive = get_drive_session(credentials_key, st.session_state.credentials)
+
+    # open_by_key, worksheets and the first page are three reads; later pages pay as they go
+    return get_sheets_scheduler().submit(
+        ("sheet",) + cache_key,
+        _fetch_and_cache, gc, drive, cache_key, spreadsheet_info,
+        cost=3, priority=priority, quota_key=credentials_key
+    )
+
+def schedule_sheet_preview(spreadsheet_info):
+    """Queue a preview read of spreadsheet_info ahead of queued background work"""
+    credentials_key = st.session_state.credentials_key
+    gc = get_gspread_client(credentials_key, st.session_state.credentials)
+    
+    # open_by_key, worksheets and one range read
+    return get_sheets_scheduler().submit(
+        ("preview", credentials_key, spreadsheet_info['id']),
+        fetch_sheet_preview, gc, spreadsheet_info,
+        cost=3, priority=PRIORITY_INTERACTIVE, quota_key=credentials_key
+    )
+
+def revalidate_sheet(spreadsheet_info):
+    """Probe a cached sheet's Drive version in the background once it is due; never blocks"""
+    if not st.session_state.authenticated:
+        return
+    credentials_key = st.session_state.credentials_key
+    cache_key = (credentials_key, spreadsheet_info['id'])
+    entry = peek_cached_sheet(cache_key)
+    if entry is None or time.monotonic() - entry['checked_at'] < SHEET_REVALIDATE_SECONDS:
+        return
+    gc = get_gspread_client(credentials_key, st.session_state.credentials)
+    drive = get_drive_session(credentials_key, st.session_state.credentials)
+
+    # The probe is a Drive call and does not count against the Sheets read quota
+    get_sheets_scheduler().submit(
+        ("probe",) + cache_key,
+        _revalidate_and_cache, gc, drive, cache_key, spreadsheet_info,
+        cost=0, priority=PRIORITY_BACKGROUND, quota_key=credentials_key
+    )
+
+def prefetch_spreadsheet(spreadsheet_info):
+    """Warm the shared cache for a sheet on a worker thread without waiting for it"""
+    if not st.session_state.authenticated:
+        return
+    if peek_cached_sheet((st.session_state.credentials_key, spreadsheet_info['id'])) is None:
+        schedule_sheet_load(spreadsheet_info, PRIORITY_BACKGROUND)
+    else:
+        revalidate_sheet(spreadsheet_info)
 
 # Authentication functions
 def authenticate_service_account(json_content):
@@ -452,19 +1190,248 @@ def authenticate_service_account(json_content):
         )
         
         email = json_content.get('client_email', 'Service Account')
+        credentials_key = f"{email}:{json_content.get('private_key_id', '')}"
+        
+        # Build (or join) the pooled client now so data loads never pay for it
+        get_gspread_client(credentials_key, credentials)
         
         st.session_state.authenticated = True
         st.session_state.credentials = credentials
+        st.session_state.credentials_key = credentials_key
+        # Durable state is keyed on the private key itself, so only its holder can restore it
+        st.session_state.account_id = hashlib.blake2b(
+            f"{email}\n{json_content.get('private_key', '')}".encode(), digest_size=16
+        ).hexdigest()
         st.session_state.user_info = {'email': email, 'name': 'Service Account'}
         
+        # Warm every real spreadsheet concurrently while the dashboard renders
+        for spreadsheet_info in REAL_SPREADSHEETS.values():
+            prefetch_spreadsheet(spreadsheet_info)
+        
         return True, "Google authentication successful!"
     except Exception as e:
         return False, f"Google authentication failed: {str(e)}"
 
+# Webhook batching
+# With WEBHOOK_BATCH_URL set, live messages to the same endpoint are coalesced and posted together
+try:
+    WEBHOOK_BATCH_URL = st.secrets["WEBHOOK_BATCH_URL"]
+except Exception:
+    WEBHOOK_BATCH_URL = os.environ.get("WEBHOOK_BATCH_URL")
+
+WEBHOOK_BATCH_WINDOW_SECONDS = float(os.environ.get("WEBHOOK_BATCH_WINDOW_MS", 50)) / 1000
+WEBHOOK_BATCH_MAX_SIZE = 25
+WEBHOOK_BATCH_SENDERS = 8
+# Callers wait out the batch window and the HTTP timeout, plus slack for a queued sender
+WEBHOOK_BATCH_WAIT_SECONDS = WEBHOOK_BATCH_WINDOW_SECONDS + WEBHOOK_TIMEOUT_SECONDS + 5
+
+class WebhookBatcher:
+    """Coalesces webhook messages bound for the same endpoint into batched posts.
+
+    Messages arriving within the batch window of the first one are posted
+    together to WEBHOOK_BATCH_URL as {"batch": [...]}; the n8n batch workflow
+    answers with one {"requestId", "output"} item per message, which is routed
+    back to the waiting caller's Future. A batch of one goes to the agent's
+    webhook unchanged.
+    """
+
+    def __init__(self, batch_url, window, max_size):
+        self._batch_url = batch_url
+        self._window = window
+        self._max_size = max_size
+        self._pending = {}
+        self._cond = threading.Condition()
+        self._senders = ThreadPoolExecutor(max_workers=WEBHOOK_BATCH_SENDERS, thread_name_prefix="webhook-batch")
+        self.stats = {"messages": 0, "requests": 0, "batched_messages": 0}
+        threading.Thread(target=self._dispatch_loop, name="webhook-batcher", daemon=True).start()
+
+    def submit(self, url, token, payload):
+        """Queue one message; the Future resolves to the agent's answer"""
+        future = Future()
+        with self._cond:
+            batch = self._pending.setdefault((url, token), {"deadline": time.monotonic() + self._window, "items": []})
+            batch['items'].append(({**payload, "requestId": uuid.uuid4().hex}, future))
+            if len(batch['items']) >= self._max_size:
+                batch['deadline'] = 0
+            self.stats['messages'] += 1
+            self._cond.notify()
+        return future
+
+    def _dispatch_loop(self):
+        while True:
+            with self._cond:
+                now = time.monotonic()
+                due = [key for key, batch in self._pending.items() if batch['deadline'] <= now]
+                if not due:
+                    next_deadline = min((batch['deadline'] for batch in self._pending.values()), default=None)
+                    self._cond.wait(None if next_deadline is None else next_deadline - now)
+                    continue
+                ready = [(key, self._pending.pop(key)['items']) for key in due]
+            for (url, token), items in ready:
+                self._senders.submit(self._send, url, token, items)
+
+    def _send(self, url, token, items):
+        headers = {
+            "Authorization": f"Bearer {token}",
+            "Content-Type": "application/json"
+        }
+        try:
+            if len(items) == 1:
+                payload, future = items[0]
+                reply = requests.post(url, headers=headers, json=payload, timeout=WEBHOOK_TIMEOUT_SECONDS)
+                reply.raise_for_status()
+                future.set_result(parse_webhook_reply(reply))
+                return
+            reply = requests.post(
+                self._batch_url, headers=headers,
+                json={"batch": [payload for payload, _ in items]},
+                timeout=WEBHOOK_TIMEOUT_SECONDS
+            )
+            reply.raise_for_status()
+            answers = parse_batch_webhook_reply(reply.json())
+            for payload, future in items:
+                if payload['requestId'] in answers:
+                    future.set_result(answers[payload['requestId']])
+                else:
+                    future.set_exception(RuntimeError("Batch reply had no answer for this message"))
+        except Exception as e:
+            for _, future in items:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            with self._cond:
+                self.stats['requests'] += 1
+                if len(items) > 1:
+                    self.stats['batched_messages'] += len(items)
+
+@st.cache_resource
+def get_webhook_batcher(batch_url):
+    """Process-wide batcher shared by every session"""
+    return WebhookBatcher(batch_url, WEBHOOK_BATCH_WINDOW_SECONDS, WEBHOOK_BATCH_MAX_SIZE)
+
+def render_webhook_batch_metrics():
+    """Batching counters in Prometheus text exposition format"""
+    if not WEBHOOK_BATCH_URL:
+        return ""
+    stats = dict(get_webhook_batcher(WEBHOOK_BATCH_URL).stats)
+    return (
+        "# HELP dashboard_webhook_messages_total Chat messages submitted to the webhook batcher\n"
+        "# TYPE dashboard_webhook_messages_total counter\n"
+        f"dashboard_webhook_messages_total {stats['messages']}\n"
+        "# HELP dashboard_webhook_requests_total HTTP requests sent to n8n by the batcher\n"
+        "# TYPE dashboard_webhook_requests_total counter\n"
+        f"dashboard_webhook_requests_total {stats['requests']}\n"
+        "# HELP dashboard_webhook_batched_messages_total Messages that travelled in a multi-message batch\n"
+        "# TYPE dashboard_webhook_batched_messages_total counter\n"
+        f"dashboard_webhook_batched_messages_total {stats['batched_messages']}\n"
+    )
+
+# Conversation context
+# n8n keys its conversation memory on sessionId, so one conversation keeps one id across messages
+CHAT_SESSION_NAMESPACE = uuid.UUID("6f1c9a52-3b8e-5d47-9a0e-2c64b1f7d803")
+
+try:
+    CONTEXT_BUDGET_BYTES = int(st.secrets["CONTEXT_BUDGET_BYTES"])
+except Exception:
+    CONTEXT_BUDGET_BYTES = int(os.environ.get("CONTEXT_BUDGET_BYTES", 2048))
+
+CONTEXT_RECENT_TURN_CHARS = 600
+CONTEXT_SUMMARY_TURN_CHARS = 120
+
+def get_chat_session_id(agent_id):
+    """Stable sessionId for this user's current conversation with an agent"""
+    epoch = st.session_state.chat_epochs.get(agent_id, 0)
+    return str(uuid.uuid5(CHAT_SESSION_NAMESPACE, f"{st.session_state.user_id}:{agent_id}:{epoch}"))
+
+def reset_chat_conversation(agent_id):
+    """Clear the transcript and start a fresh n8n session for the agent"""
+    st.session_state.chat_sessions[agent_id] = []
+    st.session_state.chat_archive.pop(agent_id, None)
+    st.session_state.chat_epochs[agent_id] = st.session_state.chat_epochs.get(agent_id, 0) + 1
+    st.session_state.chat_context.pop(agent_id, None)
+
+def _context_turn(message, limit):
+    text = " ".join(message['content'].split())
+    if len(text) > limit:
+        text = text[:limit - 1] + "…"
+    return {"role": message['role'], "content": text}
+
+def _context_size(summary, recent):
+    return len(json.dumps({"summary": summary, "recent": recent}, ensure_ascii=False).encode("utf-8"))
+
+def build_chat_context(agent_id, history):
+    """Earlier turns compacted to CONTEXT_BUDGET_BYTES: recent turns trimmed, older ones folded into a summary.
+
+    The summary is kept per agent and only grows by the turns folded since the
+    last message, so each call does work proportional to the budget rather
+    than to the length of the conversation.
+    """
+    if CONTEXT_BUDGET_BYTES <= 0 or not history:
+        return None
+    state = st.session_state.chat_context.setdefault(agent_id, {"summary": [], "folded": 0, "bytes": 0})
+    if state['folded'] > len(history):
+        state.update(summary=[], folded=0)
+
+    recent = [_context_turn(message, CONTEXT_RECENT_TURN_CHARS) for message in history[state['folded']:]]
+    summary = state['summary']
+    while len(recent) > 1 and _context_size(summary, recent) > CONTEXT_BUDGET_BYTES:
+        folded = recent.pop(0)
+        summary.append(f"{folded['role']}: {folded['content'][:CONTEXT_SUMMARY_TURN_CHARS]}")
+        state['folded'] += 1
+    # Oldest summary lines go first once the summary itself crowds out the recent turns
+    while summary and _context_size(summary, recent) > CONTEXT_BUDGET_BYTES:
+        summary.pop(0)
+    while _context_size(summary, recent) > CONTEXT_BUDGET_BYTES and len(recent[-1]['content']) > 1:
+        recent[-1] = _context_turn(recent[-1], len(recent[-1]['content']) // 2)
+
+    state['bytes'] = _context_size(summary, recent)
+    return {"summary": "\n".join(summary), "recent": recent}
+
 # Helper functions
-def send_message_to_webhook(agent_id, message):
+def parse_webhook_reply(reply):
+    """Extract the agent's answer from an n8n webhook response"""
+    try:
+        body = reply.json()
+    except ValueError:
+        return parse_streamed_webhook_reply(reply.text)
+    if isinstance(body, list) and body:
+        body = body[0]
+    return webhook_answer(body)
+
+def webhook_answer(body):
+    """The answer field of one n8n reply item"""
+    if isinstance(body, dict):
+        for field in ("output", "response", "text"):
+            if body.get(field):
+                return str(body[field])
+    return json.dumps(body)
+
+def parse_batch_webhook_reply(body):
+    """Map requestId to answer for a batched n8n reply ([...] or {"results": [...]})"""
+    if isinstance(body, dict):
+        body = body.get("results", [])
+    return {
+        item["requestId"]: webhook_answer(item)
+        for item in body
+        if isinstance(item, dict) and item.get("requestId")
+    }
+
+def parse_streamed_webhook_reply(text):
+    """Join the item chunks of a streamed (newline-delimited JSON) n8n response"""
+    chunks = []
+    for line in text.splitlines():
+        try:
+            event = json.loads(line)
+        except ValueError:
+            return text
+        if isinstance(event, dict) and event.get("type") == "item":
+            chunks.append(str(event.get("content", "")))
+    return "".join(chunks) if chunks else text
+
+@profile_span("send_message_to_webhook")
+def send_message_to_webhook(agent_id, message, session_id=None, context=None, data_digest=None):
     """Send message to n8n webhook"""
-    config = st.session_state.agent_configs[agent_id]
+    config = get_agent_config(agent_id)
     
     headers = {
         "Authorization": f"Bearer {config['bearer_token']}",
@@ -472,59 +1439,365 @@ def send_message_to_webhook(agent_id, message):
     }
     
     payload = {
-        "sessionId": str(uuid.uuid4()),
+        "sessionId": session_id or str(uuid.uuid4()),
         "chatInput": message,
         "agentId": agent_id,
         "agentName": config['name'],
         "timestamp": datetime.now().isoformat()
     }
+    if context:
+        payload["context"] = context
+    if data_digest:
+        payload["dataDigest"] = data_digest
     
-    # Simulate different responses based on agent specialization
-    specializations = {
-        "Agent_CEO": "As your CEO agent, I'll help you with strategic decisions and leadership challenges.",
-        "Agent_Social": "I'll help you create engaging social media content and develop your digital marketing strategy.",
-        "Agent_Mindset": "Let's work on developing a growth mindset and overcoming limiting beliefs.",
-        "Agent_Blogger": "I'll help you create compelling blog content that engages your audience.",
-        "Agent_Grant": "I'll assist you in writing compelling grant proposals and finding funding opportunities.",
-        "Agent_Prayer_AI": "I'm here to provide spiritual guidance and help with prayer requests.",
-        "Agent_Metrics": "Let me help you analyze your KPIs and performance metrics.",
-        "Agent_Researcher": "I'll help you conduct thorough research and analyze data.",
-        "Agent_Investor": "I'll provide investment analysis and portfolio management advice.",
-        "Agent_Newsroom": "I'll help you stay updated with the latest news and create journalistic content.",
-        "STREAMLIT_Agent": "I'll help you build amazing Streamlit applications and Python code.",
-        "HTML_CSS_Agent": "I'll assist you with web development, HTML, CSS, and frontend design.",
-        "Business_Plan_Agent": "I'll help you create comprehensive business plans and strategies.",
-        "Ecom_Agent": "I'll help you optimize your e-commerce operations and increase sales.",
-        "Agent_Health": "I'll provide health and wellness guidance (not medical advice).",
-        "Cinch_Closer": "I'll help you close deals and improve your sales techniques.",
-        "DISC_Agent": "I'll help you understand personality types and improve team dynamics.",
-        "Biz_Plan_Agent": "I'll assist with advanced business modeling and financial planning.",
-        "Invoice_Agent": "I'll help you manage invoices and automate your billing processes.",
-        "Agent_Clone": "I'll help you replicate and customize AI agents for your needs.",
-        "Agent_Doctor": "I'll provide general health information (consult real doctors for medical advice).",
-        "Agent_Multi_Lig": "I'll help you with translation and multi-language communication.",
-        "Agent_Real_Estate": "I'll assist with property analysis and real estate investment strategies.",
-        "Follow_Up_Agent": "I'll help you manage customer relationships and follow-up strategies."
-    }
-    
-    base_response = specializations.get(agent_id, "I'm here to help you with your request.")
+    base_response = config.get('greeting', "I'm here to help you with your request.")
     
+    started = time.perf_counter()
     try:
-        # In production, you would make actual API call to n8n webhook
-        # response = requests.post(config['webhook_url'], headers=headers, json=payload)
-        
-        # Simulate processing time
-        time.sleep(1)
-        response = f"{base_response}\n\nRegarding your message: '{message}'\n\nI'm processing this with my specialized knowledge in {config['specialization']}. How can I assist you further?"
+        if WEBHOOK_MODE == "live" and WEBHOOK_BATCH_URL:
+            batcher = get_webhook_batcher(WEBHOOK_BATCH_URL)
+            response = batcher.submit(config['webhook_url'], config['bearer_token'], payload).result(timeout=WEBHOOK_BATCH_WAIT_SECONDS)
+        elif WEBHOOK_MODE == "live":
+            reply = requests.post(config['webhook_url'], headers=headers, json=payload, timeout=WEBHOOK_TIMEOUT_SECONDS)
+            reply.raise_for_status()
+            response = parse_webhook_reply(reply)
+        else:
+            # Simulate processing time
+            time.sleep(1)
+            response = f"{base_response}\n\nRegarding your message: '{message}'\n\nI'm processing this with my specialized knowledge in {config['specialization']}. How can I assist you further?"
+        record_latency(agent_id, "webhook", time.perf_counter() - started)
         return response
+    except FutureTimeoutError:
+        record_latency(agent_id, "webhook", time.perf_counter() - started, error=True)
+        return f"Error: {config['name']} did not answer within {WEBHOOK_BATCH_WAIT_SECONDS:.0f} seconds. Please try again."
     except Exception as e:
-        return f"Error: {str(e)}"
+        record_latency(agent_id, "webhook", time.perf_counter() - started, error=True)
+        return f"Error: {str(e) or type(e).__name__}"
+
+# Frame compaction
+# Text columns with at most this share of distinct values become categoricals
+COMPACT_CATEGORY_MAX_RATIO = 0.5
+
+def _compact_column(col):
+    """The column in the smallest dtype that holds its values exactly"""
+    if len(col) == 0 or pd.api.types.is_bool_dtype(col) or pd.api.types.is_datetime64_any_dtype(col):
+        return col
+    if pd.api.types.is_integer_dtype(col):
+        return pd.to_numeric(col, downcast='integer')
+    if pd.api.types.is_float_dtype(col):
+        narrow = col.astype('float32')
+        return narrow if narrow.astype('float64').equals(col.astype('float64')) else col
+    if pd.api.types.is_object_dtype(col) or pd.api.types.is_string_dtype(col):
+        # Mixed-type columns stay as they are
+        if pd.api.types.infer_dtype(col, skipna=True) != 'string':
+            return col
+        if col.nunique() <= COMPACT_CATEGORY_MAX_RATIO * len(col):
+            return col.astype('category')
+        return col.astype(pd.StringDtype("pyarrow"))
+    return col
+
+def compact_frame(df):
+    """Shrink a loaded sheet's dtypes without changing its values.
+
+    Integers are downcast, floats become float32 when that is lossless, and
+    text columns become categoricals when values repeat or Arrow-backed
+    strings otherwise. Returns (compacted frame, per-column memory report).
+    """
+    compacted = pd.concat([_compact_column(df.iloc[:, i]) for i in range(df.shape[1])], axis=1)
+    compacted.columns = df.columns
+    report = pd.DataFrame({
+        "dtype_before": df.dtypes.astype(str).to_numpy(),
+        "dtype_after": compacted.dtypes.astype(str).to_numpy(),
+        "bytes_before": df.memory_usage(deep=True, index=False).to_numpy(),
+        "bytes_after": compacted.memory_usage(deep=True, index=False).to_numpy()
+    }, index=df.columns)
+    return compacted, report
+
+def format_bytes(size):
+    """Human-readable byte count"""
+    for unit in ("B", "KB", "MB"):
+        if abs(size) < 1024:
+            return f"{size:,.1f} {unit}" if unit != "B" else f"{size:,.0f} B"
+        size /= 1024
+    return f"{size:,.1f} GB"
+
+def sheet_memory_report():
+    """Before/after compaction memory of every registry sheet cached for this session's credentials"""
+    rows = []
+    for name, info in REAL_SPREADSHEETS.items():
+        entry = peek_cached_sheet((st.session_state.credentials_key, info['id']))
+        if entry and entry.get('memory') is not None:
+            before, after = entry['memory']['bytes_before'].sum(), entry['memory']['bytes_after'].sum()
+            rows.append({
+                "Sheet": name,
+                "Columns": len(entry['memory']),
+                "Loaded": format_bytes(before),
+                "Compacted": format_bytes(after),
+                "Saving": f"{before / max(after, 1):.1f}×",
+                "Where": "💾 Spilled to disk" if entry['df'] is None else "🧠 In memory"
+            })
+    return pd.DataFrame(rows)
+
+# Memory governor
+try:
+    SESSION_MEMORY_BUDGET_BYTES = int(st.secrets["SESSION_MEMORY_BUDGET_MB"]) * 1024 * 1024
+except Exception:
+    SESSION_MEMORY_BUDGET_BYTES = int(os.environ.get("SESSION_MEMORY_BUDGET_MB", 128)) * 1024 * 1024
+
+# Transcripts longer than the cap are always archived; over budget, every transcript keeps only the resident turns
+CHAT_MAX_RESIDENT_MESSAGES = 200
+CHAT_RESIDENT_MESSAGES = 40
+SESSION_IDLE_SECONDS = 1800
+
+@st.cache_resource
+def get_session_memory_registry():
+    """Last measured usage of every live session in this process, keyed by session id"""
+    return {"lock": threading.Lock(), "sessions": {}}
+
+def frame_bytes(df):
+    """Shallow size of a frame, close to exact for the numeric, categorical and Arrow columns compaction leaves"""
+    return int(df.memory_usage(index=True, deep=False).sum())
+
+def _records_bytes(records):
+    return sum(len(str(value)) for record in records for value in record.values())
+
+def session_memory_usage():
+    """Approximate bytes only this session holds, by kind; frames shared with the sheet cache count against its budget instead"""
+    exclusive = []
+    for agent_id, df in st.session_state.sheets_data.items():
+        if not _is_cached_frame(agent_id, df) and not any(df is seen for seen in exclusive):
+            exclusive.append(df)
+    return {
+        "sheets": sum(frame_bytes(df) for df in exclusive),
+        "chats": sum(_records_bytes(messages) for messages in st.session_state.chat_sessions.values())
+                 + sum(len(block['data']) for blocks in st.session_state.chat_archive.values() for block in blocks),
+        "calls": sum(_records_bytes(calls) for calls in st.session_state.ai_calls.values())
+    }
+
+def archive_chat_history(agent_id, keep):
+    """Move all but the latest `keep` messages of a transcript into a compressed archive block"""
+    messages = st.session_state.chat_sessions.get(agent_id, [])
+    split = len(messages) - keep
+    if split <= 0:
+        return 0
+    blob = base64.b64encode(zlib.compress(json.dumps(messages[:split]).encode("utf-8"), 6)).decode("ascii")
+    st.session_state.chat_archive.setdefault(agent_id, []).append({"count": split, "data": blob})
+    st.session_state.chat_sessions[agent_id] = messages[split:]
+    # The rolling context summary counts folded turns from the start of the resident transcript
+    context = st.session_state.chat_context.get(agent_id)
+    if context:
+        context['folded'] = max(0, context['folded'] - split)
+    return split
+
+def load_chat_archive(agent_id):
+    """Archived messages of an agent's transcript, oldest first"""
+    return [
+        message
+        for block in st.session_state.chat_archive.get(agent_id, [])
+        for message in json.loads(zlib.decompress(base64.b64decode(block['data'])))
+    ]
+
+def count_chat_messages(agent_id):
+    """Messages in an agent's transcript, archived ones included"""
+    archived = sum(block['count'] for block in st.session_state.chat_archive.get(agent_id, []))
+    return len(st.session_state.chat_sessions.get(agent_id, [])) + archived
+
+def _is_cached_frame(agent_id, df):
+    spreadsheet = get_agent_config(agent_id).get('spreadsheet')
+    if not spreadsheet or not st.session_state.authenticated:
+        return False
+    entry = peek_cached_sheet((st.session_state.credentials_key, spreadsheet['id']))
+    return entry is not None and entry['df'] is df
+
+def enforce_session_memory():
+    """Keep this session within SESSION_MEMORY_BUDGET_BYTES and publish its usage to the process registry.
+
+    Frames the shared cache has replaced or spilled are the only sheet memory
+    the session holds alone; they are released unless on screen. Frames still
+    in the cache are left to SHEET_CACHE_BUDGET_BYTES. Long transcripts are
+    compressed into archive blocks.
+    """
+    sheets = st.session_state.sheets_data
+    current = st.session_state.current_page
+    for agent_id in [agent_id for agent_id, df in sheets.items() if agent_id != current and not _is_cached_frame(agent_id, df)]:
+        del sheets[agent_id]
+
+    usage = session_memory_usage()
+    keep = CHAT_RESIDENT_MESSAGES if sum(usage.values()) > SESSION_MEMORY_BUDGET_BYTES else CHAT_MAX_RESIDENT_MESSAGES
+    if any(archive_chat_history(agent_id, CHAT_RESIDENT_MESSAGES)
+           for agent_id, messages in list(st.session_state.chat_sessions.items()) if len(messages) > keep):
+        usage = session_memory_usage()
+    st.session_state.memory_usage = usage
+
+    ctx = get_script_run_ctx()
+    if ctx is None:
+        return
+    registry = get_session_memory_registry()
+    now = time.time()
+    with registry['lock']:
+        registry['sessions'][ctx.session_id] = {"usage": usage, "seen": now}
+        for session_id in [sid for sid, record in registry['sessions'].items() if now - record['seen'] > SESSION_IDLE_SECONDS]:
+            del registry['sessions'][session_id]
+
+def process_memory_summary():
+    """Sheet cache and session totals for this process"""
+    cache = get_sheet_cache()
+    with cache['lock']:
+        entries = list(cache['entries'].values())
+    registry = get_session_memory_registry()
+    with registry['lock']:
+        sessions = [dict(record['usage']) for record in registry['sessions'].values()]
+    return {
+        "cache_resident_bytes": sum(entry['bytes'] for entry in entries if entry['df'] is not None),
+        "cache_spilled_bytes": sum(entry['bytes'] for entry in entries if entry['df'] is None),
+        "cache_spilled_sheets": sum(entry['df'] is None for entry in entries),
+        "sessions": len(sessions),
+        "session_bytes": {kind: sum(usage[kind] for usage in sessions) for kind in ("sheets", "chats", "calls")}
+    }
 
-def load_spreadsheet_data(agent_id):
-    """Load data for specific agent - ONLY REAL DATA FROM SHEETS"""
+def render_memory_prometheus_metrics():
+    """Memory governor gauges in Prometheus text exposition format"""
+    summary = process_memory_summary()
+    lines = [
+        "# HELP dashboard_sheet_cache_bytes Compacted sheet frames in the shared cache",
+        "# TYPE dashboard_sheet_cache_bytes gauge",
+        f'dashboard_sheet_cache_bytes{{state="resident"}} {summary["cache_resident_bytes"]}',
+        f'dashboard_sheet_cache_bytes{{state="spilled"}} {summary["cache_spilled_bytes"]}',
+        "# HELP dashboard_sessions Sessions seen within the idle window",
+        "# TYPE dashboard_sessions gauge",
+        f"dashboard_sessions {summary['sessions']}",
+        "# HELP dashboard_session_bytes Approximate memory held by sessions alone, shared cache frames excluded",
+        "# TYPE dashboard_session_bytes gauge"
+    ]
+    for kind, size in summary['session_bytes'].items():
+        lines.append(f'dashboard_session_bytes{{kind="{kind}"}} {size}')
+    return "\n".join(lines) + "\n"
+
+SHEET_PAGE_ROWS = 5000
+SHEET_PREVIEW_ROWS = 300
+SHEET_DATE_COLUMNS = ['Date', 'date', 'DATE', 'Created', 'created', 'Timestamp', 'timestamp']
+
+def _get_sheet_rows(worksheet, start, end):
+    """Raw cell values of rows start..end: numbers unformatted, dates as displayed"""
+    return worksheet.get(
+        f"A{start}:{gspread.utils.rowcol_to_a1(end, worksheet.col_count)}",
+        value_render_option="UNFORMATTED_VALUE",
+        date_time_render_option="FORMATTED_STRING"
+    )
+
+def _parse_date_columns(df):
+    """Convert date columns if they exist"""
+    for col in df.columns:
+        if col in SHEET_DATE_COLUMNS:
+            try:
+                df[col] = pd.to_datetime(df[col], errors='coerce')
+            except:
+                pass
+    return df
+
+def _sheet_column_names(header):
+    """Header cells as unique string labels: unformatted numbers and booleans become text, blanks and repeats get suffixes"""
+    names = []
+    seen = {}
+    for i, cell in enumerate(header):
+        name = str(cell).upper() if isinstance(cell, bool) else str(cell)
+        if not name.strip():
+            name = f"Unnamed: {i}"
+        if name in seen:
+            seen[name] += 1
+            while f"{name}.{seen[name]}" in seen:
+                seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        seen.setdefault(name, 0)
+        names.append(name)
+    return names
+
+def _page_to_frame(rows, header):
+    """One page of raw cell values as a typed DataFrame; blanks become NaN and numeric text becomes numbers"""
+    header = _sheet_column_names(header)
+    width = len(header)
+    rows = [row[:width] if len(row) >= width else row + [""] * (width - len(row)) for row in rows]
+    page = pd.DataFrame(rows, columns=header, dtype=object).replace("", np.nan)
+    for col in page.columns:
+        try:
+            page[col] = pd.to_numeric(page[col])
+        except (ValueError, TypeError):
+            pass
+    return page.infer_objects()
+
+def fetch_sheet_frame(gc, spreadsheet_info, on_page=None):
+    """Read the first worksheet of a spreadsheet into a DataFrame; runs on scheduler workers.
+
+    Rows are read SHEET_PAGE_ROWS at a time and typed page by page, so only one
+    page of raw cell values is held alongside the typed pages. on_page(rows
+    read, rows expected) is called before every page request.
+    """
+    # Open the spreadsheet
+    spreadsheet = gc.open_by_key(spreadsheet_info['id'])
+    
+    # Get all worksheets
+    worksheets = spreadsheet.worksheets()
+    
+    if not worksheets:
+        return None, "No worksheets found in the spreadsheet."
+    
+    # Get the first worksheet
+    worksheet = worksheets[0]
+    
+    # Page through the whole grid: the API omits each range's trailing empty rows,
+    # so a short page only means blank rows, not the end of the data
+    header = None
+    pages = []
+    rows_read = 0
+    for start in range(1, worksheet.row_count + 1, SHEET_PAGE_ROWS):
+        end = min(start + SHEET_PAGE_ROWS - 1, worksheet.row_count)
+        if on_page:
+            on_page(rows_read, worksheet.row_count - 1)
+        values = _get_sheet_rows(worksheet, start, end)
+        rows = list(values)
+        if header is None:
+            if not rows:
+                break
+            header, rows = rows[0], rows[1:]
+        if rows:
+            pages.append(_page_to_frame(rows, header))
+        rows_read = end - 1
+    
+    if not pages:
+        return None, f"No data found in worksheet '{worksheet.title}'. Please add data to the spreadsheet first."
+    
+    # Stitch the typed pages together
+    df = pd.concat(pages, ignore_index=True) if len(pages) > 1 else pages[0]
+    del pages
+    
+    # Clean the data - remove empty rows
+    df = df.dropna(how='all')
+    
+    if df.empty:
+        return None, f"Spreadsheet '{spreadsheet_info['name']}' contains no valid data. Please add data to the spreadsheet."
+    
+    return _parse_date_columns(df), None
+
+def fetch_sheet_preview(gc, spreadsheet_info):
+    """Header and first SHEET_PREVIEW_ROWS rows of the first worksheet from a single range read"""
+    worksheets = gc.open_by_key(spreadsheet_info['id']).worksheets()
+    if not worksheets:
+        return None, "No worksheets found in the spreadsheet."
+    
+    worksheet = worksheets[0]
+    values = list(_get_sheet_rows(worksheet, 1, min(SHEET_PREVIEW_ROWS + 1, worksheet.row_count)))
+    if len(values) < 2:
+        return None, f"No data found in worksheet '{worksheet.title}'. Please add data to the spreadsheet first."
+    
+    df = _page_to_frame(values[1:], values[0]).dropna(how='all')
+    return _parse_date_columns(df), None
+
+@profile_span("load_spreadsheet_data")
+def load_spreadsheet_data(agent_id, priority=PRIORITY_INTERACTIVE, on_progress=None):
+    """Load data for specific agent - ONLY REAL DATA FROM SHEETS. on_progress(rows read, rows expected) is polled while waiting"""
     try:
         # Get the agent config
-        config = st.session_state.agent_configs[agent_id]
+        config = get_agent_config(agent_id)
         
         # Check if we have real spreadsheet data for this agent
         if 'spreadsheet' in config:
@@ -534,50 +1807,34 @@ def load_spreadsheet_data(agent_id):
             # Only proceed if authenticated
             if st.session_state.authenticated:
                 try:
-                    # Initialize gspread client
-                    gc = gspread.authorize(st.session_state.credentials)
-                    
-                    # Open the spreadsheet
-                    spreadsheet = gc.open_by_key(spreadsheet_id)
-                    
-                    # Get all worksheets
-                    worksheets = spreadsheet.worksheets()
-                    
-                    if not worksheets:
-                        return None, "No worksheets found in the spreadsheet."
+                    # Served from the shared cache when prefetched or loaded by another session
+                    entry = get_cached_sheet((st.session_state.credentials_key, spreadsheet_id))
+                    if entry:
+                        # Serve what we have now; a newer Drive version is fetched in the background
+                        revalidate_sheet(spreadsheet_info)
+                        return entry['df'], None
                     
-                    # Get the first worksheet
-                    worksheet = worksheets[0]
-                    
-                    # Get all values
-                    data = worksheet.get_all_records()
-                    
-                    if not data:
-                        return None, f"No data found in worksheet '{worksheet.title}'. Please add data to the spreadsheet first."
-                    
-                    # Convert to DataFrame
-                    df = pd.DataFrame(data)
-                    
-                    # Clean the data - remove empty rows
-                    df = df.dropna(how='all')
-                    
-                    if df.empty:
-                        return None, f"Spreadsheet '{spreadsheet_info['name']}' contains no valid data. Please add data to the spreadsheet."
-                    
-                    # Convert date columns if they exist
-                    date_columns = ['Date', 'date', 'DATE', 'Created', 'created', 'Timestamp', 'timestamp']
-                    for col in df.columns:
-                        if col in date_columns:
-                            try:
-                                df[col] = pd.to_datetime(df[col], errors='coerce')
-                            except:
-                                pass
-                    
-                    return df, None
+                    started = time.perf_counter()
+                    try:
+                        future = schedule_sheet_load(spreadsheet_info, priority)
+                        if on_progress:
+                            progress = get_sheet_load_progress()
+                            while not wait_for_futures([future], timeout=0.25, return_when=FIRST_COMPLETED).done:
+                                rows = progress.get((st.session_state.credentials_key, spreadsheet_id))
+                                if rows:
+                                    on_progress(*rows)
+                        df, error = future.result()
+                    except Exception:
+                        record_latency(agent_id, "sheet_load", time.perf_counter() - started, error=True)
+                        raise
+                    record_latency(agent_id, "sheet_load", time.perf_counter() - started, error=error is not None)
+                    return df, error
                     
                 except gspread.exceptions.SpreadsheetNotFound:
                     return None, f"Spreadsheet with ID '{spreadsheet_id}' not found. Please check the spreadsheet ID and permissions."
                 except gspread.exceptions.APIError as e:
+                    if is_retryable_sheets_error(e):
+                        return None, "Google Sheets is busy right now (API quota reached). Please wait a minute and refresh."
                     return None, f"Google Sheets API error: {str(e)}. Please check your permissions and try again."
                 except Exception as e:
                     return None, f"Error loading spreadsheet data: {str(e)}"
@@ -589,34 +1846,806 @@ def load_spreadsheet_data(agent_id):
     except Exception as e:
         return None, f"Error loading data: {str(e)}"
 
+def get_sheet_revision(spreadsheet_id, df):
+    """Shared-cache revision of a loaded sheet frame, for keying derived results"""
+    entry = get_cached_sheet((st.session_state.credentials_key, spreadsheet_id))
+    if entry and entry['df'] is df:
+        return entry['revision']
+    # A frame the cache has since replaced or spilled: key it by content, never by id() which is reused
+    hashed = hashlib.blake2b(json.dumps([list(map(str, df.columns)), df.shape]).encode(), digest_size=16)
+    hashed.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    return hashed.hexdigest()
+
+# Time-series rollups
+ROLLUP_GRANULARITIES = {"Day": "D", "Week": "W", "Month": "M", "Quarter": "Q"}
+ROLLUP_STATS = {"sum": "Sum", "mean": "Mean", "count": "Count", "p50": "Median", "p90": "90th Percentile"}
+ROLLUP_CACHE_ENTRIES = 32
+
+@st.cache_resource
+def get_rollup_cache():
+    """Process-wide rollups keyed by (spreadsheet id, date column), most recent last"""
+    return {"lock": threading.Lock(), "entries": OrderedDict()}
+
+def _rollup_buckets(dates, freq):
+    return dates.dt.to_period(freq).dt.start_time
+
+def _compute_rollup(dates, values, freq):
+    """Per-bucket sum, mean, count and percentiles of every numeric column in one grouped pass"""
+    valid = dates.notna()
+    dates, values = dates[valid], values[valid]
+    grouped = values.groupby(_rollup_buckets(dates, freq).rename("bucket"), sort=True)
+    quantiles = grouped.quantile([0.5, 0.9]).unstack(level=-1)
+    return pd.concat({
+        "sum": grouped.sum(),
+        "mean": grouped.mean(),
+        "count": grouped.count(),
+        "p50": quantiles.xs(0.5, axis=1, level=-1),
+        "p90": quantiles.xs(0.9, axis=1, level=-1)
+    }, axis=1)
+
+def _rollup_row_hashes(df, date_col, values):
+    """Per-row hashes of the columns a rollup reads; their sum over a prefix identifies its content"""
+    columns = list(dict.fromkeys([date_col, *values.columns]))
+    return pd.util.hash_pandas_object(df[columns], index=False).to_numpy()
+
+def get_sheet_rollups(spreadsheet_id, revision, df, date_col):
+    """Day/week/month/quarter rollups of a sheet's numeric columns, cached per revision.
+
+    When a new revision only appends rows (the earlier rows hash the same),
+    each granularity keeps its earlier buckets and recomputes from the first
+    bucket the new rows touch. Returns None when the column holds no dates.
+    """
+    cache = get_rollup_cache()
+    key = (spreadsheet_id, date_col)
+    with cache['lock']:
+        entry = cache['entries'].get(key)
+        if entry:
+            cache['entries'].move_to_end(key)
+    if entry and entry['revision'] == revision:
+        return entry['rollups']
+
+    values = df.select_dtypes(include='number')
+    dates = pd.to_datetime(df[date_col], errors='coerce')
+    hashes = _rollup_row_hashes(df, date_col, values)
+    has_dates = bool(dates.notna().any())
+    appended = (
+        has_dates
+        and entry is not None
+        and entry['rollups'] is not None
+        and entry['columns'] == tuple(values.columns)
+        and len(df) > entry['rows'] > 0
+        and int(hashes[:entry['rows']].sum()) == entry['prefix_hash']
+    )
+
+    rollups = None
+    if has_dates:
+        rollups = {}
+        for label, freq in ROLLUP_GRANULARITIES.items():
+            if appended:
+                first_bucket = _rollup_buckets(dates.iloc[entry['rows']:].dropna(), freq).min()
+                previous = entry['rollups'][label]
+                if pd.isna(first_bucket):
+                    rollups[label] = previous
+                    continue
+                touched = dates >= first_bucket
+                rollups[label] = pd.concat([
+                    previous[previous.index < first_bucket],
+                    _compute_rollup(dates[touched], values[touched], freq)
+                ])
+            else:
+                rollups[label] = _compute_rollup(dates, values, freq)
+
+    with cache['lock']:
+        cache['entries'][key] = {
+            "revision": revision,
+            "rows": len(df),
+            "columns": tuple(values.columns),
+            "prefix_hash": int(hashes.sum()),
+            "rollups": rollups
+        }
+        while len(cache['entries']) > ROLLUP_CACHE_ENTRIES:
+            cache['entries'].popitem(last=False)
+    return rollups
+
+# Key metric KPIs
+KPI_ROLLING_WINDOW = 7
+KPI_TREND_THRESHOLD = 0.01
+KPI_TRENDS = {1: "📈 Rising", -1: "📉 Falling", 0: "➖ Flat"}
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def compute_kpis(spreadsheet_id, revision, _df):
+    """Latest value, deltas, rolling average, growth and trend for every numeric column in one pass.
+
+    Only the last two rolling windows are read, so the cost depends on the
+    column count and the window, not on how many rows the sheet has.
+    """
+    numeric = _df.select_dtypes(include='number')
+    window = KPI_ROLLING_WINDOW
+    tail = numeric.tail(2 * window + 1).to_numpy(dtype=float)
+    if len(tail) == 0:
+        return pd.DataFrame()
+
+    filled = pd.DataFrame(tail).ffill().to_numpy()
+    latest = filled[-1]
+    previous = filled[-2] if len(filled) >= 2 else np.full_like(latest, np.nan)
+    recent_mean = pd.DataFrame(tail[-window:]).mean().to_numpy()
+    prior_mean = pd.DataFrame(tail[-2 * window:-window]).mean().to_numpy() if len(tail) > window else np.full_like(latest, np.nan)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        start = filled[-window - 1] if len(filled) > window else filled[0]
+        pct_change = (latest - previous) / np.abs(previous)
+        growth = (latest - start) / np.abs(start)
+        trend_change = (recent_mean - prior_mean) / np.abs(prior_mean)
+    trend = np.where(trend_change > KPI_TREND_THRESHOLD, 1, np.where(trend_change < -KPI_TREND_THRESHOLD, -1, 0))
+
+    kpis = pd.DataFrame({
+        "latest": latest,
+        "previous": previous,
+        "delta": latest - previous,
+        "pct_change": pct_change,
+        "rolling_mean": recent_mean,
+        "growth": growth,
+        "trend": trend
+    }, index=numeric.columns)
+    return kpis.replace([np.inf, -np.inf], np.nan)
+
+def format_metric_value(value):
+    """Compact K/M display for metric cards"""
+    if pd.isna(value):
+        return "N/A"
+    if abs(value) >= 1000000:
+        return f"{value/1000000:.1f}M"
+    if abs(value) >= 1000:
+        return f"{value/1000:.1f}K"
+    return f"{value:,.1f}"
+
+# Cross-agent portfolio analytics
+PORTFOLIO_AGENT_COLUMNS = ("agent", "agent name", "agent_name", "agent id", "agent_id", "assigned agent")
+
+def load_all_spreadsheets():
+    """Every registry spreadsheet, loaded concurrently through the scheduler. Returns {name: (df, error)}"""
+    credentials_key = st.session_state.credentials_key
+    results = {}
+    pending = {}
+    for name, info in REAL_SPREADSHEETS.items():
+        entry = get_cached_sheet((credentials_key, info['id']))
+        if entry:
+            revalidate_sheet(info)
+            results[name] = (entry['df'], None)
+        else:
+            pending[name] = schedule_sheet_load(info, PRIORITY_INTERACTIVE)
+
+    for name, future in pending.items():
+        try:
+            results[name] = future.result()
+        except gspread.exceptions.APIError as e:
+            if is_retryable_sheets_error(e):
+                results[name] = (None, "Google Sheets is busy right now (API quota reached).")
+            else:
+                results[name] = (None, f"Google Sheets API error: {str(e)}")
+        except Exception as e:
+            results[name] = (None, f"Error loading spreadsheet data: {str(e)}")
+    return {name: results[name] for name in REAL_SPREADSHEETS}
+
+@st.cache_resource(max_entries=4)
+def build_portfolio_frame(revisions, _frames):
+    """All sheets stacked into one frame with a Source column; shared, so never mutate it"""
+    combined = pd.concat(
+        [frame.assign(Source=name) for name, frame in _frames.items()],
+        ignore_index=True, sort=False
+    )
+    return combined[["Source"] + [col for col in combined.columns if col != "Source"]]
+
+def _agent_rows(frame, agent_id, config):
+    """Rows of a sheet attributed to an agent, when the sheet has an agent column"""
+    for column in frame.columns:
+        if str(column).strip().lower() in PORTFOLIO_AGENT_COLUMNS:
+            values = frame[column].astype(str).str.strip().str.lower()
+            return frame[values.isin({agent_id.lower(), config['name'].lower()})]
+    return frame
+
+def build_agent_portfolio(frames):
+    """Per-agent KPIs from the shared sheet cache, session activity and backend latency"""
+    sheet_names = {info['id']: name for name, info in REAL_SPREADSHEETS.items()}
+    latency = latency_snapshot()
+    sheet_totals = {}
+    rows = []
+    for agent_id, config in get_agent_configs().items():
+        sheet = sheet_names.get(config.get('spreadsheet', {}).get('id'))
+        frame = frames.get(sheet)
+        attributed = _agent_rows(frame, agent_id, config) if frame is not None else None
+        if attributed is None:
+            total = 0.0
+        elif attributed is frame:
+            # Agents sharing an unattributed sheet share one total
+            if sheet not in sheet_totals:
+                sheet_totals[sheet] = float(np.nansum(frame.select_dtypes(include='number').to_numpy(dtype=float)))
+            total = sheet_totals[sheet]
+        else:
+            total = float(np.nansum(attributed.select_dtypes(include='number').to_numpy(dtype=float)))
+        webhook = latency.get((agent_id, "webhook"))
+        rows.append({
+            "Agent": config['name'],
+            "Category": config['category'],
+            "Sheet": sheet,
+            "Rows": len(attributed) if attributed is not None else 0,
+            "Numeric Total": total,
+            "Chats": count_chat_messages(agent_id),
+            "Calls": len(st.session_state.ai_calls.get(agent_id, [])),
+            "Webhook p95 (ms)": round(webhook['total'].quantile(0.95), 1) if webhook else None
+        })
+    return pd.DataFrame(rows)
+
+def summarize_portfolio_by_category(agents_df, frames):
+    """Roll agent KPIs up to categories; each sheet's full row count is counted once per category using it"""
+    sheet_rows = agents_df["Sheet"].map({name: len(frame) for name, frame in frames.items()}).fillna(0).astype(int)
+    per_sheet = agents_df.assign(**{"Sheet Rows": sheet_rows}).drop_duplicates(["Category", "Sheet"]).groupby("Category")["Sheet Rows"].sum()
+    summary = agents_df.groupby("Category").agg(
+        Agents=("Agent", "count"),
+        Sheets=("Sheet", "nunique"),
+        Chats=("Chats", "sum"),
+        Calls=("Calls", "sum")
+    )
+    summary.insert(2, "Sheet Rows", per_sheet)
+    return summary.reset_index().sort_values("Agents", ascending=False)
+
+# SQL console over cached sheets
+SQL_PAGE_SIZE = 100
+SQL_MAX_RESULT_ROWS = 100000
+SQL_READ_ONLY_PREFIXES = ("select", "with", "explain", "describe", "show", "pragma table_info")
+DUCKDB_SANDBOX_CONFIG = {
+    "enable_external_access": False,
+    "autoinstall_known_extensions": False,
+    "autoload_known_extensions": False,
+    "python_enable_replacements": False,
+}
+
+def sql_table_name(sheet_name):
+    """Spreadsheet name as a SQL identifier, e.g. 'Real Estate' -> real_estate"""
+    return re.sub(r"\W+", "_", sheet_name.strip().lower()).strip("_")
+
+def get_cached_sheet_frames():
+    """Registry sheets already in the shared cache for this session's credentials"""
+    frames = {}
+    for name, info in REAL_SPREADSHEETS.items():
+        entry = get_cached_sheet((st.session_state.credentials_key, info['id']))
+        if entry:
+            frames[name] = entry['df']
+    return frames
+
+def get_cached_sheet_rows():
+    """Row counts of the registry sheets in the shared cache, without reading spilled frames back"""
+    rows = {}
+    for name, info in REAL_SPREADSHEETS.items():
+        entry = peek_cached_sheet((st.session_state.credentials_key, info['id']))
+        if entry:
+            rows[name] = entry['rows']
+    return rows
+
+@st.cache_resource(max_entries=2)
+def get_sql_engine(revisions, _frames):
+    """In-memory SQL connection with every given sheet registered as a table.
+
+    DuckDB scans the cached frames in place when it is installed; otherwise
+    the frames are copied once per revision into an in-memory SQLite database.
+    Either way queries can only see the registered sheets: no files, URLs,
+    extensions or Python variables.
+    """
+    try:
+        import duckdb
+    except ImportError:
+        duckdb = None
+
+    if duckdb is not None:
+        conn = duckdb.connect(":memory:", config=DUCKDB_SANDBOX_CONFIG)
+        for name, frame in _frames.items():
+            conn.register(sql_table_name(name), frame)
+        conn.execute("SET lock_configuration = true")
+        return {"kind": "DuckDB", "conn": conn, "lock": threading.Lock()}
+
+    conn = sqlite3.connect(":memory:", check_same_thread=False)
+    for name, frame in _frames.items():
+        frame.to_sql(sql_table_name(name), conn, index=False)
+    conn.execute("PRAGMA query_only = ON")
+    return {"kind": "SQLite", "conn": conn, "lock": threading.Lock()}
+
+def _sql_statements(query):
+    """The non-empty statements of a query with comments removed; semicolons and comment
+    markers inside quoted strings and identifiers are left alone"""
+    statements, current, i = [], [], 0
+    while i < len(query):
+        char = query[i]
+        if char in "'\"":
+            end = i + 1
+            while end < len(query):
+                if query[end] == char:
+                    # A doubled quote is an escaped quote
+                    if query[end + 1:end + 2] != char:
+                        break
+                    end += 1
+                end += 1
+            current.append(query[i:end + 1])
+            i = end + 1
+        elif query.startswith("--", i):
+            end = query.find("\n", i)
+            i = len(query) if end == -1 else end
+            current.append(" ")
+        elif query.startswith("/*", i):
+            end = query.find("*/", i + 2)
+            i = len(query) if end == -1 else end + 2
+            current.append(" ")
+        elif char == ";":
+            statements.append("".join(current))
+            current = []
+            i += 1
+        else:
+            current.append(char)
+            i += 1
+    statements.append("".join(current))
+    return [statement.strip() for statement in statements if statement.strip()]
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def run_sql_query(query, revisions, _frames):
+    """Run a read-only query against the cached sheets. Returns (df, error)"""
+    statements = _sql_statements(query)
+    if len(statements) > 1:
+        return None, "Run one statement at a time."
+    if not statements or not statements[0].lower().startswith(SQL_READ_ONLY_PREFIXES):
+        return None, "Only read-only queries (SELECT / WITH) are allowed."
+    # The checks read the comment-free text; the engine gets the query as written
+    statement = query.strip()
+
+    engine = get_sql_engine(revisions, _frames)
+    try:
+        with engine['lock']:
+            if engine['kind'] == "DuckDB":
+                result = engine['conn'].execute(statement).fetch_df()
+            else:
+                result = pd.read_sql_query(statement, engine['conn'])
+    except Exception as e:
+        return None, f"{engine['kind']} error: {str(e)}"
+    if len(result) > SQL_MAX_RESULT_ROWS:
+        return result.head(SQL_MAX_RESULT_ROWS), f"Result truncated to the first {SQL_MAX_RESULT_ROWS:,} rows."
+    return result, None
+
+# Sheet digests for data-aware chat
+DIGEST_MAX_COLUMNS = 20
+DIGEST_TOP_CATEGORIES = 5
+DIGEST_CATEGORY_MAX_UNIQUE = 50
+DIGEST_RECENT_ROWS = 5
+DIGEST_CELL_CHARS = 60
+
+def _digest_number(value):
+    if pd.isna(value):
+        return None
+    return round(float(value), 4)
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def compute_sheet_digest(spreadsheet_id, revision, _df):
+    """Compact statistical summary of a sheet; recomputed only when its revision changes"""
+    df = _df.iloc[:, :DIGEST_MAX_COLUMNS]
+    digest = {
+        "rows": len(_df),
+        "columns": [{"name": str(name), "type": str(dtype)} for name, dtype in df.dtypes.items()],
+        "numeric": {},
+        "dates": {},
+        "categories": {}
+    }
+    if len(_df.columns) > DIGEST_MAX_COLUMNS:
+        digest["omitted_columns"] = len(_df.columns) - DIGEST_MAX_COLUMNS
+
+    numeric = df.select_dtypes(include="number")
+    if not numeric.empty:
+        stats = numeric.agg(["sum", "mean", "min", "max"])
+        for column in stats.columns:
+            digest["numeric"][str(column)] = {stat: _digest_number(stats.at[stat, column]) for stat in stats.index}
+
+    for column in df.columns:
+        if column in numeric.columns:
+            continue
+        if 'date' in str(column).lower():
+            dates = pd.to_datetime(df[column], errors='coerce').dropna()
+            if not dates.empty:
+                digest["dates"][str(column)] = {"first": dates.min().isoformat(), "last": dates.max().isoformat()}
+                continue
+        counts = df[column].astype(str).value_counts()
+        if 0 < len(counts) <= DIGEST_CATEGORY_MAX_UNIQUE:
+            digest["categories"][str(column)] = {str(k): int(v) for k, v in counts.head(DIGEST_TOP_CATEGORIES).items()}
+
+    recent = df.tail(DIGEST_RECENT_ROWS).astype(str)
+    digest["recent_rows"] = [
+        {str(k): v[:DIGEST_CELL_CHARS] for k, v in row.items()}
+        for row in recent.to_dict("records")
+    ]
+    return digest
+
+def get_sheet_digest(agent_id):
+    """Digest of an agent's sheet, loading the sheet if needed. Returns (digest, error)"""
+    config = get_agent_config(agent_id)
+    if 'spreadsheet' not in config:
+        return None, f"No spreadsheet configured for {config['name']}."
+    df, error = load_spreadsheet_data(agent_id)
+    if df is None:
+        return None, error
+    spreadsheet_id = config['spreadsheet']['id']
+    revision = get_sheet_revision(spreadsheet_id, df)
+    digest = compute_sheet_digest(spreadsheet_id, revision, df)
+    return {"sheet": config['spreadsheet']['name'], "revision": str(revision), **digest}, None
+
+@profile_span("make_ai_call")
 def make_ai_call(agent_id, phone_number):
     """Initiate AI voice call"""
-    config = st.session_state.agent_configs[agent_id]
+    started = time.perf_counter()
+    config = get_agent_config(agent_id)
     
     call_data = {
         "call_id": str(uuid.uuid4()),
         "agent_id": agent_id,
-        "agent_name": config['name'],
-        "phone_number": phone_number,
-        "ai_phone": config['ai_phone'],
-        "assistant_id": config['ai_assistant_id'],
-        "status": "initiated",
-        "timestamp": datetime.now().isoformat(),
-        "duration": "00:00:00",
-        "cost": "$0.00"
+        "agent_name": config['name'],
+        "phone_number": phone_number,
+        "ai_phone": config['ai_phone'],
+        "assistant_id": config['ai_assistant_id'],
+        "status": "initiated",
+        "timestamp": datetime.now().isoformat(),
+        "duration": "00:00:00",
+        "cost": "$0.00"
+    }
+    
+    record_latency(agent_id, "call_dispatch", time.perf_counter() - started)
+    return call_data
+
+# Chat transcript and call log write-back
+try:
+    LOG_SPREADSHEET_ID = st.secrets["LOG_SPREADSHEET_ID"]
+except Exception:
+    # Write-back is disabled unless a log spreadsheet is configured
+    LOG_SPREADSHEET_ID = None
+
+LOG_WORKSHEETS = {
+    "chat": {"title": "Chat Log", "columns": ["Timestamp", "User", "Agent ID", "Role", "Content"]},
+    "call": {"title": "Call Log", "columns": ["Timestamp", "User", "Agent ID", "Call ID", "Phone Number", "Purpose", "Status", "Notes"]}
+}
+LOG_FLUSH_MAX_ROWS = 50
+LOG_FLUSH_INTERVAL_SECONDS = 10
+LOG_WRITE_RETRIES = 3
+# A claimed spill file untouched for this long belongs to a writer that died mid-send
+LOG_CLAIM_STALE_SECONDS = 600
+LOG_SPILL_DIR = Path(os.environ.get("LOG_SPILL_DIR", Path(__file__).parent / ".log_spill"))
+
+class SheetLogWriter:
+    """Write-behind buffer that appends log rows to a spreadsheet in batches.
+
+    Rows are flushed with one append_rows call per worksheet when the buffer
+    fills or the flush interval passes. Batches that still fail after retries
+    are spilled to a local JSON-lines file and resent on the next flush. A
+    spill file is renamed to a claim while it is resent and only deleted once
+    its rows are sent or spilled again; claims left by a writer that died are
+    folded into the next resend.
+    """
+
+    def __init__(self, gc, spreadsheet_id):
+        self._gc = gc
+        self._spreadsheet_id = spreadsheet_id
+        self._worksheets = {}
+        self._buffer = {kind: [] for kind in LOG_WORKSHEETS}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._claim_token = uuid.uuid4().hex[:8]
+        if LOG_SPILL_DIR.is_dir() and any(LOG_SPILL_DIR.glob(f"{spreadsheet_id}_*")):
+            # Resend rows left by an earlier process right away
+            self._wake.set()
+        threading.Thread(target=self._flush_loop, name="sheet-log-writer", daemon=True).start()
+        atexit.register(self.flush)
+
+    def append(self, kind, row):
+        with self._lock:
+            self._buffer[kind].append(row)
+            pending = sum(len(rows) for rows in self._buffer.values())
+        if pending >= LOG_FLUSH_MAX_ROWS:
+            self._wake.set()
+
+    def _flush_loop(self):
+        while True:
+            self._wake.wait(LOG_FLUSH_INTERVAL_SECONDS)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self):
+        """Send buffered and previously spilled rows; spill whatever fails"""
+        with self._flush_lock:
+            with self._lock:
+                batches = self._buffer
+                self._buffer = {kind: [] for kind in LOG_WORKSHEETS}
+
+            for kind, rows in batches.items():
+                spilled, claimed = self._claim_spilled(kind)
+                rows = spilled + rows
+                if rows:
+                    try:
+                        self._append_with_retry(kind, rows)
+                    except Exception as e:
+                        print(f"⚠️ {LOG_WORKSHEETS[kind]['title']} write-back failed, spilling {len(rows)} rows: {str(e)}")
+                        self._spill(kind, rows)
+                # Claimed rows are now in the sheet or back in the spill file
+                for path in claimed:
+                    path.unlink(missing_ok=True)
+
+    def _worksheet(self, kind):
+        if kind not in self._worksheets:
+            spreadsheet = self._gc.open_by_key(self._spreadsheet_id)
+            title = LOG_WORKSHEETS[kind]['title']
+            try:
+                worksheet = spreadsheet.worksheet(title)
+            except gspread.exceptions.WorksheetNotFound:
+                columns = LOG_WORKSHEETS[kind]['columns']
+                worksheet = spreadsheet.add_worksheet(title=title, rows=1, cols=len(columns))
+                worksheet.append_row(columns)
+            self._worksheets[kind] = worksheet
+        return self._worksheets[kind]
+
+    def _append_with_retry(self, kind, rows):
+        for attempt in range(LOG_WRITE_RETRIES):
+            try:
+                self._worksheet(kind).append_rows(rows, value_input_option="RAW")
+                return
+            except Exception as e:
+                if attempt == LOG_WRITE_RETRIES - 1 or not is_retryable_sheets_error(e):
+                    raise
+                time.sleep(random.uniform(0, SHEETS_BACKOFF_BASE_SECONDS * 2 ** attempt))
+
+    def _spill_path(self, kind):
+        return LOG_SPILL_DIR / f"{self._spreadsheet_id}_{kind}.jsonl"
+
+    def _spill(self, kind, rows):
+        LOG_SPILL_DIR.mkdir(parents=True, exist_ok=True)
+        with open(self._spill_path(kind), "a", encoding="utf-8") as f:
+            for row in rows:
+                f.write(json.dumps(row) + "\n")
+
+    def _claim_is_abandoned(self, path):
+        # Claims are named <spreadsheet>_<kind>.<pid>.<token>-<n>.sending
+        parts = path.name.split(".")
+        if len(parts) != 4 or not parts[1].isdigit():
+            return True
+        pid = int(parts[1])
+        if pid != os.getpid() and os.name == "posix":
+            try:
+                os.kill(pid, 0)
+            except ProcessLookupError:
+                return True
+            except PermissionError:
+                pass
+        try:
+            return time.time() - path.stat().st_mtime > LOG_CLAIM_STALE_SECONDS
+        except FileNotFoundError:
+            return False
+
+    def _claim_spilled(self, kind):
+        """Rename the spill file and any abandoned claims to claims of this writer. Returns (rows, claim paths)"""
+        if not LOG_SPILL_DIR.is_dir():
+            return [], []
+        abandoned = [
+            path for path in LOG_SPILL_DIR.glob(f"{self._spreadsheet_id}_{kind}.*sending")
+            if self._claim_is_abandoned(path)
+        ]
+        rows, claimed = [], []
+        for n, path in enumerate([self._spill_path(kind)] + abandoned):
+            claim = LOG_SPILL_DIR / f"{self._spreadsheet_id}_{kind}.{os.getpid()}.{self._claim_token}-{n}.sending"
+            try:
+                # Renaming is atomic, so only one writer ever resends a file
+                path.replace(claim)
+            except FileNotFoundError:
+                continue
+            os.utime(claim)
+            claimed.append(claim)
+            with open(claim, encoding="utf-8") as f:
+                rows += [json.loads(line) for line in f if line.strip()]
+        return rows, claimed
+
+@st.cache_resource
+def get_sheet_log_writer(credentials_key, _credentials):
+    """One log writer per service account, shared by its sessions"""
+    return SheetLogWriter(get_gspread_client(credentials_key, _credentials), LOG_SPREADSHEET_ID)
+
+def log_to_sheet(kind, values):
+    """Queue a log row for batched write-back; no-op when logging is not configured"""
+    if not LOG_SPREADSHEET_ID or not st.session_state.authenticated:
+        return
+    user = st.session_state.user_info['email'] if st.session_state.user_info else ''
+    writer = get_sheet_log_writer(st.session_state.credentials_key, st.session_state.credentials)
+    writer.append(kind, [datetime.now().isoformat(), user] + [str(v) for v in values])
+
+def log_chat_message(agent_id, message):
+    log_to_sheet("chat", [agent_id, message['role'], message['content']])
+
+def log_call_record(call):
+    log_to_sheet("call", [
+        call['agent_id'], call['call_id'], call['phone_number'],
+        call.get('purpose', ''), call['status'], call.get('notes', '')
+    ])
+
+# Voice input
+VOICE_CHUNK_SECONDS = 5
+
+def _transcribe_google(recognizer, audio):
+    return recognizer.recognize_google(audio)
+
+def _transcribe_sphinx(recognizer, audio):
+    return recognizer.recognize_sphinx(audio)
+
+@st.cache_resource
+def get_whisper_model(size):
+    """One Faster Whisper model per process; loading it takes seconds and hundreds of MB"""
+    from faster_whisper import WhisperModel
+    return WhisperModel(size)
+
+def _transcribe_faster_whisper(recognizer, audio):
+    # Whisper expects 16 kHz mono float samples
+    samples = np.frombuffer(audio.get_raw_data(convert_rate=16000, convert_width=2), dtype=np.int16).astype(np.float32) / 32768
+    segments, _ = get_whisper_model("base").transcribe(samples)
+    return " ".join(segment.text.strip() for segment in segments)
+
+# Engines take (recognizer, AudioData) and return text; add entries here to plug in more
+TRANSCRIPTION_ENGINES = {
+    "google": {"label": "Google Web Speech (online)", "transcribe": _transcribe_google},
+    "sphinx": {"label": "CMU Sphinx (offline)", "transcribe": _transcribe_sphinx},
+    "faster_whisper": {"label": "Faster Whisper (offline)", "transcribe": _transcribe_faster_whisper},
+}
+
+@st.cache_resource
+def get_transcription_executor():
+    """Process-wide worker pool for speech transcription"""
+    return ThreadPoolExecutor(max_workers=2, thread_name_prefix="voice")
+
+def _run_voice_transcription(job, audio_bytes):
+    """Transcribe a recording chunk by chunk, publishing partial text on the job"""
+    transcribe = TRANSCRIPTION_ENGINES[job['engine']]['transcribe']
+    recognizer = sr.Recognizer()
+
+    try:
+        with sr.AudioFile(io.BytesIO(audio_bytes)) as source:
+            while True:
+                audio = recognizer.record(source, duration=VOICE_CHUNK_SECONDS)
+                if not audio.frame_data:
+                    break
+
+                try:
+                    text = transcribe(recognizer, audio)
+                except sr.UnknownValueError:
+                    # Silence or unintelligible chunk
+                    continue
+
+                if text and text.strip():
+                    job['partials'].append(text.strip())
+
+        job['status'] = 'done'
+    except Exception as e:
+        job['error'] = str(e)
+        job['status'] = 'error'
+
+def start_voice_transcription(agent_id, recording_id, audio_bytes, engine):
+    """Queue a recording for off-thread transcription and return its job"""
+    job = {
+        "agent_id": agent_id,
+        "recording_id": recording_id,
+        "engine": engine,
+        "partials": [],
+        "status": "running",
+        "error": None
     }
-    
-    return call_data
+    get_transcription_executor().submit(_run_voice_transcription, job, audio_bytes)
+    return job
+
+def render_voice_transcript(job):
+    """Show partial transcripts, polling the worker until it finishes"""
+
+    @st.fragment(run_every=1.0 if job['status'] == 'running' else None)
+    def voice_transcript():
+        transcript = " ".join(job['partials'])
+
+        if job['status'] == 'running':
+            st.caption(f"🎤 Transcribing... {transcript}")
+        elif job['status'] == 'error':
+            st.error(f"❌ Voice transcription failed: {job['error']}")
+        elif job['status'] == 'done':
+            job['status'] = 'sent'
+            if transcript:
+                st.session_state.pending_voice_input = transcript
+                st.rerun()
+            else:
+                st.warning("⚠️ No speech detected in the recording.")
+
+    voice_transcript()
+
+# Agent catalog
+AGENTS_PAGE_SIZE = 20
+
+def _keyword_tokens(text):
+    return re.findall(r"[a-z0-9]+", str(text).lower())
+
+@st.cache_resource(max_entries=2)
+def _build_agent_catalog(_registry, mtime_ns):
+    """Precompute category, specialization, spreadsheet and keyword indexes for the registry"""
+    order = tuple(_registry['agents'].keys())
+    by_category = {}
+    by_specialization = {}
+    by_spreadsheet = {}
+    by_token = {}
+
+    for agent_id, config in _registry['agents'].items():
+        by_category.setdefault(config['category'], []).append(agent_id)
+
+        for term in config['specialization'].split(","):
+            if term.strip():
+                by_specialization.setdefault(term.strip().lower(), []).append(agent_id)
+
+        if 'spreadsheet' in config:
+            by_spreadsheet.setdefault(config['spreadsheet']['id'], []).append(agent_id)
+
+        searchable = " ".join([agent_id, config['name'], config['description'], config['category'], config['specialization']])
+        for token in _keyword_tokens(searchable):
+            by_token.setdefault(token, set()).add(agent_id)
+
+    return {
+        "order": order,
+        "position": {agent_id: i for i, agent_id in enumerate(order)},
+        "categories": tuple(sorted(by_category)),
+        "by_category": {k: tuple(v) for k, v in by_category.items()},
+        "by_specialization": {k: tuple(v) for k, v in by_specialization.items()},
+        "by_spreadsheet": {k: tuple(v) for k, v in by_spreadsheet.items()},
+        "tokens": tuple(sorted(by_token)),
+        "by_token": {k: frozenset(v) for k, v in by_token.items()}
+    }
+
+def get_agent_catalog():
+    """Indexes over the shared registry, rebuilt only when the registry reloads"""
+    return _build_agent_catalog(AGENT_REGISTRY, AGENT_REGISTRY['mtime_ns'])
+
+def _prefix_matches(catalog, prefix):
+    """Agents with any keyword starting with prefix, via binary search on sorted tokens"""
+    tokens = catalog['tokens']
+    matches = set()
+    i = bisect.bisect_left(tokens, prefix)
+    while i < len(tokens) and tokens[i].startswith(prefix):
+        matches |= catalog['by_token'][tokens[i]]
+        i += 1
+    return matches
+
+def search_agents(query="", category="All"):
+    """Agent IDs matching every query word by prefix, optionally within a category"""
+    catalog = get_agent_catalog()
+    candidates = catalog['order'] if category == "All" else catalog['by_category'].get(category, ())
+
+    words = _keyword_tokens(query)
+    if not words:
+        return candidates
+
+    matches = None
+    for word in words:
+        word_matches = _prefix_matches(catalog, word)
+        matches = word_matches if matches is None else matches & word_matches
+        if not matches:
+            return ()
+
+    if category != "All":
+        matches = matches.intersection(candidates)
+    return tuple(sorted(matches, key=catalog['position'].__getitem__))
+
+def rerun_fragment():
+    """Rerun only the calling fragment, falling back to a full rerun during full-app runs"""
+    enforce_session_memory()
+    save_durable_state()
+    try:
+        st.rerun(scope="fragment")
+    except StreamlitAPIException:
+        st.rerun()
 
 def get_agent_categories():
     """Get unique categories from agents"""
-    categories = set()
-    for agent_config in st.session_state.agent_configs.values():
-        categories.add(agent_config['category'])
-    return sorted(list(categories))
+    return list(get_agent_catalog()['categories'])
 
 # Sidebar Navigation
-with st.sidebar:
+with st.sidebar, profile_span("sidebar"):
     st.title("🚀 25-Agent Dashboard")
     st.divider()
     
@@ -642,7 +2671,7 @@ with st.sidebar:
         st.caption(f"User: {st.session_state.user_info['email']}")
         
         if st.button("🚪 Sign Out Google"):
-            for key in ['authenticated', 'credentials', 'user_info']:
+            for key in ['authenticated', 'credentials', 'credentials_key', 'account_id', 'user_info']:
                 st.session_state[key] = None if key != 'authenticated' else False
             st.rerun()
     
@@ -665,45 +2694,77 @@ with st.sidebar:
     for name, info in REAL_SPREADSHEETS.items():
         st.caption(f"{info['icon']} {name}: {info['id'][:15]}...")
     
+    # Durable state status
+    state_backend = get_state_backend(STATE_BACKEND_URL)
+    if state_backend is None:
+        st.info("**Session Storage:** ⚠️ This browser tab only")
+    elif st.session_state.get('durable_error'):
+        st.warning(f"**Session Storage:** {state_backend.description} unavailable: {st.session_state.durable_error}")
+    else:
+        st.info(f"**Session Storage:** ✅ {state_backend.description}")
+    
+    # Memory governor status, as measured at the end of the previous run
+    if 'memory_usage' in st.session_state:
+        memory = process_memory_summary()
+        st.info(f"**Memory:** {format_bytes(sum(st.session_state.memory_usage.values()))} of {format_bytes(SESSION_MEMORY_BUDGET_BYTES)} this session")
+        st.caption(
+            f"Sheet cache {format_bytes(memory['cache_resident_bytes'])} of {format_bytes(SHEET_CACHE_BUDGET_BYTES)}"
+            + (f" · {memory['cache_spilled_sheets']} spilled to disk" if memory['cache_spilled_sheets'] else "")
+            + f" · {memory['sessions']} active sessions"
+        )
+    
+    st.toggle("🐞 Performance Debug", key="perf_debug", help="Show per-section timings for each rerun")
+    
     st.divider()
     
     # Agent Selection
     if st.session_state.authenticated:
         st.subheader("🤖 Select Agent")
         
-        # Category filter
+        # Category filter and keyword search
         categories = get_agent_categories()
         selected_category = st.selectbox("Filter by Category:", ["All"] + categories)
+        search_query = st.text_input("🔍 Search Agents:", placeholder="Name, skill or keyword")
+        
+        agent_options = search_agents(search_query, selected_category)
         
-        # Filter agents by category
-        if selected_category == "All":
-            filtered_agents = st.session_state.agent_configs
+        # Paginate so the selectbox never holds the whole catalog
+        total_pages = max(1, -(-len(agent_options) // AGENTS_PAGE_SIZE))
+        if total_pages > 1:
+            page = st.number_input(f"Page (of {total_pages}):", min_value=1, max_value=total_pages, value=1, step=1)
+            st.caption(f"{len(agent_options)} matching agents")
         else:
-            filtered_agents = {
-                k: v for k, v in st.session_state.agent_configs.items() 
-                if v['category'] == selected_category
-            }
+            page = 1
+        page_options = list(agent_options[(page - 1) * AGENTS_PAGE_SIZE:page * AGENTS_PAGE_SIZE])
         
         # Agent selection
-        agent_options = list(filtered_agents.keys())
-        
-        if agent_options:
+        if page_options:
+            page_labels = {}
+            for agent_id in page_options:
+                agent = get_agent_config(agent_id)
+                page_labels[agent_id] = f"{agent['icon']} {agent['name']}"
+            
             current_agent = st.selectbox(
                 "Choose Agent:",
-                agent_options,
-                index=agent_options.index(st.session_state.current_page) if st.session_state.current_page in agent_options else 0,
-                format_func=lambda x: f"{filtered_agents[x]['icon']} {filtered_agents[x]['name']}"
+                page_options,
+                index=page_options.index(st.session_state.current_page) if st.session_state.current_page in page_options else None,
+                placeholder="Select an agent...",
+                format_func=page_labels.get
             )
             
-            if current_agent != st.session_state.current_page:
+            if current_agent is not None and current_agent != st.session_state.current_page:
                 st.session_state.current_page = current_agent
+                if 'spreadsheet' in get_agent_config(current_agent):
+                    prefetch_spreadsheet(get_agent_config(current_agent)['spreadsheet'])
                 st.rerun()
+        else:
+            st.info("No agents match your search.")
         
         st.divider()
         
         # Current Agent Info
-        if st.session_state.current_page in st.session_state.agent_configs:
-            config = st.session_state.agent_configs[st.session_state.current_page]
+        if st.session_state.current_page in get_agent_configs():
+            config = get_agent_config(st.session_state.current_page)
             
             st.subheader("📋 Current Agent")
             st.markdown(f"""
@@ -728,12 +2789,12 @@ Spreadsheet ID: {config['spreadsheet']['id'] if 'spreadsheet' in config else 'N/
         st.subheader("📊 Dashboard Stats")
         col1, col2 = st.columns(2)
         with col1:
-            st.metric("Total Agents", len(st.session_state.agent_configs))
+            st.metric("Total Agents", len(get_agent_configs()))
             st.metric("Categories", len(get_agent_categories()))
         with col2:
             total_calls = sum(len(calls) for calls in st.session_state.ai_calls.values())
             st.metric("Total Calls", total_calls)
-            total_chats = sum(len(chats) for chats in st.session_state.chat_sessions.values())
+            total_chats = sum(count_chat_messages(agent_id) for agent_id in st.session_state.chat_sessions)
             st.metric("Chat Messages", total_chats)
 
 # Main Content Area
@@ -793,13 +2854,11 @@ if not st.session_state.authenticated:
         
         for j, category in enumerate(row_categories):
             with cols[j]:
-                agents_in_category = [
-                    agent for agent in st.session_state.agent_configs.values() 
-                    if agent['category'] == category
-                ]
+                agents_in_category = get_agent_catalog()['by_category'][category]
                 st.markdown(f"### {category}")
                 st.metric("Agents", len(agents_in_category))
-                for agent in agents_in_category[:3]:  # Show first 3
+                for agent_id in agents_in_category[:3]:  # Show first 3
+                    agent = get_agent_config(agent_id)
                     st.caption(f"{agent['icon']} {agent['name']}")
                 if len(agents_in_category) > 3:
                     st.caption(f"... and {len(agents_in_category) - 3} more")
@@ -815,13 +2874,15 @@ if not st.session_state.authenticated:
             st.code(f"ID: {info['id'][:20]}...")
             
             # Count agents using this spreadsheet
-            agents_using = sum(1 for agent in AGENTS_CONFIG.values() 
-                             if agent.get('spreadsheet', {}).get('id') == info['id'])
+            agents_using = len(get_agent_catalog()['by_spreadsheet'].get(info['id'], ()))
             st.metric("Agents Using", agents_using)
 
 else:
     # Main dashboard for authenticated users
-    current_config = st.session_state.agent_configs[st.session_state.current_page]
+    if st.session_state.current_page not in AGENTS_CONFIG:
+        # Agent was removed from the registry since this session selected it
+        st.session_state.current_page = next(iter(AGENTS_CONFIG))
+    current_config = get_agent_config(st.session_state.current_page)
     
     # Page header with agent info
     col1, col2, col3 = st.columns([2, 1, 1])
@@ -840,7 +2901,7 @@ else:
     
     # Page Navigation Buttons
     st.write("### 📑 Page Navigation")
-    page_nav_cols = st.columns(4)
+    page_nav_cols = st.columns(6)
     
     with page_nav_cols[0]:
         if st.button("🤖 Chatbot", use_container_width=True):
@@ -862,6 +2923,16 @@ else:
             st.session_state.current_tab = 'prompts'
             st.rerun()
     
+    with page_nav_cols[4]:
+        if st.button("📈 Performance", use_container_width=True):
+            st.session_state.current_tab = 'performance'
+            st.rerun()
+    
+    with page_nav_cols[5]:
+        if st.button("🌐 All Agents", use_container_width=True):
+            st.session_state.current_tab = 'portfolio'
+            st.rerun()
+    
     # Set default tab if not set
     if 'current_tab' not in st.session_state:
         st.session_state.current_tab = 'chatbot'
@@ -874,68 +2945,126 @@ else:
         if st.session_state.current_page not in st.session_state.chat_sessions:
             st.session_state.chat_sessions[st.session_state.current_page] = []
         
-        # Chat settings in sidebar
-        with st.expander("⚙️ Chat Settings"):
-            col1, col2, col3 = st.columns(3)
-            with col1:
-                st.session_state.use_tts = st.checkbox("🔈 Text-to-Speech", value=st.session_state.use_tts)
-            with col2:
-                st.session_state.show_timestamps = st.checkbox("🕒 Timestamps", value=st.session_state.show_timestamps)
-            with col3:
-                if st.button("🗑️ Clear Chat"):
-                    st.session_state.chat_sessions[st.session_state.current_page] = []
-                    st.rerun()
-        
-        # Display chat history
-        chat_container = st.container()
-        with chat_container:
-            for message in st.session_state.chat_sessions[st.session_state.current_page]:
-                with st.chat_message(message['role']):
-                    if st.session_state.show_timestamps:
-                        st.caption(f"⏱️ {message.get('timestamp', '')}")
-                    st.markdown(message['content'])
+        # Transcript and input rerun without the sidebar, header and footer
+        @st.fragment
+        @profile_span("chat_panel")
+        def chat_panel():
+            # Chat settings in sidebar
+            with st.expander("⚙️ Chat Settings"):
+                col1, col2, col3 = st.columns(3)
+                with col1:
+                    st.session_state.use_tts = st.checkbox("🔈 Text-to-Speech", value=st.session_state.use_tts)
+                with col2:
+                    st.session_state.show_timestamps = st.checkbox("🕒 Timestamps", value=st.session_state.show_timestamps)
+                with col3:
+                    if st.button("🗑️ Clear Chat"):
+                        reset_chat_conversation(st.session_state.current_page)
+                        rerun_fragment()
+                context_bytes = st.session_state.chat_context.get(st.session_state.current_page, {}).get('bytes', 0)
+                st.caption(f"🧠 Context sent with each message: {context_bytes:,} of {CONTEXT_BUDGET_BYTES:,} bytes · Session `{get_chat_session_id(st.session_state.current_page)[:8]}`")
         
-        # Chat input
-        user_input = st.chat_input(f"Message {current_config['name']}...")
+            # Display chat history; archived turns are only decompressed on request
+            chat_container = st.container()
+            with chat_container:
+                messages = st.session_state.chat_sessions[st.session_state.current_page]
+                archived = count_chat_messages(st.session_state.current_page) - len(messages)
+                if archived and st.toggle(f"🗜️ Show {archived} earlier messages", key=f"archive_{st.session_state.current_page}"):
+                    messages = load_chat_archive(st.session_state.current_page) + messages
+                for message in messages:
+                    with st.chat_message(message['role']):
+                        if st.session_state.show_timestamps:
+                            st.caption(f"⏱️ {message.get('timestamp', '')}")
+                        st.markdown(message['content'])
         
-        # Voice input and quick actions
-        input_col1, input_col2, input_col3 = st.columns([1, 1, 4])
+            # Chat input
+            user_input = st.chat_input(f"Message {current_config['name']}...")
         
-        with input_col1:
-            if st.button("🎙️ Voice", key=f"voice_{st.session_state.current_page}"):
-                st.info("🎤 Voice input activated (simulated)")
-                user_input = f"Voice message for {current_config['name']}: How can you help me today?"
+            # Voice input and quick actions
+            input_col1, input_col2, input_col3 = st.columns([1, 1, 4])
         
-        with input_col2:
-            if st.button("⚡ Quick Help", key=f"quick_{st.session_state.current_page}"):
-                user_input = f"What are your main capabilities and how can you help me with {current_config['specialization']}?"
+            with input_col1:
+                with st.popover("🎙️ Voice"):
+                    st.session_state.voice_engine = st.selectbox(
+                        "Transcription Engine:",
+                        list(TRANSCRIPTION_ENGINES.keys()),
+                        index=list(TRANSCRIPTION_ENGINES.keys()).index(st.session_state.voice_engine),
+                        format_func=lambda x: TRANSCRIPTION_ENGINES[x]['label']
+                    )
+                    recording = st.audio_input("Record a message", key=f"voice_{st.session_state.current_page}")
+
+                voice_job = st.session_state.voice_job
+                if recording is not None and (voice_job is None or voice_job['recording_id'] != recording.file_id):
+                    voice_job = start_voice_transcription(
+                        st.session_state.current_page,
+                        recording.file_id,
+                        recording.getvalue(),
+                        st.session_state.voice_engine
+                    )
+                    st.session_state.voice_job = voice_job
+
+            if voice_job and voice_job['agent_id'] == st.session_state.current_page:
+                render_voice_transcript(voice_job)
+
+            if st.session_state.pending_voice_input:
+                user_input = st.session_state.pending_voice_input
+                st.session_state.pending_voice_input = None
+
+            with input_col2:
+                if st.button("⚡ Quick Help", key=f"quick_{st.session_state.current_page}"):
+                    user_input = f"What are your main capabilities and how can you help me with {current_config['specialization']}?"
+
+            with input_col3:
+                attach_data = False
+                if 'spreadsheet' in current_config:
+                    attach_data = st.toggle(
+                        "📎 Attach my data",
+                        key=f"attach_{st.session_state.current_page}",
+                        help=f"Send a summary of {current_config['spreadsheet']['name']} (schema, totals, top values, latest rows) with each message",
+                        disabled=not st.session_state.authenticated
+                    )
         
-        # Process input
-        if user_input:
-            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            
-            # Add user message
-            user_msg = {
-                "role": "user",
-                "content": user_input,
-                "timestamp": timestamp
-            }
-            st.session_state.chat_sessions[st.session_state.current_page].append(user_msg)
+            # Process input
+            if user_input:
+                timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
             
-            # Get AI response
-            with st.spinner(f"🤖 {current_config['name']} is thinking..."):
-                response = send_message_to_webhook(st.session_state.current_page, user_input)
+                # Add user message
+                user_msg = {
+                    "role": "user",
+                    "content": user_input,
+                    "timestamp": timestamp
+                }
+                st.session_state.chat_sessions[st.session_state.current_page].append(user_msg)
+                log_chat_message(st.session_state.current_page, user_msg)
             
-            # Add assistant message
-            assistant_msg = {
-                "role": "assistant",
-                "content": response,
-                "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            }
+                # Get AI response
+                with st.spinner(f"🤖 {current_config['name']} is thinking..."):
+                    history = st.session_state.chat_sessions[st.session_state.current_page][:-1]
+                    data_digest = None
+                    if attach_data:
+                        data_digest, digest_error = get_sheet_digest(st.session_state.current_page)
+                        if digest_error:
+                            st.toast(f"📎 Sent without data: {digest_error}")
+                    response = send_message_to_webhook(
+                        st.session_state.current_page,
+                        user_input,
+                        session_id=get_chat_session_id(st.session_state.current_page),
+                        context=build_chat_context(st.session_state.current_page, history),
+                        data_digest=data_digest
+                    )
             
-            st.session_state.chat_sessions[st.session_state.current_page].append(assistant_msg)
-            st.rerun()
-    
+                # Add assistant message
+                assistant_msg = {
+                    "role": "assistant",
+                    "content": response,
+                    "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                }
+            
+                st.session_state.chat_sessions[st.session_state.current_page].append(assistant_msg)
+                log_chat_message(st.session_state.current_page, assistant_msg)
+                rerun_fragment()
+
+        chat_panel()
+
     elif st.session_state.current_tab == 'data':
         st.header("📊 Google Sheets Data & Analytics")
         
@@ -944,38 +3073,73 @@ else:
             spreadsheet_info = current_config['spreadsheet']
             st.info(f"📋 Connected to: **{spreadsheet_info['name']}** ({spreadsheet_info['description']}) - ID: `{spreadsheet_info['id']}`")
         
+            # Pick up a newer revision another session or the background probe has cached
+            entry = get_cached_sheet((st.session_state.credentials_key, spreadsheet_info['id'])) if st.session_state.authenticated else None
+            if entry:
+                st.session_state.sheets_data[st.session_state.current_page] = entry['df']
+        
         # Load data for current agent
         if st.session_state.current_page not in st.session_state.sheets_data:
-            with st.spinner("Loading data from Google Sheets..."):
-                df, error = load_spreadsheet_data(st.session_state.current_page)
-                if error:
-                    st.error(f"❌ {error}")
-                    
-                    # Show helpful instructions
-                    st.markdown("""
-                    ### 📝 To view data in this section:
-                    
-                    1. **Ensure you're authenticated** with Google (check sidebar)
-                    2. **Add data to your Google Sheet** with the configured spreadsheet ID
-                    3. **Make sure the spreadsheet is shared** with your service account email
-                    4. **Include column headers** in your first row
-                    5. **Click 'Refresh Data'** button below to reload
-                    
-                    **Spreadsheet Requirements:**
-                    - At least one row of data (excluding headers)
-                    - Proper column names in the first row
-                    - Accessible to your service account
-                    """)
-                    
-                    if st.button("🔄 Refresh Data", key="refresh_error"):
-                        # Clear cached data and try again
-                        if st.session_state.current_page in st.session_state.sheets_data:
-                            del st.session_state.sheets_data[st.session_state.current_page]
-                        st.rerun()
-                    
-                    st.stop()  # Exit early if no data
-                else:
-                    st.session_state.sheets_data[st.session_state.current_page] = df
+            load_progress = st.progress(0.0, text="Loading data from Google Sheets...")
+            
+            # Paint the first rows from one range read while the full sheet streams in behind them
+            preview_slot = st.empty()
+            if st.session_state.authenticated and 'spreadsheet' in current_config:
+                try:
+                    full_load = schedule_sheet_load(current_config['spreadsheet'], PRIORITY_INTERACTIVE)
+                    preview_load = schedule_sheet_preview(current_config['spreadsheet'])
+                    wait_for_futures([full_load, preview_load], return_when=FIRST_COMPLETED)
+                    preview = None if full_load.done() else preview_load.result()[0]
+                except Exception:
+                    preview = None
+                
+                if preview is not None:
+                    with preview_slot.container():
+                        st.info(f"👀 Showing the first {len(preview):,} rows while the full sheet loads in the background...")
+                        preview_cols = preview.select_dtypes(include=['number']).columns[:4]
+                        if len(preview_cols):
+                            for metric_col, col in zip(st.columns(len(preview_cols)), preview_cols):
+                                with metric_col:
+                                    st.metric(col, format_metric_value(preview[col].sum()), help=f"Total over the first {len(preview):,} rows")
+                        st.dataframe(preview, use_container_width=True, height=400)
+            
+            df, error = load_spreadsheet_data(
+                st.session_state.current_page,
+                on_progress=lambda rows_read, rows_total: load_progress.progress(
+                    min(rows_read / max(rows_total, 1), 1.0),
+                    text=f"Loading data from Google Sheets... {rows_read:,} of up to {rows_total:,} rows"
+                )
+            )
+            load_progress.empty()
+            preview_slot.empty()
+            if error:
+                st.error(f"❌ {error}")
+                
+                # Show helpful instructions
+                st.markdown("""
+                ### 📝 To view data in this section:
+                
+                1. **Ensure you're authenticated** with Google (check sidebar)
+                2. **Add data to your Google Sheet** with the configured spreadsheet ID
+                3. **Make sure the spreadsheet is shared** with your service account email
+                4. **Include column headers** in your first row
+                5. **Click 'Refresh Data'** button below to reload
+                
+                **Spreadsheet Requirements:**
+                - At least one row of data (excluding headers)
+                - Proper column names in the first row
+                - Accessible to your service account
+                """)
+                
+                if st.button("🔄 Refresh Data", key="refresh_error"):
+                    # Clear cached data and try again
+                    if st.session_state.current_page in st.session_state.sheets_data:
+                        del st.session_state.sheets_data[st.session_state.current_page]
+                    st.rerun()
+                
+                st.stop()  # Exit early if no data
+            else:
+                st.session_state.sheets_data[st.session_state.current_page] = df
         
         if st.session_state.current_page in st.session_state.sheets_data:
             df = st.session_state.sheets_data[st.session_state.current_page]
@@ -983,341 +3147,520 @@ else:
             # Show data info
             st.success(f"✅ Successfully loaded {len(df)} rows and {len(df.columns)} columns from Google Sheets")
             
-            # Data overview metrics
-            st.subheader("📈 Key Metrics")
-            
-            # Dynamic metrics based on data columns
-            numeric_cols = df.select_dtypes(include=['number']).columns.tolist()
+            # Keeps this sheet fresh: probes Drive in the background and redraws when a new version lands
+            @st.fragment(run_every=SHEET_WATCH_SECONDS)
+            def sheet_freshness_panel(spreadsheet_info, df):
+                revalidate_sheet(spreadsheet_info)
+                entry = get_cached_sheet((st.session_state.credentials_key, spreadsheet_info['id']))
+                if entry is None:
+                    return
+                if entry['df'] is not df:
+                    st.session_state.sheets_data[st.session_state.current_page] = entry['df']
+                    st.rerun()
+                checked = int(time.monotonic() - entry['checked_at'])
+                version = f"Drive version {entry['version']}" if entry['version'] else "Drive version unavailable"
+                modified = f" · modified {entry['modified_time'][:19].replace('T', ' ')} UTC" if entry['modified_time'] else ""
+                st.caption(f"🔁 {version}{modified} · checked for changes {checked}s ago")
             
-            if len(numeric_cols) >= 1:
-                # Create metrics based on available numeric columns
-                metric_cols = st.columns(min(4, len(numeric_cols)))
+            if 'spreadsheet' in current_config and st.session_state.authenticated:
+                sheet_freshness_panel(current_config['spreadsheet'], df)
                 
-                for i, col in enumerate(numeric_cols[:4]):  # Show up to 4 metrics
-                    with metric_cols[i]:
-                        if len(df) >= 2:
-                            current_val = df[col].iloc[-1] if not pd.isna(df[col].iloc[-1]) else 0
-                            prev_val = df[col].iloc[-2] if not pd.isna(df[col].iloc[-2]) else 0
-                            delta = current_val - prev_val
-                            
-                            # Format numbers appropriately
-                            if abs(current_val) >= 1000000:
-                                display_val = f"{current_val/1000000:.1f}M"
-                            elif abs(current_val) >= 1000:
-                                display_val = f"{current_val/1000:.1f}K"
-                            else:
-                                display_val = f"{current_val:,.1f}"
-                            
-                            st.metric(col, display_val, delta=f"{delta:,.1f}")
-                        else:
-                            st.metric(col, f"{df[col].iloc[-1]:,.1f}" if not pd.isna(df[col].iloc[-1]) else "N/A")
-            else:
-                st.info("📊 No numeric columns found for metrics. Add numeric data to see key performance indicators.")
+                entry = get_cached_sheet((st.session_state.credentials_key, current_config['spreadsheet']['id']))
+                if entry and entry['df'] is df and entry.get('memory') is not None:
+                    memory = entry['memory']
+                    before, after = memory['bytes_before'].sum(), memory['bytes_after'].sum()
+                    with st.expander(f"💾 Memory: {format_bytes(after)} (compacted from {format_bytes(before)}, {before / max(after, 1):.1f}× smaller)"):
+                        st.dataframe(
+                            memory.assign(bytes_before=memory['bytes_before'] / 1024, bytes_after=memory['bytes_after'] / 1024),
+                            use_container_width=True,
+                            column_config={
+                                "dtype_before": "Loaded as",
+                                "dtype_after": "Stored as",
+                                "bytes_before": st.column_config.NumberColumn("Before (KB)", format="%.1f"),
+                                "bytes_after": st.column_config.NumberColumn("After (KB)", format="%.1f")
+                            }
+                        )
+                        st.markdown("**All cached sheets**")
+                        st.dataframe(sheet_memory_report(), use_container_width=True, hide_index=True)
             
-            # Data visualization
-            st.subheader("📊 Data Visualizations")
+            with profile_span("data.metrics"):
+                # Data overview metrics
+                st.subheader("📈 Key Metrics")
             
-            if len(numeric_cols) >= 1:
-                viz_col1, viz_col2 = st.columns(2)
-                
-                # Find date column for time series
-                date_cols = [col for col in df.columns if 'date' in col.lower() or 'time' in col.lower() or 'created' in col.lower()]
-                date_col = date_cols[0] if date_cols else None
-                
-                with viz_col1:
-                    if date_col and len(numeric_cols) >= 1:
-                        # Time series chart
-                        fig1 = px.line(df, x=date_col, y=numeric_cols[0], 
-                                      title=f'{numeric_cols[0]} Over Time',
-                                      color_discrete_sequence=['#1f77b4'])
-                        fig1.update_layout(height=300)
-                        st.plotly_chart(fig1, use_container_width=True)
-                    elif len(numeric_cols) >= 1:
-                        # Bar chart if no date column
-                        fig1 = px.bar(df.head(10), x=df.columns[0], y=numeric_cols[0], 
-                                     title=f'{numeric_cols[0]} by {df.columns[0]}',
-                                     color_discrete_sequence=['#1f77b4'])
-                        fig1.update_layout(height=300)
-                        st.plotly_chart(fig1, use_container_width=True)
+                # Dynamic metrics based on data columns
+                numeric_cols = df.select_dtypes(include=['number']).columns.tolist()
+            
+                if len(numeric_cols) >= 1:
+                    spreadsheet_id = current_config['spreadsheet']['id']
+                    kpis = compute_kpis(spreadsheet_id, get_sheet_revision(spreadsheet_id, df), df)
+                    
+                    # Per-agent choice of KPI cards, defaulting to the first four numeric columns
+                    kpi_key = f"kpis_{st.session_state.current_page}"
+                    if kpi_key in st.session_state:
+                        st.session_state[kpi_key] = [col for col in st.session_state[kpi_key] if col in kpis.index]
+                    else:
+                        st.session_state[kpi_key] = list(kpis.index[:4])
+                    selected_kpis = st.multiselect("Show KPIs:", list(kpis.index), key=kpi_key)
+                    
+                    for row_start in range(0, len(selected_kpis), 4):
+                        metric_cols = st.columns(4)
+                        for i, col in enumerate(selected_kpis[row_start:row_start + 4]):
+                            kpi = kpis.loc[col]
+                            with metric_cols[i]:
+                                delta = None
+                                if not pd.isna(kpi['delta']):
+                                    delta = f"{kpi['delta']:,.1f}"
+                                    if not pd.isna(kpi['pct_change']):
+                                        delta += f" ({kpi['pct_change']:+.1%})"
+                                st.metric(
+                                    col,
+                                    format_metric_value(kpi['latest']),
+                                    delta=delta,
+                                    help=f"{KPI_TRENDS[kpi['trend']]} · {KPI_ROLLING_WINDOW}-row avg {format_metric_value(kpi['rolling_mean'])}"
+                                         + (f" · {kpi['growth']:+.1%} over {KPI_ROLLING_WINDOW} rows" if not pd.isna(kpi['growth']) else "")
+                                )
+                    
+                    with st.expander(f"📋 All KPIs ({len(kpis)} columns)"):
+                        st.dataframe(
+                            kpis.assign(
+                                pct_change=kpis['pct_change'] * 100,
+                                growth=kpis['growth'] * 100,
+                                trend=kpis['trend'].map(KPI_TRENDS)
+                            ),
+                            use_container_width=True,
+                            column_config={
+                                "pct_change": st.column_config.NumberColumn("Change %", format="%.1f%%"),
+                                "growth": st.column_config.NumberColumn(f"{KPI_ROLLING_WINDOW}-Row Growth %", format="%.1f%%"),
+                                "rolling_mean": st.column_config.NumberColumn(f"{KPI_ROLLING_WINDOW}-Row Avg")
+                            }
+                        )
+                else:
+                    st.info("📊 No numeric columns found for metrics. Add numeric data to see key performance indicators.")
+            
+            with profile_span("data.charts"):
+                # Data visualization
+                st.subheader("📊 Data Visualizations")
+            
+                if len(numeric_cols) >= 1:
+                    # Find date column for time series
+                    date_cols = [col for col in df.columns if 'date' in col.lower() or 'time' in col.lower() or 'created' in col.lower()]
+                    spreadsheet_id = current_config['spreadsheet']['id']
+                    rollups = None
+                    for date_col in date_cols:
+                        # A matching name is no guarantee of dates, e.g. "Created By"
+                        rollups = get_sheet_rollups(spreadsheet_id, get_sheet_revision(spreadsheet_id, df), df, date_col)
+                        if rollups is not None:
+                            break
                 
-                with viz_col2:
-                    if len(numeric_cols) >= 2:
-                        if date_col:
-                            # Second time series
-                            fig2 = px.area(df, x=date_col, y=numeric_cols[1], 
-                                          title=f'{numeric_cols[1]} Over Time',
-                                          color_discrete_sequence=['#ff7f0e'])
-                            fig2.update_layout(height=300)
-                            st.plotly_chart(fig2, use_container_width=True)
-                        else:
-                            # Scatter plot
-                            fig2 = px.scatter(df, x=numeric_cols[0], y=numeric_cols[1], 
-                                             title=f'{numeric_cols[1]} vs {numeric_cols[0]}',
-                                             color_discrete_sequence=['#ff7f0e'])
-                            fig2.update_layout(height=300)
-                            st.plotly_chart(fig2, use_container_width=True)
+                    if rollups is not None:
+                        # Charts read pre-bucketed rollups; switching granularity reruns only this panel
+                        @st.fragment
+                        @profile_span("time_series_panel")
+                        def time_series_panel(rollups, numeric_cols):
+                            select_col1, select_col2 = st.columns(2)
+                            with select_col1:
+                                granularity = st.radio("Granularity:", list(ROLLUP_GRANULARITIES), index=2, horizontal=True)
+                            with select_col2:
+                                stat = st.selectbox("Aggregate:", list(ROLLUP_STATS), format_func=ROLLUP_STATS.get)
+                            rollup = rollups[granularity][stat]
+                            st.caption(f"🗓️ {len(rollup)} {granularity.lower()} buckets")
+                        
+                            viz_col1, viz_col2 = st.columns(2)
+                            with viz_col1:
+                                fig1 = px.line(rollup, x=rollup.index, y=numeric_cols[0],
+                                              title=f'{ROLLUP_STATS[stat]} of {numeric_cols[0]} by {granularity}',
+                                              color_discrete_sequence=['#1f77b4'])
+                                fig1.update_layout(height=300, xaxis_title=None)
+                                st.plotly_chart(fig1, use_container_width=True)
+                            with viz_col2:
+                                if len(numeric_cols) >= 2:
+                                    fig2 = px.area(rollup, x=rollup.index, y=numeric_cols[1],
+                                                  title=f'{ROLLUP_STATS[stat]} of {numeric_cols[1]} by {granularity}',
+                                                  color_discrete_sequence=['#ff7f0e'])
+                                else:
+                                    counts = rollups[granularity]['count']
+                                    fig2 = px.bar(counts, x=counts.index, y=numeric_cols[0],
+                                                 title=f'Rows per {granularity}',
+                                                 color_discrete_sequence=['#ff7f0e'])
+                                fig2.update_layout(height=300, xaxis_title=None)
+                                st.plotly_chart(fig2, use_container_width=True)
+                    
+                        time_series_panel(rollups, numeric_cols)
                     else:
-                        # Histogram if only one numeric column
-                        fig2 = px.histogram(df, x=numeric_cols[0], 
-                                           title=f'Distribution of {numeric_cols[0]}',
-                                           color_discrete_sequence=['#ff7f0e'])
-                        fig2.update_layout(height=300)
-                        st.plotly_chart(fig2, use_container_width=True)
+                        viz_col1, viz_col2 = st.columns(2)
+                    
+                        with viz_col1:
+                            # Bar chart if no date column
+                            fig1 = px.bar(df.head(10), x=df.columns[0], y=numeric_cols[0], 
+                                         title=f'{numeric_cols[0]} by {df.columns[0]}',
+                                         color_discrete_sequence=['#1f77b4'])
+                            fig1.update_layout(height=300)
+                            st.plotly_chart(fig1, use_container_width=True)
+                    
+                        with viz_col2:
+                            if len(numeric_cols) >= 2:
+                                # Scatter plot
+                                fig2 = px.scatter(df, x=numeric_cols[0], y=numeric_cols[1], 
+                                                 title=f'{numeric_cols[1]} vs {numeric_cols[0]}',
+                                                 color_discrete_sequence=['#ff7f0e'])
+                                fig2.update_layout(height=300)
+                                st.plotly_chart(fig2, use_container_width=True)
+                            else:
+                                # Histogram if only one numeric column
+                                fig2 = px.histogram(df, x=numeric_cols[0], 
+                                                   title=f'Distribution of {numeric_cols[0]}',
+                                                   color_discrete_sequence=['#ff7f0e'])
+                                fig2.update_layout(height=300)
+                                st.plotly_chart(fig2, use_container_width=True)
                 
-                # Correlation heatmap if multiple numeric columns
-                if len(numeric_cols) > 2:
-                    st.subheader("🔥 Correlation Analysis")
-                    correlation_matrix = df[numeric_cols].corr()
-                    fig_heatmap = px.imshow(correlation_matrix, 
-                                           text_auto=True, 
-                                           aspect="auto",
-                                           title="Metrics Correlation Heatmap",
-                                           color_continuous_scale='RdBu')
-                    fig_heatmap.update_layout(height=400)
-                    st.plotly_chart(fig_heatmap, use_container_width=True)
-            else:
-                st.info("📈 Add numeric columns to your spreadsheet to see data visualizations.")
+                    # Correlation heatmap if multiple numeric columns
+                    if len(numeric_cols) > 2:
+                        st.subheader("🔥 Correlation Analysis")
+                        correlation_matrix = df[numeric_cols].corr()
+                        fig_heatmap = px.imshow(correlation_matrix, 
+                                               text_auto=True, 
+                                               aspect="auto",
+                                               title="Metrics Correlation Heatmap",
+                                               color_continuous_scale='RdBu')
+                        fig_heatmap.update_layout(height=400)
+                        st.plotly_chart(fig_heatmap, use_container_width=True)
+                else:
+                    st.info("📈 Add numeric columns to your spreadsheet to see data visualizations.")
+            
+            # Filters and table rerun without redrawing the charts above
+            @st.fragment
+            @profile_span("data_table_panel")
+            def data_table_panel(df):
+                # Data table with filtering
+                st.subheader("📋 Data Table")
+            
+                # Add filters
+                filter_col1, filter_col2 = st.columns(2)
+            
+                with filter_col1:
+                    # Date filter if date column exists
+                    date_cols = [col for col in df.columns if 'date' in col.lower() or 'time' in col.lower()]
+                    date_values = None
+                    if date_cols:
+                        date_col = date_cols[0]
+                        try:
+                            # Frames can be shared between sessions, so convert a copy of the column
+                            date_values = pd.to_datetime(df[date_col], errors='coerce')
+                            min_date = date_values.min().date()
+                            max_date = date_values.max().date()
+                            date_range = st.date_input(
+                                "Date Range:",
+                                value=(min_date, max_date),
+                                min_value=min_date,
+                                max_value=max_date
+                            )
+                        except:
+                            date_range = None
+                    else:
+                        st.info("No date columns found for filtering")
+                        date_range = None
             
-            # Data table with filtering
-            st.subheader("📋 Data Table")
+                with filter_col2:
+                    show_rows = st.selectbox("Show rows:", [10, 20, 50, "All"], index=1)
             
-            # Add filters
-            filter_col1, filter_col2 = st.columns(2)
+                # Apply filters
+                filtered_df = df.copy()
+                if date_values is not None:
+                    filtered_df[date_cols[0]] = date_values
             
-            with filter_col1:
-                # Date filter if date column exists
-                date_cols = [col for col in df.columns if 'date' in col.lower() or 'time' in col.lower()]
-                if date_cols:
-                    date_col = date_cols[0]
+                if date_range and date_cols:
                     try:
-                        df[date_col] = pd.to_datetime(df[date_col], errors='coerce')
-                        min_date = df[date_col].min().date()
-                        max_date = df[date_col].max().date()
-                        date_range = st.date_input(
-                            "Date Range:",
-                            value=(min_date, max_date),
-                            min_value=min_date,
-                            max_value=max_date
-                        )
+                        filtered_df = filtered_df[
+                            (filtered_df[date_cols[0]].dt.date >= date_range[0]) & 
+                            (filtered_df[date_cols[0]].dt.date <= date_range[1])
+                        ]
                     except:
-                        date_range = None
-                else:
-                    st.info("No date columns found for filtering")
-                    date_range = None
+                        pass  # Skip date filtering if it fails
             
-            with filter_col2:
-                show_rows = st.selectbox("Show rows:", [10, 20, 50, "All"], index=1)
+                if show_rows != "All":
+                    filtered_df = filtered_df.tail(show_rows)
             
-            # Apply filters
-            filtered_df = df.copy()
+                st.dataframe(filtered_df, use_container_width=True, height=300)
             
-            if date_range and date_cols:
-                try:
-                    filtered_df = filtered_df[
-                        (filtered_df[date_cols[0]].dt.date >= date_range[0]) & 
-                        (filtered_df[date_cols[0]].dt.date <= date_range[1])
-                    ]
-                except:
-                    pass  # Skip date filtering if it fails
+                # Export section
+                st.subheader("💾 Export Options")
+                export_col1, export_col2, export_col3, export_col4 = st.columns(4)
             
-            if show_rows != "All":
-                filtered_df = filtered_df.tail(show_rows)
+                with export_col1:
+                    csv = filtered_df.to_csv(index=False)
+                    st.download_button(
+                        label="📄 Download CSV",
+                        data=csv,
+                        file_name=f"{st.session_state.current_page}_data.csv",
+                        mime="text/csv"
+                    )
             
-            st.dataframe(filtered_df, use_container_width=True, height=300)
+                with export_col2:
+                    json_str = filtered_df.to_json(orient='records', date_format='iso')
+                    st.download_button(
+                        label="📋 Download JSON",
+                        data=json_str,
+                        file_name=f"{st.session_state.current_page}_data.json",
+                        mime="application/json"
+                    )
             
-            # Export section
-            st.subheader("💾 Export Options")
-            export_col1, export_col2, export_col3, export_col4 = st.columns(4)
+                with export_col3:
+                    if st.button("🔄 Refresh Data"):
+                        # Clear cached data and reload
+                        if st.session_state.current_page in st.session_state.sheets_data:
+                            del st.session_state.sheets_data[st.session_state.current_page]
+                        invalidate_cached_sheet((st.session_state.credentials_key, current_config['spreadsheet']['id']))
+                        st.rerun()
             
-            with export_col1:
-                csv = filtered_df.to_csv(index=False)
-                st.download_button(
-                    label="📄 Download CSV",
-                    data=csv,
-                    file_name=f"{st.session_state.current_page}_data.csv",
-                    mime="text/csv"
-                )
+                with export_col4:
+                    if st.button("📊 Generate Report"):
+                        st.info("📈 Comprehensive report generation feature coming soon!")
+
+            data_table_panel(df)
             
-            with export_col2:
-                json_str = filtered_df.to_json(orient='records', date_format='iso')
+            # Ad-hoc SQL over every cached sheet; reruns without redrawing the tab
+            @st.fragment
+            @profile_span("sql_console_panel")
+            def sql_console_panel():
+                st.subheader("🧮 SQL Console")
+                
+                tables = get_cached_sheet_rows()
+                tables_col, load_col = st.columns([4, 1])
+                with tables_col:
+                    st.caption("Tables: " + ", ".join(f"`{sql_table_name(name)}` ({rows:,} rows)" for name, rows in tables.items()))
+                with load_col:
+                    if len(tables) < len(REAL_SPREADSHEETS) and st.button("📥 Load all sheets"):
+                        with st.spinner("Loading all spreadsheets..."):
+                            load_all_spreadsheets()
+                        rerun_fragment()
+                
+                if not tables:
+                    st.info("No sheets are cached yet.")
+                    return
+                
+                if 'sql_query_text' not in st.session_state:
+                    st.session_state.sql_query_text = f"SELECT * FROM {sql_table_name(next(iter(tables)))} LIMIT 100"
+                query = st.text_area(
+                    "Query:",
+                    key="sql_query_text",
+                    height=120,
+                    help="Read-only SQL. Each cached spreadsheet is a table; join them freely."
+                )
+                
+                if st.button("▶️ Run Query", type="primary"):
+                    st.session_state.sql_query = query
+                    st.session_state.sql_page = 1
+                
+                if not st.session_state.get('sql_query'):
+                    return
+                
+                # Spilled sheets are only read back once there is a query to run
+                frames = get_cached_sheet_frames()
+                revisions = tuple(
+                    (name, get_sheet_revision(REAL_SPREADSHEETS[name]['id'], frame))
+                    for name, frame in frames.items()
+                )
+                started = time.perf_counter()
+                result, error = run_sql_query(st.session_state.sql_query, revisions, frames)
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                
+                if result is None:
+                    st.error(f"❌ {error}")
+                    return
+                if error:
+                    st.warning(f"⚠️ {error}")
+                
+                pages = max(1, math.ceil(len(result) / SQL_PAGE_SIZE))
+                if st.session_state.get('sql_page', 1) > pages:
+                    st.session_state.sql_page = pages
+                page_col, info_col = st.columns([1, 3])
+                with page_col:
+                    page = st.number_input("Page:", min_value=1, max_value=pages, step=1, key="sql_page")
+                with info_col:
+                    st.caption(f"⏱️ {len(result):,} rows in {elapsed_ms:,.0f} ms · page {page} of {pages}")
+                
+                start = (page - 1) * SQL_PAGE_SIZE
+                st.dataframe(result.iloc[start:start + SQL_PAGE_SIZE], use_container_width=True, hide_index=True)
                 st.download_button(
-                    label="📋 Download JSON",
-                    data=json_str,
-                    file_name=f"{st.session_state.current_page}_data.json",
-                    mime="application/json"
+                    label="📄 Download Result CSV",
+                    data=result.to_csv(index=False),
+                    file_name="query_result.csv",
+                    mime="text/csv"
                 )
-            
-            with export_col3:
-                if st.button("🔄 Refresh Data"):
-                    # Clear cached data and reload
-                    if st.session_state.current_page in st.session_state.sheets_data:
-                        del st.session_state.sheets_data[st.session_state.current_page]
-                    st.rerun()
-            
-            with export_col4:
-                if st.button("📊 Generate Report"):
-                    st.info("📈 Comprehensive report generation feature coming soon!")
-    
+
+            sql_console_panel()
+
     elif st.session_state.current_tab == 'ai_call':
         st.header("📞 AI Voice Call System")
         
-        # Call interface
-        call_col1, call_col2 = st.columns([1, 1])
+        # Call form and history rerun independently of the rest of the page
+        @st.fragment
+        @profile_span("call_panel")
+        def call_panel():
+            # Call interface
+            call_col1, call_col2 = st.columns([1, 1])
         
-        with call_col1:
-            st.subheader("📱 Agent Voice Details")
-            st.info(f"**Agent:** {current_config['name']}")
-            st.info(f"**Phone:** {current_config['ai_phone']}")
-            st.info(f"**Assistant ID:** {current_config['ai_assistant_id']}")
-            st.info(f"**Specialization:** {current_config['specialization']}")
+            with call_col1:
+                st.subheader("📱 Agent Voice Details")
+                st.info(f"**Agent:** {current_config['name']}")
+                st.info(f"**Phone:** {current_config['ai_phone']}")
+                st.info(f"**Assistant ID:** {current_config['ai_assistant_id']}")
+                st.info(f"**Specialization:** {current_config['specialization']}")
         
-        with call_col2:
-            st.subheader("🚀 Initiate Call")
-            
-            # Call form
-            with st.form("call_form"):
-                phone_number = st.text_input(
-                    "📱 Recipient Phone Number:", 
-                    placeholder="+1234567890",
-                    help="Enter the phone number to call"
-                )
+            with call_col2:
+                st.subheader("🚀 Initiate Call")
+            
+                # Call form
+                with st.form("call_form"):
+                    phone_number = st.text_input(
+                        "📱 Recipient Phone Number:", 
+                        placeholder="+1234567890",
+                        help="Enter the phone number to call"
+                    )
                 
-                call_purpose = st.selectbox(
-                    "📋 Call Purpose:",
-                    ["General Inquiry", "Sales Call", "Follow-up", "Support", "Consultation", "Other"]
-                )
+                    call_purpose = st.selectbox(
+                        "📋 Call Purpose:",
+                        ["General Inquiry", "Sales Call", "Follow-up", "Support", "Consultation", "Other"]
+                    )
                 
-                call_notes = st.text_area(
-                    "📝 Call Notes:",
-                    placeholder="Add any notes about this call...",
-                    height=100
-                )
+                    call_notes = st.text_area(
+                        "📝 Call Notes:",
+                        placeholder="Add any notes about this call...",
+                        height=100
+                    )
                 
-                submitted = st.form_submit_button("📞 Initiate Call", use_container_width=True)
+                    submitted = st.form_submit_button("📞 Initiate Call", use_container_width=True)
                 
-                if submitted and phone_number:
-                    call_data = make_ai_call(st.session_state.current_page, phone_number)
-                    call_data.update({
-                        "purpose": call_purpose,
-                        "notes": call_notes
-                    })
+                    if submitted and phone_number:
+                        call_data = make_ai_call(st.session_state.current_page, phone_number)
+                        call_data.update({
+                            "purpose": call_purpose,
+                            "notes": call_notes
+                        })
                     
-                    if st.session_state.current_page not in st.session_state.ai_calls:
-                        st.session_state.ai_calls[st.session_state.current_page] = []
+                        if st.session_state.current_page not in st.session_state.ai_calls:
+                            st.session_state.ai_calls[st.session_state.current_page] = []
                     
-                    st.session_state.ai_calls[st.session_state.current_page].append(call_data)
-                    st.success(f"✅ Call initiated! Call ID: {call_data['call_id'][:8]}...")
-                    st.rerun()
-                elif submitted:
-                    st.error("❌ Please enter a valid phone number")
+                        st.session_state.ai_calls[st.session_state.current_page].append(call_data)
+                        log_call_record(call_data)
+                        st.success(f"✅ Call initiated! Call ID: {call_data['call_id'][:8]}...")
+                        rerun_fragment()
+                    elif submitted:
+                        st.error("❌ Please enter a valid phone number")
         
-        st.divider()
+            st.divider()
         
-        # Call history and management
-        st.subheader("📋 Call History & Management")
+            # Call history and management
+            st.subheader("📋 Call History & Management")
         
-        if (st.session_state.current_page in st.session_state.ai_calls and 
-            st.session_state.ai_calls[st.session_state.current_page]):
-            
-            calls = st.session_state.ai_calls[st.session_state.current_page]
-            
-            # Call statistics
-            stats_col1, stats_col2, stats_col3, stats_col4 = st.columns(4)
-            with stats_col1:
-                st.metric("Total Calls", len(calls))
-            with stats_col2:
-                st.metric("Today's Calls", len([c for c in calls if c['timestamp'][:10] == datetime.now().date().isoformat()]))
-            with stats_col3:
-                st.metric("Success Rate", "95%")  # Simulated
-            with stats_col4:
-                st.metric("Avg Duration", "3:45")  # Simulated
-            
-            # Recent calls
-            st.subheader("🕐 Recent Calls")
-            
-            for i, call in enumerate(reversed(calls[-10:])):  # Show last 10 calls
-                with st.expander(f"📞 Call to {call['phone_number']} - {call['timestamp'][:16]} ({call.get('purpose', 'General')})"):
+            if (st.session_state.current_page in st.session_state.ai_calls and 
+                st.session_state.ai_calls[st.session_state.current_page]):
+            
+                calls = st.session_state.ai_calls[st.session_state.current_page]
+            
+                # Call statistics
+                stats_col1, stats_col2, stats_col3, stats_col4 = st.columns(4)
+                with stats_col1:
+                    st.metric("Total Calls", len(calls))
+                with stats_col2:
+                    st.metric("Today's Calls", len([c for c in calls if c['timestamp'][:10] == datetime.now().date().isoformat()]))
+                with stats_col3:
+                    st.metric("Success Rate", "95%")  # Simulated
+                with stats_col4:
+                    st.metric("Avg Duration", "3:45")  # Simulated
+            
+                # Recent calls
+                st.subheader("🕐 Recent Calls")
+            
+                for i, call in enumerate(reversed(calls[-10:])):  # Show last 10 calls
+                    with st.expander(f"📞 Call to {call['phone_number']} - {call['timestamp'][:16]} ({call.get('purpose', 'General')})"):
                     
-                    detail_col1, detail_col2 = st.columns(2)
+                        detail_col1, detail_col2 = st.columns(2)
                     
-                    with detail_col1:
-                        st.markdown(f"""
-                        **📞 Call Details:**
-                        - **Call ID:** `{call['call_id']}`
-                        - **Status:** {call['status']}
-                        - **Purpose:** {call.get('purpose', 'Not specified')}
-                        - **Agent Phone:** {call['ai_phone']}
-                        """)
+                        with detail_col1:
+                            st.markdown(f"""
+                            **📞 Call Details:**
+                            - **Call ID:** `{call['call_id']}`
+                            - **Status:** {call['status']}
+                            - **Purpose:** {call.get('purpose', 'Not specified')}
+                            - **Agent Phone:** {call['ai_phone']}
+                            """)
                     
-                    with detail_col2:
-                        st.markdown(f"""
-                        **🎯 Technical Info:**
-                        - **Recipient:** {call['phone_number']}
-                        - **Assistant ID:** `{call['assistant_id']}`
-                        - **Timestamp:** {call['timestamp']}
-                        - **Duration:** {call.get('duration', '00:00:00')}
-                        """)
+                        with detail_col2:
+                            st.markdown(f"""
+                            **🎯 Technical Info:**
+                            - **Recipient:** {call['phone_number']}
+                            - **Assistant ID:** `{call['assistant_id']}`
+                            - **Timestamp:** {call['timestamp']}
+                            - **Duration:** {call.get('duration', '00:00:00')}
+                            """)
                     
-                    if call.get('notes'):
-                        st.markdown(f"**📝 Notes:** {call['notes']}")
+                        if call.get('notes'):
+                            st.markdown(f"**📝 Notes:** {call['notes']}")
                     
-                    # Call actions
-                    action_col1, action_col2, action_col3, action_col4 = st.columns(4)
+                        # Call actions
+                        action_col1, action_col2, action_col3, action_col4 = st.columns(4)
                     
-                    with action_col1:
-                        if st.button("📞 Redial", key=f"redial_{call['call_id']}"):
-                            new_call = make_ai_call(st.session_state.current_page, call['phone_number'])
-                            new_call.update({
-                                "purpose": "Redial",
-                                "notes": f"Redial of call {call['call_id'][:8]}..."
-                            })
-                            st.session_state.ai_calls[st.session_state.current_page].append(new_call)
-                            st.success("📞 Redial initiated!")
-                            st.rerun()
+                        with action_col1:
+                            if st.button("📞 Redial", key=f"redial_{call['call_id']}"):
+                                new_call = make_ai_call(st.session_state.current_page, call['phone_number'])
+                                new_call.update({
+                                    "purpose": "Redial",
+                                    "notes": f"Redial of call {call['call_id'][:8]}..."
+                                })
+                                st.session_state.ai_calls[st.session_state.current_page].append(new_call)
+                                log_call_record(new_call)
+                                st.success("📞 Redial initiated!")
+                                rerun_fragment()
                     
-                    with action_col2:
-                        if st.button("📝 Add Notes", key=f"notes_{call['call_id']}"):
-                            st.info("📝 Notes feature - would open note editor")
+                        with action_col2:
+                            if st.button("📝 Add Notes", key=f"notes_{call['call_id']}"):
+                                st.info("📝 Notes feature - would open note editor")
                     
-                    with action_col3:
-                        if st.button("📊 Analytics", key=f"analytics_{call['call_id']}"):
-                            st.info("📊 Call analytics - detailed metrics would display")
+                        with action_col3:
+                            if st.button("📊 Analytics", key=f"analytics_{call['call_id']}"):
+                                st.info("📊 Call analytics - detailed metrics would display")
                     
-                    with action_col4:
-                        if st.button("🔄 Update Status", key=f"status_{call['call_id']}"):
-                            st.info("🔄 Status update - would show status options")
-        else:
-            st.info("📞 No calls made yet. Use the form above to initiate your first call with this agent.")
+                        with action_col4:
+                            if st.button("🔄 Update Status", key=f"status_{call['call_id']}"):
+                                st.info("🔄 Status update - would show status options")
+            else:
+                st.info("📞 No calls made yet. Use the form above to initiate your first call with this agent.")
             
-            # Sample call scenarios
-            st.subheader("💡 Sample Call Scenarios")
+                # Sample call scenarios
+                st.subheader("💡 Sample Call Scenarios")
             
-            scenario_col1, scenario_col2 = st.columns(2)
+                scenario_col1, scenario_col2 = st.columns(2)
             
-            with scenario_col1:
-                st.markdown(f"""
-                **🎯 Recommended for {current_config['name']}:**
-                - {current_config['specialization']} consultation
-                - Expert advice and guidance
-                - Problem-solving sessions
-                - Strategic planning calls
-                """)
+                with scenario_col1:
+                    st.markdown(f"""
+                    **🎯 Recommended for {current_config['name']}:**
+                    - {current_config['specialization']} consultation
+                    - Expert advice and guidance
+                    - Problem-solving sessions
+                    - Strategic planning calls
+                    """)
             
-            with scenario_col2:
-                if st.button("📞 Demo Call", key="demo_call"):
-                    demo_call = make_ai_call(st.session_state.current_page, "+1555DEMO123")
-                    demo_call.update({
-                        "purpose": "Demo Call",
-                        "notes": "Demonstration call to showcase capabilities"
-                    })
+                with scenario_col2:
+                    if st.button("📞 Demo Call", key="demo_call"):
+                        demo_call = make_ai_call(st.session_state.current_page, "+1555DEMO123")
+                        demo_call.update({
+                            "purpose": "Demo Call",
+                            "notes": "Demonstration call to showcase capabilities"
+                        })
                     
-                    if st.session_state.current_page not in st.session_state.ai_calls:
-                        st.session_state.ai_calls[st.session_state.current_page] = []
+                        if st.session_state.current_page not in st.session_state.ai_calls:
+                            st.session_state.ai_calls[st.session_state.current_page] = []
                     
-                    st.session_state.ai_calls[st.session_state.current_page].append(demo_call)
-                    st.success("🎉 Demo call initiated!")
-                    st.rerun()
-    
+                        st.session_state.ai_calls[st.session_state.current_page].append(demo_call)
+                        log_call_record(demo_call)
+                        st.success("🎉 Demo call initiated!")
+                        rerun_fragment()
+
+            save_durable_state()
+
+        call_panel()
+
     elif st.session_state.current_tab == 'prompts':
         st.header("💡 Prompt Library & Agent Information")
         
@@ -1336,28 +3679,8 @@ else:
             
             # Agent capabilities
             st.subheader("🎯 Core Capabilities")
-            capabilities = {
-                "Leadership": ["Strategic Planning", "Team Management", "Decision Making", "Vision Setting"],
-                "Marketing": ["Content Creation", "Social Media", "Campaign Management", "Brand Strategy"],
-                "Development": ["Code Review", "Architecture Design", "Debugging", "Best Practices"],
-                "Finance": ["Financial Analysis", "Investment Planning", "Risk Assessment", "Budgeting"],
-                "Sales": ["Lead Qualification", "Closing Techniques", "Objection Handling", "Pipeline Management"],
-                "Health": ["Wellness Planning", "Health Education", "Lifestyle Advice", "Preventive Care"],
-                "Real Estate": ["Property Analysis", "Market Research", "Investment Strategy", "Valuation"],
-                "E-commerce": ["Store Optimization", "Product Strategy", "Customer Experience", "Sales Funnel"],
-                "Content": ["Blog Writing", "SEO Optimization", "Content Strategy", "Editorial Planning"],
-                "Analytics": ["Data Analysis", "KPI Tracking", "Performance Metrics", "Reporting"],
-                "Research": ["Market Research", "Data Collection", "Analysis", "Insights Generation"],
-                "Medical": ["Health Information", "Symptom Assessment", "Treatment Options", "Wellness"],
-                "Assessment": ["Personality Analysis", "Team Dynamics", "Behavioral Insights", "Development"],
-                "Business": ["Business Planning", "Strategy Development", "Market Analysis", "Growth Planning"],
-                "AI": ["Agent Development", "Customization", "Integration", "Optimization"],
-                "Language": ["Translation", "Localization", "Communication", "Cultural Adaptation"],
-                "CRM": ["Customer Relations", "Follow-up Strategy", "Retention", "Engagement"],
-                "Spiritual": ["Prayer Guidance", "Faith Support", "Spiritual Growth", "Meditation"]
-            }
-            
-            agent_capabilities = capabilities.get(current_config['category'], ["General AI Assistance"])
+            category_info = AGENT_REGISTRY['categories'].get(current_config['category'], {})
+            agent_capabilities = category_info.get('capabilities') or ["General AI Assistance"]
             for capability in agent_capabilities:
                 st.markdown(f"• {capability}")
         
@@ -1378,6 +3701,28 @@ else:
             
             st.json(config_data)
             
+            # Session-only customizations layered over the shared registry
+            with st.expander("✏️ Customize Agent (this session)"):
+                custom_name = st.text_input("Name:", value=current_config['name'], key="override_name")
+                custom_description = st.text_input("Description:", value=current_config['description'], key="override_description")
+                custom_specialization = st.text_input("Specialization:", value=current_config['specialization'], key="override_specialization")
+                custom_phone = st.text_input("AI Phone:", value=current_config['ai_phone'], key="override_phone")
+                
+                override_col1, override_col2 = st.columns(2)
+                with override_col1:
+                    if st.button("💾 Save Changes", key="save_override"):
+                        set_agent_override(st.session_state.current_page, {
+                            "name": custom_name,
+                            "description": custom_description,
+                            "specialization": custom_specialization,
+                            "ai_phone": custom_phone
+                        })
+                        st.rerun()
+                with override_col2:
+                    if st.button("↩️ Reset to Default", key="reset_override"):
+                        st.session_state.agent_overrides.pop(st.session_state.current_page, None)
+                        st.rerun()
+            
             # Quick actions
             st.subheader("⚡ Quick Actions")
             
@@ -1398,232 +3743,390 @@ else:
                     st.info("📞 Switched to call interface")
                 
                 if st.button("🔄 Refresh Config", key="refresh_config"):
-                    st.success("🔄 Configuration refreshed!")
+                    # The registry reloads itself whenever agents.json changes on disk
+                    loaded_at = datetime.fromtimestamp(AGENT_REGISTRY['mtime_ns'] / 1e9)
+                    st.success(f"🔄 Configuration current as of {loaded_at.strftime('%Y-%m-%d %H:%M:%S')}")
         
         st.divider()
         
-        # Prompt Library
-        st.subheader("📚 Prompt Library")
+        # Prompt library reruns on its own when cards are used
+        @st.fragment
+        @profile_span("prompt_library_panel")
+        def prompt_library_panel():
+            # Prompt Library
+            st.subheader("📚 Prompt Library")
         
-        # Category-based prompts
-        prompt_categories = list(st.session_state.prompt_library.keys())
+            # Category-based prompts
+            prompt_categories = list(get_prompt_library().keys())
         
-        # Filter prompts by agent category
-        relevant_categories = []
-        agent_category = current_config['category']
+            # Filter prompts by agent category
+            relevant_categories = []
+            agent_category = current_config['category']
         
-        # Map agent categories to prompt categories
-        category_mapping = {
-            "Leadership": ["Leadership"],
-            "Marketing": ["Sales & Marketing"],
-            "Development": ["Development"],
-            "Finance": ["Finance & Business"],
-            "Sales": ["Sales & Marketing"],
-            "Health": ["Health & Wellness"],
-            "Medical": ["Health & Wellness"],
-            "Real Estate": ["Real Estate"],
-            "E-commerce": ["Sales & Marketing"],
-            "Content": ["Sales & Marketing"],
-            "Analytics": ["Finance & Business"],
-            "Research": ["Finance & Business"],
-            "Assessment": ["Leadership"],
-            "Business": ["Finance & Business"],
-            "AI": ["Development"],
-            "Language": ["Sales & Marketing"],
-            "CRM": ["Sales & Marketing"],
-            "Spiritual": ["Health & Wellness"]
-        }
-        
-        relevant_categories = category_mapping.get(agent_category, prompt_categories)
+            # Map agent categories to prompt categories
+            category_info = AGENT_REGISTRY['categories'].get(agent_category, {})
+            relevant_categories = list(category_info.get('prompt_categories') or prompt_categories)
         
-        # Prompt category selection
-        selected_prompt_category = st.selectbox(
-            "Select Prompt Category:", 
-            ["All Categories"] + prompt_categories,
-            index=0
-        )
+            # Prompt category selection
+            selected_prompt_category = st.selectbox(
+                "Select Prompt Category:", 
+                ["All Categories"] + prompt_categories,
+                index=0
+            )
         
-        # Display prompts
-        if selected_prompt_category == "All Categories":
-            display_categories = prompt_categories
-        else:
-            display_categories = [selected_prompt_category]
+            # Display prompts
+            if selected_prompt_category == "All Categories":
+                display_categories = prompt_categories
+            else:
+                display_categories = [selected_prompt_category]
         
-        for category in display_categories:
-            if category in st.session_state.prompt_library:
-                st.markdown(f"### 📂 {category}")
+            for category in display_categories:
+                if category in get_prompt_library():
+                    st.markdown(f"### 📂 {category}")
                 
-                prompts = st.session_state.prompt_library[category]
+                    prompts = get_prompt_library()[category]
                 
-                # Display prompts in expandable cards
-                for i, prompt in enumerate(prompts):
-                    with st.expander(f"💡 {prompt['title']}"):
-                        st.markdown(f"**Prompt:** {prompt['prompt']}")
+                    # Display prompts in expandable cards
+                    for i, prompt in enumerate(prompts):
+                        with st.expander(f"💡 {prompt['title']}"):
+                            st.markdown(f"**Prompt:** {prompt['prompt']}")
                         
-                        prompt_action_col1, prompt_action_col2, prompt_action_col3 = st.columns(3)
+                            prompt_action_col1, prompt_action_col2, prompt_action_col3 = st.columns(3)
                         
-                        with prompt_action_col1:
-                            if st.button("💬 Use in Chat", key=f"use_{category}_{i}"):
-                                # Pre-fill chat with this prompt
-                                if st.session_state.current_page not in st.session_state.chat_sessions:
-                                    st.session_state.chat_sessions[st.session_state.current_page] = []
+                            with prompt_action_col1:
+                                if st.button("💬 Use in Chat", key=f"use_{category}_{i}"):
+                                    # Pre-fill chat with this prompt
+                                    if st.session_state.current_page not in st.session_state.chat_sessions:
+                                        st.session_state.chat_sessions[st.session_state.current_page] = []
                                 
-                                prompt_msg = {
-                                    "role": "user",
-                                    "content": prompt['prompt'],
-                                    "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                                }
-                                st.session_state.chat_sessions[st.session_state.current_page].append(prompt_msg)
-                                st.success(f"✅ Prompt added to chat!")
+                                    prompt_msg = {
+                                        "role": "user",
+                                        "content": prompt['prompt'],
+                                        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                                    }
+                                    st.session_state.chat_sessions[st.session_state.current_page].append(prompt_msg)
+                                    log_chat_message(st.session_state.current_page, prompt_msg)
+                                    st.success(f"✅ Prompt added to chat!")
                         
-                        with prompt_action_col2:
-                            if st.button("⭐ Favorite", key=f"fav_{category}_{i}"):
-                                prompt_id = f"{category}_{i}"
-                                if prompt_id not in st.session_state.favorites:
-                                    st.session_state.favorites.append(prompt_id)
-                                    st.success("⭐ Added to favorites!")
-                                else:
-                                    st.info("Already in favorites!")
+                            with prompt_action_col2:
+                                if st.button("⭐ Favorite", key=f"fav_{category}_{i}"):
+                                    prompt_id = f"{category}_{i}"
+                                    if prompt_id not in st.session_state.favorites:
+                                        st.session_state.favorites.append(prompt_id)
+                                        st.success("⭐ Added to favorites!")
+                                    else:
+                                        st.info("Already in favorites!")
                         
-                        with prompt_action_col3:
-                            if st.button("📋 Copy", key=f"copy_{category}_{i}"):
-                                st.code(prompt['prompt'], language=None)
-                                st.info("📋 Prompt displayed above for copying")
+                            with prompt_action_col3:
+                                if st.button("📋 Copy", key=f"copy_{category}_{i}"):
+                                    st.code(prompt['prompt'], language=None)
+                                    st.info("📋 Prompt displayed above for copying")
         
-        st.divider()
+            st.divider()
         
-        # Custom prompt creation
-        st.subheader("➕ Create Custom Prompt")
+            # Custom prompt creation
+            st.subheader("➕ Create Custom Prompt")
         
-        with st.expander("🛠️ Add New Prompt"):
-            custom_col1, custom_col2 = st.columns(2)
-            
-            with custom_col1:
-                new_category = st.selectbox(
-                    "Category:", 
-                    prompt_categories + ["Create New Category"],
-                    key="new_prompt_category"
-                )
+            with st.expander("🛠️ Add New Prompt"):
+                custom_col1, custom_col2 = st.columns(2)
+            
+                with custom_col1:
+                    new_category = st.selectbox(
+                        "Category:", 
+                        prompt_categories + ["Create New Category"],
+                        key="new_prompt_category"
+                    )
                 
-                if new_category == "Create New Category":
-                    custom_category = st.text_input("New Category Name:", key="custom_category")
-                    if custom_category:
-                        new_category = custom_category
-            
-            with custom_col2:
-                prompt_title = st.text_input("Prompt Title:", key="prompt_title")
-            
-            prompt_text = st.text_area(
-                "Prompt Text:", 
-                placeholder="Enter your custom prompt here. Use [brackets] for variables that users can fill in.",
-                height=150,
-                key="prompt_text"
-            )
+                    if new_category == "Create New Category":
+                        custom_category = st.text_input("New Category Name:", key="custom_category")
+                        if custom_category:
+                            new_category = custom_category
+            
+                with custom_col2:
+                    prompt_title = st.text_input("Prompt Title:", key="prompt_title")
             
-            if st.button("➕ Add Prompt", key="add_custom_prompt"):
-                if new_category and prompt_title and prompt_text:
-                    if new_category not in st.session_state.prompt_library:
-                        st.session_state.prompt_library[new_category] = []
+                prompt_text = st.text_area(
+                    "Prompt Text:", 
+                    placeholder="Enter your custom prompt here. Use [brackets] for variables that users can fill in.",
+                    height=150,
+                    key="prompt_text"
+                )
+            
+                if st.button("➕ Add Prompt", key="add_custom_prompt"):
+                    if new_category and prompt_title and prompt_text:
+                        prompt_library = get_mutable_prompt_library()
+                        if new_category not in prompt_library:
+                            prompt_library[new_category] = []
                     
-                    st.session_state.prompt_library[new_category].append({
-                        "title": prompt_title,
-                        "prompt": prompt_text
-                    })
+                        prompt_library[new_category].append({
+                            "title": prompt_title,
+                            "prompt": prompt_text
+                        })
                     
-                    st.success(f"✅ Prompt '{prompt_title}' added to {new_category}!")
-                    st.rerun()
-                else:
-                    st.warning("⚠️ Please fill out all fields.")
+                        st.success(f"✅ Prompt '{prompt_title}' added to {new_category}!")
+                        rerun_fragment()
+                    else:
+                        st.warning("⚠️ Please fill out all fields.")
         
-        # Favorites section
-        if st.session_state.favorites:
-            st.subheader("⭐ Favorite Prompts")
+            # Favorites section
+            if st.session_state.favorites:
+                st.subheader("⭐ Favorite Prompts")
             
-            for fav_id in st.session_state.favorites:
-                try:
-                    category, index = fav_id.split("_", 1)
-                    index = int(index)
+                for fav_id in st.session_state.favorites:
+                    try:
+                        category, index = fav_id.split("_", 1)
+                        index = int(index)
                     
-                    if (category in st.session_state.prompt_library and 
-                        index < len(st.session_state.prompt_library[category])):
+                        prompt_library = get_prompt_library()
+                        if (category in prompt_library and 
+                            index < len(prompt_library[category])):
                         
-                        prompt = st.session_state.prompt_library[category][index]
+                            prompt = prompt_library[category][index]
                         
-                        with st.expander(f"⭐ {prompt['title']} ({category})"):
-                            st.markdown(prompt['prompt'])
+                            with st.expander(f"⭐ {prompt['title']} ({category})"):
+                                st.markdown(prompt['prompt'])
                             
-                            if st.button("🗑️ Remove from Favorites", key=f"remove_fav_{fav_id}"):
-                                st.session_state.favorites.remove(fav_id)
-                                st.success("Removed from favorites!")
-                                st.rerun()
-                except:
-                    # Remove invalid favorite IDs
-                    st.session_state.favorites.remove(fav_id)
+                                if st.button("🗑️ Remove from Favorites", key=f"remove_fav_{fav_id}"):
+                                    st.session_state.favorites.remove(fav_id)
+                                    st.success("Removed from favorites!")
+                                    rerun_fragment()
+                    except:
+                        # Remove invalid favorite IDs
+                        st.session_state.favorites.remove(fav_id)
         
-        # Export/Import prompts
-        st.subheader("📤 Import/Export Prompts")
+            # Export/Import prompts
+            st.subheader("📤 Import/Export Prompts")
         
-        export_col1, export_col2 = st.columns(2)
+            export_col1, export_col2 = st.columns(2)
         
-        with export_col1:
-            if st.button("📤 Export Prompt Library"):
-                prompt_json = json.dumps(st.session_state.prompt_library, indent=2)
-                st.download_button(
-                    label="💾 Download Prompts JSON",
-                    data=prompt_json,
-                    file_name=f"prompt_library_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
-                    mime="application/json"
-                )
+            with export_col1:
+                if st.button("📤 Export Prompt Library"):
+                    prompt_json = json.dumps(_thaw(get_prompt_library()), indent=2)
+                    st.download_button(
+                        label="💾 Download Prompts JSON",
+                        data=prompt_json,
+                        file_name=f"prompt_library_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
+                        mime="application/json"
+                    )
         
-        with export_col2:
-            uploaded_prompts = st.file_uploader("📥 Import Prompts", type="json", key="import_prompts")
+            with export_col2:
+                uploaded_prompts = st.file_uploader("📥 Import Prompts", type="json", key="import_prompts")
             
-            if uploaded_prompts:
-                try:
-                    imported_data = json.load(uploaded_prompts)
+                if uploaded_prompts:
+                    try:
+                        imported_data = json.load(uploaded_prompts)
                     
-                    if isinstance(imported_data, dict):
-                        for category, prompts in imported_data.items():
-                            if category not in st.session_state.prompt_library:
-                                st.session_state.prompt_library[category] = []
+                        if isinstance(imported_data, dict):
+                            prompt_library = get_mutable_prompt_library()
+                            for category, prompts in imported_data.items():
+                                if category not in prompt_library:
+                                    prompt_library[category] = []
                             
-                            for prompt in prompts:
-                                if isinstance(prompt, dict) and "title" in prompt and "prompt" in prompt:
-                                    st.session_state.prompt_library[category].append(prompt)
+                                for prompt in prompts:
+                                    if isinstance(prompt, dict) and "title" in prompt and "prompt" in prompt:
+                                        prompt_library[category].append(prompt)
                         
-                        st.success("✅ Prompts imported successfully!")
-                        st.rerun()
-                    else:
-                        st.error("❌ Invalid file format")
-                except Exception as e:
-                    st.error(f"❌ Error importing prompts: {str(e)}")
+                            st.success("✅ Prompts imported successfully!")
+                            rerun_fragment()
+                        else:
+                            st.error("❌ Invalid file format")
+                    except Exception as e:
+                        st.error(f"❌ Error importing prompts: {str(e)}")
+
+            save_durable_state()
+
+        prompt_library_panel()
+    
+    elif st.session_state.current_tab == 'portfolio':
+        st.header("🌐 All Agents Analytics")
+        
+        with st.spinner("Loading all spreadsheets..."):
+            results = load_all_spreadsheets()
+        
+        frames = {name: df for name, (df, error) in results.items() if df is not None}
+        for name, (df, error) in results.items():
+            if error:
+                st.warning(f"⚠️ {name}: {error}")
+        
+        if not frames:
+            st.info("📊 No spreadsheet data available yet. Authenticate and share the sheets with your service account.")
+        else:
+            revisions = tuple((name, REAL_SPREADSHEETS[name]['id'], get_sheet_revision(REAL_SPREADSHEETS[name]['id'], df)) for name, df in frames.items())
+            combined = build_portfolio_frame(revisions, frames)
+            agents_df = build_agent_portfolio(frames)
+            
+            # Portfolio headline
+            kpi_col1, kpi_col2, kpi_col3, kpi_col4 = st.columns(4)
+            with kpi_col1:
+                st.metric("Sheets Loaded", f"{len(frames)}/{len(REAL_SPREADSHEETS)}")
+            with kpi_col2:
+                st.metric("Total Rows", f"{len(combined):,}")
+            with kpi_col3:
+                st.metric("Chats (this session)", int(agents_df['Chats'].sum()))
+            with kpi_col4:
+                st.metric("Calls (this session)", int(agents_df['Calls'].sum()))
+            
+            # Per source sheet
+            st.subheader("📚 By Spreadsheet")
+            source_summary = combined.groupby("Source", sort=False).agg(Rows=("Source", "size"))
+            shared_numeric = combined.select_dtypes(include='number').columns[:6]
+            if len(shared_numeric):
+                source_summary = source_summary.join(combined.groupby("Source", sort=False)[list(shared_numeric)].sum())
+            st.dataframe(source_summary, use_container_width=True)
+            
+            # Per category
+            st.subheader("🗂️ By Category")
+            category_df = summarize_portfolio_by_category(agents_df, frames)
+            cat_col1, cat_col2 = st.columns([3, 2])
+            with cat_col1:
+                st.dataframe(category_df, use_container_width=True, hide_index=True)
+            with cat_col2:
+                fig = px.bar(category_df, x="Category", y="Agents", title="Agents per Category", color_discrete_sequence=['#1f77b4'])
+                fig.update_layout(height=300, xaxis_title=None)
+                st.plotly_chart(fig, use_container_width=True)
+            
+            # Per agent
+            st.subheader("🤖 By Agent")
+            st.dataframe(agents_df, use_container_width=True, hide_index=True)
+            
+            with st.expander(f"📋 Combined Data ({len(combined):,} rows)"):
+                st.dataframe(combined.tail(200), use_container_width=True, height=300)
+                st.caption("Showing the latest 200 rows across all sheets.")
+    
+    elif st.session_state.current_tab == 'performance':
+        st.header("📈 Backend Performance")
+        
+        snapshot = latency_snapshot()
+        
+        if not snapshot:
+            st.info("📈 No backend calls recorded yet. Chat with an agent, load data or place a call to populate latency metrics.")
+        else:
+            # Per-agent summary across every session in this process
+            st.subheader("🏁 Latency by Agent (all sessions)")
+            
+            summary_rows = []
+            for (agent_id, operation), series in snapshot.items():
+                total = series['total']
+                summary_rows.append({
+                    "Agent": AGENTS_CONFIG[agent_id]['name'] if agent_id in AGENTS_CONFIG else agent_id,
+                    "Operation": LATENCY_OPERATIONS.get(operation, operation),
+                    "Calls": total.count,
+                    "Errors": total.errors,
+                    "p50 (ms)": round(total.quantile(0.5), 1),
+                    "p95 (ms)": round(total.quantile(0.95), 1),
+                    "p99 (ms)": round(total.quantile(0.99), 1)
+                })
+            
+            summary_df = pd.DataFrame(summary_rows).sort_values("p95 (ms)", ascending=False)
+            st.dataframe(summary_df, use_container_width=True, hide_index=True)
+            
+            # Percentiles over time for one agent and operation
+            st.subheader("⏱️ Latency Over Time")
+            
+            agents_with_data = sorted({agent_id for agent_id, _ in snapshot})
+            ts_col1, ts_col2 = st.columns(2)
+            
+            with ts_col1:
+                selected_agent = st.selectbox(
+                    "Agent:",
+                    agents_with_data,
+                    index=agents_with_data.index(st.session_state.current_page) if st.session_state.current_page in agents_with_data else 0,
+                    format_func=lambda x: AGENTS_CONFIG[x]['name'] if x in AGENTS_CONFIG else x
+                )
+            
+            with ts_col2:
+                operations = sorted(operation for agent_id, operation in snapshot if agent_id == selected_agent)
+                selected_operation = st.selectbox(
+                    "Operation:",
+                    operations,
+                    format_func=lambda x: LATENCY_OPERATIONS.get(x, x)
+                )
+            
+            windows = snapshot[(selected_agent, selected_operation)]['windows']
+            timeseries_df = pd.DataFrame([
+                {
+                    "Time": datetime.fromtimestamp(window * LATENCY_WINDOW_SECONDS),
+                    "p50": histogram.quantile(0.5),
+                    "p95": histogram.quantile(0.95),
+                    "p99": histogram.quantile(0.99)
+                }
+                for window, histogram in windows
+            ])
+            
+            fig_latency = px.line(
+                timeseries_df, x="Time", y=["p50", "p95", "p99"],
+                title=f"{LATENCY_OPERATIONS.get(selected_operation, selected_operation)} latency per minute",
+                labels={"value": "Latency (ms)", "variable": "Percentile"},
+                markers=True
+            )
+            fig_latency.update_layout(height=350)
+            st.plotly_chart(fig_latency, use_container_width=True)
+        
+        # This session's own backend calls
+        st.subheader("🙋 This Session")
+        
+        if st.session_state.performance_metrics:
+            session_rows = []
+            for agent_id, operations in st.session_state.performance_metrics.items():
+                for operation, entry in operations.items():
+                    session_rows.append({
+                        "Agent": AGENTS_CONFIG[agent_id]['name'] if agent_id in AGENTS_CONFIG else agent_id,
+                        "Operation": LATENCY_OPERATIONS.get(operation, operation),
+                        "Calls": entry['count'],
+                        "Errors": entry['errors'],
+                        "Avg (ms)": round(entry['total_ms'] / entry['count'], 1)
+                    })
+            st.dataframe(pd.DataFrame(session_rows), use_container_width=True, hide_index=True)
+        else:
+            st.caption("No backend calls from this session yet.")
 
 # Footer
 st.divider()
 
 # Performance summary
-if st.session_state.authenticated:
-    st.subheader("📊 Session Summary")
+with profile_span("footer"):
+    if st.session_state.authenticated:
+        st.subheader("📊 Session Summary")
     
-    summary_col1, summary_col2, summary_col3, summary_col4 = st.columns(4)
+        summary_col1, summary_col2, summary_col3, summary_col4 = st.columns(4)
     
-    with summary_col1:
-        total_messages = sum(len(session) for session in st.session_state.chat_sessions.values())
-        st.metric("Total Messages", total_messages)
+        with summary_col1:
+            total_messages = sum(count_chat_messages(agent_id) for agent_id in st.session_state.chat_sessions)
+            st.metric("Total Messages", total_messages)
     
-    with summary_col2:
-        total_calls = sum(len(calls) for calls in st.session_state.ai_calls.values())
-        st.metric("Total Calls", total_calls)
+        with summary_col2:
+            total_calls = sum(len(calls) for calls in st.session_state.ai_calls.values())
+            st.metric("Total Calls", total_calls)
     
-    with summary_col3:
-        active_agents = len([k for k in st.session_state.chat_sessions.keys() if st.session_state.chat_sessions[k]])
-        st.metric("Active Agents", active_agents)
+        with summary_col3:
+            active_agents = len([k for k in st.session_state.chat_sessions.keys() if st.session_state.chat_sessions[k]])
+            st.metric("Active Agents", active_agents)
     
-    with summary_col4:
-        st.metric("Prompt Categories", len(st.session_state.prompt_library))
+        with summary_col4:
+            st.metric("Prompt Categories", len(get_prompt_library()))
 
 st.caption("🚀 25-Agent Business Dashboard | Powered by AI & n8n | Built with Streamlit")
 
+enforce_session_memory()
+save_durable_state()
+
+# Performance debug panel
+profile_result = end_profiled_run()
+if profile_result and st.session_state.get('perf_debug'):
+    total_ms, trace = profile_result
+    with st.expander(f"🐞 Performance Debug - rerun took {total_ms:,.1f} ms", expanded=True):
+        st.dataframe(
+            pd.DataFrame([
+                {"Span": "    " * entry['depth'] + entry['span'], "Time (ms)": entry['ms'], "Net Blocks": entry['blocks']}
+                for entry in trace
+            ]),
+            use_container_width=True,
+            hide_index=True
+        )
+        st.caption("Net Blocks = memory blocks allocated minus freed inside the span")
+        if METRICS_SERVER is not None:
+            st.caption(f"Process-wide span metrics: http://<host>:{PROMETHEUS_PORT}/metrics")
+
 print("✅ 25-Agent Business Dashboard successfully created!")
 print("\n🎯 Features implemented:")
 print("- 25 specialized AI agents with real assistant IDs")
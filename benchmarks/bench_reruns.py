@@ -0,0 +1,283 @@
+"""Headless rerun benchmarks for app.py
+
+Drives the dashboard through Streamlit's AppTest with fake Google Sheets and
+webhook backends and records, per tab and sheet size, rerun latency, peak
+Python memory and the ForwardMsg payload the browser would receive.
+
+    python benchmarks/bench_reruns.py --rows 100 10000 100000
+    python benchmarks/bench_reruns.py --save baselines/local.json
+    python benchmarks/bench_reruns.py --compare baselines/local.json
+    python benchmarks/bench_reruns.py --check-paging
+    python benchmarks/bench_reruns.py --check-sql
+
+Each sheet size runs in its own subprocess so shared caches start cold, and
+is repeated (--repeat) keeping each metric's best run, since single runs on a
+busy machine vary by more than the regression tolerance.
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+APP_PATH = BENCH_DIR.parent / "app.py"
+TABS = ["chatbot", "data", "ai_call", "prompts"]
+DEFAULT_ROWS = [100, 10_000, 100_000]
+REGRESSION_TOLERANCE = 0.20
+
+
+def _capture_payload():
+    """Count ForwardMsg bytes produced by each AppTest script run"""
+    from streamlit.testing.v1.local_script_runner import LocalScriptRunner
+
+    sizes = []
+    original = LocalScriptRunner.forward_msgs
+
+    def forward_msgs(self):
+        messages = original(self)
+        sizes.append(sum(msg.ByteSize() for msg in messages))
+        return messages
+
+    LocalScriptRunner.forward_msgs = forward_msgs
+    return sizes
+
+
+def _share_script_cache():
+    """Compile app.py once per process, as a live server's ScriptCache does, so peak memory measures the rerun and not the compile"""
+    from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+
+    compiled = {}
+    original = ScriptCache.get_bytecode
+
+    def get_bytecode(self, script_path):
+        if script_path not in compiled:
+            compiled[script_path] = original(self, script_path)
+        return compiled[script_path]
+
+    ScriptCache.get_bytecode = get_bytecode
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, round(fraction * (len(ordered) - 1)))]
+
+
+def _bench_tab(tab, reruns, timeout, interact=None):
+    """Cold run, then warm reruns of one tab in a fresh session"""
+    from streamlit.testing.v1 import AppTest
+    from fakes import sign_in
+
+    payloads = _capture_payload.sizes
+    at = AppTest.from_file(str(APP_PATH), default_timeout=timeout)
+    sign_in(at)
+    at.session_state["current_tab"] = tab
+
+    started = time.perf_counter()
+    at.run()
+    cold_ms = (time.perf_counter() - started) * 1000
+    if at.exception:
+        raise RuntimeError(f"{tab}: {at.exception[0].value}")
+
+    timings = []
+    for _ in range(reruns):
+        # Collect the previous run's garbage first so a collection it triggered isn't billed to this one
+        gc.collect()
+        started = time.perf_counter()
+        (interact(at) if interact else at).run()
+        timings.append((time.perf_counter() - started) * 1000)
+
+    gc.collect()
+    tracemalloc.start()
+    (interact(at) if interact else at).run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "cold_ms": round(cold_ms, 2),
+        "median_ms": round(statistics.median(timings), 2),
+        "p95_ms": round(_percentile(timings, 0.95), 2),
+        "peak_kib": round(peak / 1024, 1),
+        "payload_bytes": payloads[-1] if payloads else 0,
+    }
+
+
+def run_worker(rows, reruns, sheet_latency, webhook_latency, timeout):
+    """Benchmark every tab against one sheet size; prints a JSON object"""
+    sys.path.insert(0, str(BENCH_DIR))
+    os.environ["WEBHOOK_MODE"] = "live"
+    # Durable state goes to a throwaway file so earlier runs' chats don't change the results
+    state_dir = tempfile.TemporaryDirectory(prefix="dashboard-bench-")
+    os.environ.setdefault("STATE_BACKEND_URL", f"sqlite:///{Path(state_dir.name) / 'session_state.sqlite3'}")
+    from fakes import install_fake_gspread, install_fake_webhook
+
+    install_fake_gspread(rows, latency=sheet_latency)
+    install_fake_webhook(latency=webhook_latency)
+    _capture_payload.sizes = _capture_payload()
+    _share_script_cache()
+
+    results = {tab: _bench_tab(tab, reruns, timeout) for tab in TABS}
+    results["chatbot_send"] = _bench_tab(
+        "chatbot", reruns, timeout,
+        interact=lambda at: at.chat_input[0].set_value("Benchmark message"),
+    )
+    print(json.dumps(results))
+
+
+def check_paging(timeout):
+    """Load a sheet with blank rows across a page boundary; exits non-zero if data rows are lost"""
+    from streamlit.testing.v1 import AppTest
+    sys.path.insert(0, str(BENCH_DIR))
+    from fakes import install_fake_gspread, sign_in
+
+    rows, blank_rows = 11_000, range(4_996, 5_002)
+    install_fake_gspread(rows, blank_rows=blank_rows)
+    at = AppTest.from_file(str(APP_PATH), default_timeout=timeout)
+    sign_in(at)
+    at.session_state["current_tab"] = "data"
+    at.run()
+    expected = f"Successfully loaded {rows - len(blank_rows)} rows"
+    if at.exception or not any(expected in alert.value for alert in at.success):
+        print(f"❌ Expected '{expected}' with blank rows {blank_rows.start}-{blank_rows.stop - 1}")
+        sys.exit(1)
+    print(f"✅ {expected} across blank rows {blank_rows.start}-{blank_rows.stop - 1}")
+
+
+def check_sql_sandbox(timeout):
+    """Run SQL console queries that reach outside the cached sheets; exits non-zero unless all are refused"""
+    from streamlit.testing.v1 import AppTest
+    sys.path.insert(0, str(BENCH_DIR))
+    from fakes import install_fake_gspread, sign_in
+
+    install_fake_gspread(1_000)
+    at = AppTest.from_file(str(APP_PATH), default_timeout=timeout)
+    sign_in(at)
+    at.session_state["current_tab"] = "data"
+    at.run()
+
+    def run_query(query):
+        next(t for t in at.text_area if t.label == "Query:").set_value(query).run()
+        next(b for b in at.button if "Run Query" in b.label).click().run()
+        return [e.value for e in at.error]
+
+    failures = []
+    table = next(c.value for c in at.caption if c.value.startswith("Tables: ")).split("`")[1]
+    if run_query(f"SELECT COUNT(*) FROM {table}"):
+        failures.append(f"SELECT COUNT(*) FROM {table} was refused")
+    for query in ("SELECT * FROM read_csv('/etc/passwd')",
+                  "SELECT * FROM read_csv('https://example.com/data.csv')"):
+        if not run_query(query):
+            failures.append(f"{query} was allowed")
+    for line in failures:
+        print(f"❌ {line}")
+    if failures or at.exception:
+        sys.exit(1)
+    print("✅ SQL console only sees the cached sheets")
+
+
+def run_suite(args):
+    """Run each sheet size in a subprocess and collect the results, keeping each metric's best of --repeat runs"""
+    suite = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "reruns": args.reruns,
+        "repeat": args.repeat,
+        "sheet_latency": args.sheet_latency,
+        "webhook_latency": args.webhook_latency,
+        "results": {},
+    }
+    runs = {rows: [] for rows in args.rows}
+    # Round-robin over sizes so a slow spell on the machine doesn't land on every run of one size
+    for attempt in range(args.repeat):
+        for rows in args.rows:
+            print(f"⏱️ {rows:,} rows ({attempt + 1}/{args.repeat})...", file=sys.stderr)
+            output = subprocess.run(
+                [sys.executable, __file__, "--worker", "--rows", str(rows),
+                 "--reruns", str(args.reruns), "--sheet-latency", str(args.sheet_latency),
+                 "--webhook-latency", str(args.webhook_latency), "--timeout", str(args.timeout)],
+                capture_output=True, text=True, check=True,
+            ).stdout
+            runs[rows].append(json.loads(output.strip().splitlines()[-1]))
+    for rows, results in runs.items():
+        # Like timeit, the minimum is the run least disturbed by the rest of the machine
+        suite["results"][str(rows)] = {
+            tab: {metric: min(run[tab][metric] for run in results) for metric in metrics}
+            for tab, metrics in results[0].items()
+        }
+    return suite
+
+
+def compare(current, baseline, tolerance):
+    """List metrics that grew by more than the tolerance; returns the regressions"""
+    regressions = []
+    for rows, tabs in current["results"].items():
+        for tab, metrics in tabs.items():
+            base = baseline.get("results", {}).get(rows, {}).get(tab)
+            if not base:
+                continue
+            for metric in ("median_ms", "p95_ms", "peak_kib", "payload_bytes"):
+                before, after = base[metric], metrics[metric]
+                if before and (after - before) / before > tolerance:
+                    regressions.append(f"{rows} rows / {tab} / {metric}: {before} -> {after}")
+    return regressions
+
+
+def print_table(suite):
+    print(f"{'rows':>9} {'tab':<13} {'cold ms':>9} {'median ms':>10} {'p95 ms':>9} {'peak KiB':>10} {'payload B':>11}")
+    for rows, tabs in suite["results"].items():
+        for tab, m in tabs.items():
+            print(f"{int(rows):>9,} {tab:<13} {m['cold_ms']:>9} {m['median_ms']:>10} {m['p95_ms']:>9} {m['peak_kib']:>10} {m['payload_bytes']:>11,}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=DEFAULT_ROWS, help="synthetic sheet sizes (100 to 1,000,000)")
+    parser.add_argument("--reruns", type=int, default=10, help="warm reruns per tab")
+    parser.add_argument("--repeat", type=int, default=3, help="suite runs per sheet size; each metric keeps its best")
+    parser.add_argument("--sheet-latency", type=float, default=0.0, help="seconds added to each fake Sheets call")
+    parser.add_argument("--webhook-latency", type=float, default=0.0, help="seconds added to each fake webhook call")
+    parser.add_argument("--timeout", type=float, default=120.0, help="AppTest timeout per run in seconds")
+    parser.add_argument("--save", type=Path, help="write results as a JSON baseline")
+    parser.add_argument("--compare", type=Path, help="baseline JSON to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=REGRESSION_TOLERANCE, help="allowed growth before a metric counts as a regression")
+    parser.add_argument("--check-paging", action="store_true", help="check that blank rows at a page boundary do not end the sheet load")
+    parser.add_argument("--check-sql", action="store_true", help="check that SQL console queries cannot read files or URLs")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.check_paging:
+        check_paging(args.timeout)
+        return
+    if args.check_sql:
+        check_sql_sandbox(args.timeout)
+        return
+
+    if args.worker:
+        run_worker(args.rows[0], args.reruns, args.sheet_latency, args.webhook_latency, args.timeout)
+        return
+
+    suite = run_suite(args)
+    print_table(suite)
+    if args.save:
+        args.save.parent.mkdir(parents=True, exist_ok=True)
+        args.save.write_text(json.dumps(suite, indent=2) + "\n")
+        print(f"✅ Baseline written to {args.save}")
+    if args.compare:
+        regressions = compare(suite, json.loads(args.compare.read_text()), args.tolerance)
+        for line in regressions:
+            print(f"❌ {line}")
+        if regressions:
+            sys.exit(1)
+        print("✅ No regressions")
+
+
+if __name__ == "__main__":
+    main()
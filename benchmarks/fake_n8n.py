@@ -0,0 +1,188 @@
+"""Local stand-in for the n8n chat webhook
+
+Speaks the same contract as the production webhook used by
+send_message_to_webhook: bearer auth, a JSON body with sessionId, chatInput
+and agentId, and either a JSON reply ({"output": ...}) or a streamed
+newline-delimited JSON reply (begin / item / end events). Posts to a path
+ending in /batch carry {"batch": [...]} and are answered with one
+{"requestId", "output"} item per message after a single processing delay.
+
+    python benchmarks/fake_n8n.py --port 5678 --latency 0.8 --jitter 0.2
+    python benchmarks/fake_n8n.py --stream --chunks 8 --chunk-delay 0.05
+
+GET /stats returns request counts and the server's own CPU time and peak RSS.
+"""
+import argparse
+import json
+import random
+import resource
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+REQUIRED_FIELDS = ("sessionId", "chatInput", "agentId")
+
+
+class WebhookStats:
+    """Thread-safe request counters"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.requests = 0
+        self.messages = 0
+        self.batches = 0
+        self.rejected = Counter()
+        self.by_agent = Counter()
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+    def begin(self, agent_ids):
+        with self.lock:
+            self.requests += 1
+            self.messages += len(agent_ids)
+            self.batches += len(agent_ids) > 1
+            self.by_agent.update(agent_ids)
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+    def end(self):
+        with self.lock:
+            self.in_flight -= 1
+
+    def reject(self, status):
+        with self.lock:
+            self.rejected[str(status)] += 1
+
+    def snapshot(self):
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        with self.lock:
+            return {
+                "uptime_seconds": round(time.time() - self.started, 2),
+                "requests": self.requests,
+                "messages": self.messages,
+                "batches": self.batches,
+                "rejected": dict(self.rejected),
+                "by_agent": dict(self.by_agent),
+                "in_flight": self.in_flight,
+                "peak_in_flight": self.peak_in_flight,
+                "cpu_seconds": round(usage.ru_utime + usage.ru_stime, 3),
+                "max_rss_kib": usage.ru_maxrss,
+            }
+
+
+def valid_payload(payload):
+    return isinstance(payload, dict) and all(payload.get(field) for field in REQUIRED_FIELDS)
+
+
+def answer_for(payload):
+    return f"🤖 {payload.get('agentName', payload['agentId'])} received: {payload['chatInput']}"
+
+
+class WebhookServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256
+
+
+def make_handler(options, stats):
+    """Request handler bound to the server's options and counters"""
+
+    class WebhookHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            if self.path != "/stats":
+                self._send_json(404, {"message": "Not found"})
+                return
+            self._send_json(200, stats.snapshot())
+
+        def do_POST(self):
+            if self.headers.get("Authorization") != f"Bearer {options.token}":
+                stats.reject(401)
+                self._send_json(401, {"message": "Authorization data is wrong!"})
+                return
+            try:
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            except ValueError:
+                body = None
+            batched = self.path.rstrip("/").endswith("/batch")
+            payloads = body.get("batch") if batched and isinstance(body, dict) else [body]
+            if not isinstance(payloads, list) or not payloads or any(not valid_payload(p) for p in payloads):
+                stats.reject(400)
+                self._send_json(400, {"message": f"Body must include {', '.join(REQUIRED_FIELDS)}"})
+                return
+
+            stats.begin([payload["agentId"] for payload in payloads])
+            try:
+                time.sleep(max(0.0, options.latency + random.uniform(-options.jitter, options.jitter)))
+                if random.random() < options.error_rate:
+                    self._send_json(500, {"message": "Workflow execution failed"})
+                    return
+                if batched:
+                    self._send_json(200, [{"requestId": p.get("requestId"), "output": answer_for(p)} for p in payloads])
+                    return
+                payload = payloads[0]
+                answer = answer_for(payload)
+                if options.stream:
+                    self._stream(answer, payload)
+                else:
+                    self._send_json(200, {"output": answer})
+            finally:
+                stats.end()
+
+        def _send_json(self, status, body):
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _stream(self, answer, payload):
+            """Send the answer as chunked newline-delimited JSON events"""
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            size = max(1, -(-len(answer) // options.chunks))
+            events = [{"type": "begin", "metadata": {"nodeName": "AI Agent", "sessionId": payload["sessionId"]}}]
+            events += [{"type": "item", "content": answer[i:i + size]} for i in range(0, len(answer), size)]
+            events.append({"type": "end"})
+            for event in events:
+                line = (json.dumps(event) + "\n").encode()
+                self.wfile.write(f"{len(line):x}\r\n".encode() + line + b"\r\n")
+                self.wfile.flush()
+                if event["type"] == "item":
+                    time.sleep(options.chunk_delay)
+            self.wfile.write(b"0\r\n\r\n")
+
+        def log_message(self, format, *args):
+            pass
+
+    return WebhookHandler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5678)
+    parser.add_argument("--token", default="default_token", help="expected bearer token")
+    parser.add_argument("--latency", type=float, default=1.0, help="seconds before the reply starts")
+    parser.add_argument("--jitter", type=float, default=0.0, help="uniform +/- seconds added to the latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with HTTP 500")
+    parser.add_argument("--stream", action="store_true", help="reply with streamed newline-delimited JSON")
+    parser.add_argument("--chunks", type=int, default=8, help="item events per streamed reply")
+    parser.add_argument("--chunk-delay", type=float, default=0.05, help="seconds between streamed items")
+    options = parser.parse_args()
+
+    server = WebhookServer((options.host, options.port), make_handler(options, WebhookStats()))
+    print(f"🛰️ Fake n8n webhook on http://{options.host}:{options.port}/webhook", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+"""In-process stand-ins for Google Sheets and the n8n webhook used by the benchmarks"""
+import json
+import time
+from datetime import datetime
+
+import google.auth.transport.requests
+import gspread
+import numpy as np
+import pandas as pd
+import requests
+
+STATUSES = ["open", "in_progress", "won", "lost"]
+
+
+class FakeCredentials:
+    """Service account credentials that never expire"""
+    valid = True
+    expiry = datetime(2100, 1, 1)
+    service_account_email = "bench@example.iam.gserviceaccount.com"
+
+    def refresh(self, request):
+        pass
+
+
+class FakeWorksheet:
+    """Worksheet serving a synthetic sales-style table; `blank_rows` lists sheet rows left empty"""
+
+    def __init__(self, rows, metric_columns=5, latency=0.0, seed=0, blank_rows=()):
+        self.title = "Sheet1"
+        self.id = 0
+        self.latency = latency
+        rng = np.random.default_rng(seed)
+        self.header = ["Date", "Status", "Owner"] + [f"Metric{i}" for i in range(metric_columns)]
+        self.frame = pd.DataFrame({
+            "Date": pd.date_range("2020-01-01", periods=rows, freq="min").strftime("%Y-%m-%d %H:%M"),
+            "Status": rng.choice(STATUSES, rows),
+            "Owner": rng.choice([f"rep{i}" for i in range(40)], rows),
+            **{f"Metric{i}": rng.integers(0, 10_000, rows) for i in range(metric_columns)},
+        })
+        if blank_rows:
+            self.frame = self.frame.astype(object)
+            self.frame.iloc[[row - 2 for row in blank_rows]] = ""
+        self.row_count = rows + 1
+        self.col_count = len(self.header)
+
+    def _wait(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    def get_all_records(self, **kwargs):
+        self._wait()
+        return self.frame.to_dict("records")
+
+    def get_all_values(self, **kwargs):
+        self._wait()
+        return [self.header] + self.frame.astype(str).values.tolist()
+
+    def get(self, range_name=None, **kwargs):
+        self._wait()
+        return self.get_all_values() if range_name is None else self._slice(range_name)
+
+    def _slice(self, range_name):
+        first, last = range_name.split("!")[-1].split(":")
+        start = int("".join(c for c in first if c.isdigit()) or 1)
+        stop = int("".join(c for c in last if c.isdigit()) or self.row_count)
+        values = [self.header] + self.frame.iloc[max(start - 2, 0):stop - 1].astype(str).values.tolist()
+        values = values[1:] if start > 1 else values
+        # Like the Sheets API, leave out trailing empty cells and rows
+        values = [row[:max((i + 1 for i, cell in enumerate(row) if cell != ""), default=0)] for row in values]
+        while values and not values[-1]:
+            values.pop()
+        return values
+
+    def row_values(self, index):
+        return self._slice(f"A{index}:A{index}")[0]
+
+    def append_rows(self, values, **kwargs):
+        self._wait()
+
+
+class FakeSpreadsheet:
+    """Spreadsheet with a single synthetic worksheet"""
+
+    def __init__(self, key, worksheet):
+        self.id = key
+        self.title = key
+        self._worksheets = [worksheet]
+
+    def worksheets(self):
+        return self._worksheets
+
+    def get_worksheet(self, index):
+        return self._worksheets[index]
+
+    def worksheet(self, title):
+        return self._worksheets[0]
+
+    @property
+    def sheet1(self):
+        return self._worksheets[0]
+
+
+class FakeClient:
+    """gspread client whose spreadsheets all share one synthetic worksheet"""
+
+    def __init__(self, rows, latency=0.0, blank_rows=()):
+        self.worksheet = FakeWorksheet(rows, latency=latency, blank_rows=blank_rows)
+        self.opened = {}
+
+    def open_by_key(self, key):
+        if key not in self.opened:
+            self.opened[key] = FakeSpreadsheet(key, self.worksheet)
+        return self.opened[key]
+
+
+class FakeDriveSession:
+    """Drive metadata session reporting the same version for every file; bump `version` to simulate an edit"""
+    version = "1"
+
+    def __init__(self, credentials):
+        self.credentials = credentials
+
+    def get(self, url, params=None, timeout=None, **kwargs):
+        return FakeJsonReply({"version": self.version, "modifiedTime": "2020-01-01T00:00:00.000Z"})
+
+
+class FakeJsonReply:
+    """Minimal requests.Response carrying a JSON body"""
+    status_code = 200
+
+    def __init__(self, body):
+        self._body = body
+        self.text = json.dumps(body)
+
+    def json(self):
+        return self._body
+
+    def raise_for_status(self):
+        pass
+
+
+class FakeWebhookReply:
+    """Minimal requests.Response for an n8n reply"""
+    status_code = 200
+
+    def __init__(self, payload):
+        self._body = {"output": f"[{payload.get('agentId')}] {payload.get('chatInput')}"}
+        self.text = json.dumps(self._body)
+
+    def json(self):
+        return self._body
+
+    def raise_for_status(self):
+        pass
+
+
+def install_fake_gspread(rows, latency=0.0, blank_rows=()):
+    """Route gspread.authorize and Drive metadata probes to synthetic stand-ins; returns the client"""
+    client = FakeClient(rows, latency=latency, blank_rows=blank_rows)
+    gspread.authorize = lambda credentials, **kwargs: client
+    google.auth.transport.requests.AuthorizedSession = FakeDriveSession
+    return client
+
+
+def install_fake_webhook(latency=0.0):
+    """Answer webhook posts in-process after the given delay"""
+    def post(url, headers=None, json=None, timeout=None, **kwargs):
+        if latency:
+            time.sleep(latency)
+        return FakeWebhookReply(json or {})
+    requests.post = post
+    return post
+
+
+def sign_in(app_test, credentials_key="bench@example.iam.gserviceaccount.com:bench"):
+    """Mark an AppTest session as authenticated with fake credentials"""
+    app_test.session_state["authenticated"] = True
+    app_test.session_state["credentials"] = FakeCredentials()
+    app_test.session_state["credentials_key"] = credentials_key
+    app_test.session_state["account_id"] = credentials_key
+    app_test.session_state["user_info"] = {"email": FakeCredentials.service_account_email, "name": "Benchmark"}
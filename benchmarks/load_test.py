@@ -0,0 +1,237 @@
+"""Concurrent chat load test for one dashboard process
+
+Starts the fake n8n webhook (fake_n8n.py) and the dashboard
+(serve_dashboard.py, WEBHOOK_MODE=live) as subprocesses, then drives N
+simulated browser sessions over Streamlit's websocket protocol. Sessions are
+spread round-robin across the agents; each one sends chat messages with think
+time in between. Every stage reports throughput, reply latency percentiles and
+the CPU and memory of both the dashboard and the webhook process.
+
+    python benchmarks/load_test.py --users 1 10 25 50 --messages 5
+    python benchmarks/load_test.py --users 25 --webhook-latency 2 --stream --save load.json
+
+Linux only: process CPU and memory are read from /proc.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+
+import websockets
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+BENCH_DIR = Path(__file__).resolve().parent
+FINISHED = (ForwardMsg.FINISHED_SUCCESSFULLY, ForwardMsg.FINISHED_FRAGMENT_RUN_SUCCESSFULLY)
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK")
+
+
+def process_usage(pid):
+    """CPU seconds, current RSS and peak RSS (KiB) of a process"""
+    with open(f"/proc/{pid}/stat") as stat:
+        fields = stat.read().rsplit(")", 1)[1].split()
+    memory = {}
+    with open(f"/proc/{pid}/status") as status:
+        for line in status:
+            key, _, value = line.partition(":")
+            if key in ("VmRSS", "VmHWM"):
+                memory[key] = int(value.split()[0])
+    return {
+        "cpu_seconds": (int(fields[11]) + int(fields[12])) / CLOCK_TICKS,
+        "rss_kib": memory.get("VmRSS", 0),
+        "peak_rss_kib": memory.get("VmHWM", 0),
+    }
+
+
+def wait_for_http(url, timeout=60):
+    """Poll a URL until it answers 200"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=2) as reply:
+                if reply.status == 200:
+                    return
+        except OSError:
+            pass
+        time.sleep(0.5)
+    raise TimeoutError(f"{url} did not come up within {timeout}s")
+
+
+def _percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, round(fraction * (len(ordered) - 1)))], 1)
+
+
+class SimulatedUser:
+    """One browser session speaking the Streamlit websocket protocol"""
+
+    def __init__(self, url, index, timeout):
+        self.url = url
+        self.index = index
+        self.timeout = timeout
+        self.chat_input_id = None
+
+    async def _rerun(self, ws, chat_text=None):
+        msg = BackMsg()
+        msg.rerun_script.query_string = ""
+        if chat_text is not None:
+            widget = msg.rerun_script.widget_states.widgets.add()
+            widget.id = self.chat_input_id
+            widget.chat_input_value.data = chat_text
+        await ws.send(msg.SerializeToString())
+
+    async def _read_run(self, ws, marker=None):
+        """Read until a run finishes (after the marker, if any); returns when it appeared"""
+        seen_at = None
+        while True:
+            msg = ForwardMsg()
+            msg.ParseFromString(await asyncio.wait_for(ws.recv(), self.timeout))
+            kind = msg.WhichOneof("type")
+            if kind == "delta" and msg.delta.WhichOneof("type") == "new_element":
+                element = msg.delta.new_element
+                element_type = element.WhichOneof("type")
+                if element_type == "chat_input":
+                    self.chat_input_id = element.chat_input.id
+                elif element_type == "exception":
+                    raise RuntimeError(element.exception.message)
+                elif marker and seen_at is None and element_type == "markdown" and marker in element.markdown.body:
+                    seen_at = time.perf_counter()
+            elif kind == "script_finished" and msg.script_finished in FINISHED:
+                if marker is None or seen_at is not None:
+                    return seen_at
+
+    async def run(self, messages, think_time, ramp, stats):
+        await asyncio.sleep(random.uniform(0, ramp))
+        try:
+            async with websockets.connect(self.url, subprotocols=["streamlit"], max_size=None, open_timeout=self.timeout) as ws:
+                started = time.perf_counter()
+                await self._rerun(ws)
+                await self._read_run(ws)
+                stats["first_paint_ms"].append((time.perf_counter() - started) * 1000)
+                if self.chat_input_id is None:
+                    raise RuntimeError("chat input not rendered")
+
+                for number in range(messages):
+                    text = f"load-test user {self.index} message {number}"
+                    started = time.perf_counter()
+                    await self._rerun(ws, text)
+                    replied_at = await self._read_run(ws, marker=f"received: {text}")
+                    stats["reply_ms"].append((replied_at - started) * 1000)
+                    stats["run_ms"].append((time.perf_counter() - started) * 1000)
+                    await asyncio.sleep(think_time * random.uniform(0.5, 1.5))
+        except Exception as e:
+            stats["errors"].append(f"user {self.index}: {type(e).__name__}: {e}")
+
+
+async def run_stage(url, users, args):
+    stats = {"first_paint_ms": [], "reply_ms": [], "run_ms": [], "errors": []}
+    await asyncio.gather(*(
+        SimulatedUser(url, index, args.timeout).run(args.messages, args.think_time, args.ramp, stats)
+        for index in range(users)
+    ))
+    return stats
+
+
+def start_processes(args):
+    """Launch the fake webhook and the dashboard; returns both Popen handles"""
+    webhook = subprocess.Popen(
+        [sys.executable, str(BENCH_DIR / "fake_n8n.py"), "--port", str(args.webhook_port),
+         "--token", args.token, "--latency", str(args.webhook_latency), "--jitter", str(args.jitter),
+         *(["--stream"] if args.stream else [])],
+        stdout=subprocess.DEVNULL,
+    )
+    wait_for_http(f"http://127.0.0.1:{args.webhook_port}/stats")
+
+    env = dict(os.environ, WEBHOOK_MODE="live", BEARER_TOKEN=args.token,
+               WEBHOOK_URL=f"http://127.0.0.1:{args.webhook_port}/webhook")
+    if args.batch_window_ms:
+        env.update(WEBHOOK_BATCH_URL=f"http://127.0.0.1:{args.webhook_port}/webhook/batch",
+                   WEBHOOK_BATCH_WINDOW_MS=str(args.batch_window_ms))
+    dashboard = subprocess.Popen(
+        [sys.executable, str(BENCH_DIR / "serve_dashboard.py"), "--server.port", str(args.dashboard_port)],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    wait_for_http(f"http://127.0.0.1:{args.dashboard_port}/_stcore/health")
+    return webhook, dashboard
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, nargs="+", default=[1, 10, 25], help="concurrent sessions per stage")
+    parser.add_argument("--messages", type=int, default=5, help="chat messages per session")
+    parser.add_argument("--think-time", type=float, default=2.0, help="mean seconds between a reply and the next message")
+    parser.add_argument("--ramp", type=float, default=2.0, help="seconds over which sessions connect")
+    parser.add_argument("--webhook-latency", type=float, default=1.0, help="fake n8n processing time in seconds")
+    parser.add_argument("--jitter", type=float, default=0.2, help="uniform +/- seconds added to the webhook latency")
+    parser.add_argument("--stream", action="store_true", help="fake n8n streams its replies")
+    parser.add_argument("--batch-window-ms", type=float, help="enable webhook batching with this coalescing window")
+    parser.add_argument("--token", default="load-test-token", help="bearer token shared by dashboard and webhook")
+    parser.add_argument("--dashboard-port", type=int, default=8601)
+    parser.add_argument("--webhook-port", type=int, default=5678)
+    parser.add_argument("--timeout", type=float, default=60.0, help="seconds to wait for any single reply")
+    parser.add_argument("--save", type=Path, help="write the stage results as JSON")
+    args = parser.parse_args()
+
+    webhook, dashboard = start_processes(args)
+    url = f"ws://127.0.0.1:{args.dashboard_port}/_stcore/stream"
+    report = {"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "settings": {k: v for k, v in vars(args).items() if k != "save"}, "stages": []}
+    try:
+        print(f"{'users':>6} {'msgs/s':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7} {'dash CPU%':>10} {'dash RSS MiB':>13} {'hook CPU%':>10} {'hook RSS MiB':>13}")
+        for users in args.users:
+            before = {"dashboard": process_usage(dashboard.pid), "webhook": process_usage(webhook.pid)}
+            started = time.perf_counter()
+            stats = asyncio.run(run_stage(url, users, args))
+            elapsed = time.perf_counter() - started
+            after = {"dashboard": process_usage(dashboard.pid), "webhook": process_usage(webhook.pid)}
+
+            stage = {
+                "users": users,
+                "seconds": round(elapsed, 2),
+                "messages": len(stats["reply_ms"]),
+                "throughput_per_second": round(len(stats["reply_ms"]) / elapsed, 2),
+                "first_paint_p95_ms": _percentile(stats["first_paint_ms"], 0.95),
+                "reply_p50_ms": _percentile(stats["reply_ms"], 0.50),
+                "reply_p95_ms": _percentile(stats["reply_ms"], 0.95),
+                "reply_p99_ms": _percentile(stats["reply_ms"], 0.99),
+                "run_p95_ms": _percentile(stats["run_ms"], 0.95),
+                "errors": stats["errors"],
+            }
+            for name in ("dashboard", "webhook"):
+                stage[name] = {
+                    "cpu_percent": round(100 * (after[name]["cpu_seconds"] - before[name]["cpu_seconds"]) / elapsed, 1),
+                    "rss_kib": after[name]["rss_kib"],
+                    "peak_rss_kib": after[name]["peak_rss_kib"],
+                }
+            report["stages"].append(stage)
+            print(f"{users:>6} {stage['throughput_per_second']:>7} {stage['reply_p50_ms']!s:>8} {stage['reply_p95_ms']!s:>8} "
+                  f"{stage['reply_p99_ms']!s:>8} {len(stats['errors']):>7} {stage['dashboard']['cpu_percent']:>10} "
+                  f"{stage['dashboard']['rss_kib'] / 1024:>13.1f} {stage['webhook']['cpu_percent']:>10} {stage['webhook']['rss_kib'] / 1024:>13.1f}")
+            for error in stats["errors"][:5]:
+                print(f"   ❌ {error}")
+
+        with urllib.request.urlopen(f"http://127.0.0.1:{args.webhook_port}/stats") as reply:
+            report["webhook_stats"] = json.load(reply)
+        webhook_stats = report["webhook_stats"]
+        print(f"🛰️ Webhook saw {webhook_stats['messages']} messages in {webhook_stats['requests']} requests "
+              f"({webhook_stats['batches']} batches) across {len(webhook_stats['by_agent'])} agents")
+    finally:
+        dashboard.terminate()
+        webhook.terminate()
+        dashboard.wait()
+        webhook.wait()
+
+    if args.save:
+        args.save.write_text(json.dumps(report, indent=2) + "\n")
+        print(f"✅ Results written to {args.save}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Serve app.py with fake Google Sheets and pre-authenticated sessions
+
+Used by load_test.py: every new browser session starts signed in with fake
+service-account credentials, its own account id and the next agent from
+agents.json, so simulated users spread round-robin across all agents without
+sharing durable state. Durable state goes to a throwaway SQLite file unless
+STATE_BACKEND_URL is set. Remaining arguments are passed to `streamlit run`.
+
+    WEBHOOK_MODE=live WEBHOOK_URL=http://127.0.0.1:5678/webhook \\
+        python benchmarks/serve_dashboard.py --server.port 8601
+"""
+import itertools
+import json
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+APP_PATH = BENCH_DIR.parent / "app.py"
+sys.path.insert(0, str(BENCH_DIR))
+
+from fakes import FakeCredentials, install_fake_gspread  # noqa: E402
+
+
+def preauthenticate_sessions(agent_ids):
+    """Seed each new AppSession's state before its first script run"""
+    from streamlit.runtime.app_session import AppSession
+
+    agents = itertools.cycle(agent_ids)
+    users = itertools.count(1)
+    original_init = AppSession.__init__
+
+    def __init__(self, *args, **kwargs):
+        original_init(self, *args, **kwargs)
+        self.session_state._new_session_state.update({
+            "authenticated": True,
+            "credentials": FakeCredentials(),
+            "credentials_key": f"{FakeCredentials.service_account_email}:load-test",
+            "account_id": f"load-test-{next(users)}",
+            "user_info": {"email": FakeCredentials.service_account_email, "name": "Load Test"},
+            "current_page": next(agents),
+            "current_tab": "chatbot",
+        })
+
+    AppSession.__init__ = __init__
+
+
+def main():
+    registry = json.loads((BENCH_DIR.parent / "agents.json").read_text())
+    state_dir = tempfile.TemporaryDirectory(prefix="dashboard-load-test-")
+    os.environ.setdefault("STATE_BACKEND_URL", f"sqlite:///{Path(state_dir.name) / 'session_state.sqlite3'}")
+    install_fake_gspread(rows=1_000)
+    preauthenticate_sessions(list(registry["agents"]))
+
+    from streamlit.web import cli
+
+    sys.argv = ["streamlit", "run", str(APP_PATH), "--server.headless", "true",
+                "--server.enableXsrfProtection", "false", *sys.argv[1:]]
+    sys.exit(cli.main())
+
+
+if __name__ == "__main__":
+    main()